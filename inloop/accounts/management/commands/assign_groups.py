@@ -1,7 +1,8 @@
+import time
 from typing import Any, Iterable, Sequence
 
 from django.contrib.auth.models import Group, User
-from django.core.management.base import BaseCommand, CommandParser
+from django.core.management.base import BaseCommand, CommandError, CommandParser
 
 from inloop.accounts.models import assign_to_groups
 
@@ -17,11 +18,26 @@ class Command(BaseCommand):
             help="The names of the groups to assign users to.",
             type=str,
         )
+        parser.add_argument(
+            "--chunk_size",
+            help="Number of group memberships to insert per statement (default is 1000).",
+            default=1000,
+            type=int,
+        )
 
     def handle(self, *args: str, **options: Any) -> None:
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk_size must be >= 1.")
         groups = self.get_groups(options["groups"])
-        num_users = assign_to_groups(users=User.objects.all(), groups=groups)
-        self.stdout.write(f"Distributed {num_users} users to {len(groups)} groups.")
+        start_time = time.perf_counter()
+        num_users = assign_to_groups(
+            users=User.objects.all(), groups=groups, chunk_size=options["chunk_size"]
+        )
+        duration = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Distributed {num_users} users to {len(groups)} groups in {duration:.2f}s "
+            f"({num_users / max(duration, 1e-6):.0f} users/s)."
+        )
 
     def get_groups(self, group_names: Iterable[str]) -> Sequence[Group]:
         groups = []
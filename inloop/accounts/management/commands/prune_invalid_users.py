@@ -1,6 +1,7 @@
+import time
 from typing import Any
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError, CommandParser
 
 from inloop.accounts.models import prune_invalid_users
 
@@ -8,6 +9,21 @@ from inloop.accounts.models import prune_invalid_users
 class Command(BaseCommand):
     help = "Delete accounts that haven't been activated in time."
 
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--chunk_size",
+            help="Number of accounts to delete per transaction (default is 1000).",
+            default=1000,
+            type=int,
+        )
+
     def handle(self, *args: str, **options: Any) -> None:
-        num_deleted = prune_invalid_users()
-        self.stdout.write(f"Pruned {num_deleted} invalid account(s).")
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk_size must be >= 1.")
+        start_time = time.perf_counter()
+        num_deleted = prune_invalid_users(chunk_size=options["chunk_size"])
+        duration = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Pruned {num_deleted} invalid account(s) in {duration:.2f}s "
+            f"({num_deleted / max(duration, 1e-6):.0f} accounts/s)."
+        )
@@ -1,4 +1,5 @@
-from typing import Callable, Iterable
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
 
 from django.db.models import ObjectDoesNotExist
 from django.http import HttpRequest, HttpResponseRedirect
@@ -8,10 +9,49 @@ from django.utils.functional import cached_property
 
 from constance import config
 
+# session key of the id of the user who confirmed the own work declaration
+OWNWORK_CONFIRMED_SESSION_KEY = "ownwork_confirmed"
+
+
+class LocalConfig:
+    """
+    Process-local copy of constance settings, which are re-read after ttl seconds.
+
+    This saves a round-trip to the constance backend on every request, at the
+    expense of changed settings taking effect up to ttl seconds later.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.values: Dict[str, Tuple[Any, float]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        now = time.monotonic()
+        try:
+            value, expires = self.values[name]
+        except KeyError:
+            pass
+        else:
+            if now < expires:
+                return value
+        value = getattr(config, name)
+        self.values[name] = (value, now + self.ttl)
+        return value
+
 
 class RequireOwnWorkDeclaration:
+    """
+    Redirect authenticated users to the own work declaration until they confirmed it.
+
+    The check is done before the view is called, and a confirmation is remembered
+    in the session, so that no query is needed after it has been seen once.
+    """
+
+    CONFIG_TTL = 10
+
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
         self.get_response = get_response
+        self.config = LocalConfig(ttl=self.CONFIG_TTL)
 
     @cached_property
     def redirect_url(self) -> str:
@@ -22,17 +62,21 @@ class RequireOwnWorkDeclaration:
         return [reverse("login"), reverse("logout"), self.redirect_url]
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        response = self.get_response(request)
+        if self.must_confirm(request) and request.path not in self.exclude_paths:
+            return HttpResponseRedirect(self.redirect_url)
+        return self.get_response(request)
+
+    def must_confirm(self, request: HttpRequest) -> bool:
         if not request.user.is_authenticated:
-            return response
-        if not config.REQUIRE_OWNWORK_DECLARATION:
-            return response
+            return False
+        if request.session.get(OWNWORK_CONFIRMED_SESSION_KEY) == request.user.pk:
+            return False
+        if not self.config.REQUIRE_OWNWORK_DECLARATION:
+            return False
         try:
-            details = request.user.studentdetails
-            if details.ownwork_confirmed:
-                return response
+            confirmed = request.user.studentdetails.ownwork_confirmed
         except ObjectDoesNotExist:
-            pass
-        if request.path not in self.exclude_paths:
-            return HttpResponseRedirect(self.redirect_url)
-        return response
+            confirmed = False
+        if confirmed:
+            request.session[OWNWORK_CONFIRMED_SESSION_KEY] = request.user.pk
+        return not confirmed
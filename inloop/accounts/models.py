@@ -1,7 +1,7 @@
 import logging
 from datetime import timedelta
 from random import choice
-from typing import Any, Iterable, Sequence, Type
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, Tuple, Type
 
 from django.conf import settings
 from django.contrib import messages
@@ -10,7 +10,8 @@ from django.contrib.auth.models import Group, User
 from django.contrib.auth.signals import user_logged_in
 from django.core.validators import RegexValidator
 from django.db import models
-from django.db.models import ObjectDoesNotExist
+from django.db.models import ObjectDoesNotExist, QuerySet
+from django.db.transaction import atomic
 from django.dispatch import receiver
 from django.http.request import HttpRequest
 from django.urls import reverse
@@ -19,6 +20,10 @@ from django.utils.safestring import mark_safe
 
 from constance import config
 
+from inloop.common.deletion import raw_delete_cascade, remove_files
+from inloop.solutions.models import Solution, get_solution_filenames
+from inloop.tasks.models import invalidate_attachment_access
+
 logger = logging.getLogger(__name__)
 
 INCOMPLETE_HINT = (
@@ -47,18 +52,60 @@ def user_profile_complete(user: User) -> bool:
         return False
 
 
-def prune_invalid_users() -> int:
+def prune_invalid_users(
+    *, chunk_size: int = 1000, remove: Callable[[List[str]], Any] = remove_files
+) -> int:
     """
     Delete accounts that haven't been activated in time.
     Return the number of deleted accounts.
+
+    The accounts are deleted in chunks using delete_users_chunked(…), and the
+    storage names of the files of their solutions are passed to remove after
+    every chunk, which may also schedule their removal for later.
     """
     User = get_user_model()
     deadline = timezone.now() - timedelta(days=settings.ACCOUNT_ACTIVATION_DAYS)
     invalid_users = User.objects.filter(
         date_joined__lte=deadline, is_active=False, last_login=None
     )
-    _, removals_by_type = invalid_users.delete()
-    return removals_by_type.get(settings.AUTH_USER_MODEL, 0)
+    num_deleted = 0
+    for num_chunk_deleted, filenames in delete_users_chunked(invalid_users, chunk_size=chunk_size):
+        num_deleted += num_chunk_deleted
+        if filenames:
+            remove(filenames)
+    return num_deleted
+
+
+def delete_users_chunked(users: QuerySet, *, chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Delete the given users in chunks of chunk_size, each chunk in its own transaction,
+    and yield the number of deleted users along with the storage names of the files
+    of their solutions after every committed chunk.
+
+    Like delete_solutions_chunked(…), the rows are removed with set-based DELETE
+    statements, and the caller is responsible to remove the yielded files. If a
+    relation to the users cannot be handled this way, the chunk is deleted by the
+    ORM, which also removes the files.
+    """
+    last_id = 0
+    while True:
+        ids = list(
+            users.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        chunk = get_user_model().objects.filter(id__in=ids)
+        with atomic():
+            try:
+                filenames = get_solution_filenames(
+                    Solution.objects.filter(author_id__in=ids).values("id")
+                )
+                num_deleted = raw_delete_cascade(chunk)
+            except ValueError:
+                _, removals_by_type = chunk.delete()
+                filenames, num_deleted = [], removals_by_type.get(settings.AUTH_USER_MODEL, 0)
+        yield num_deleted, filenames
+        last_id = ids[-1]
 
 
 @receiver(user_logged_in, dispatch_uid="assign_to_group_on_login")
@@ -76,15 +123,26 @@ def auto_assign_to_group(
         logger.warning(f"AUTO_ASSIGN_GROUPS is active for a non-existent group: {group_name}")
 
 
-def assign_to_groups(*, users: Iterable[User], groups: Sequence[Group]) -> int:
-    """Randomly assign the given groups to the given users if they not already have a group."""
-    num_assignments = 0
-    for user in users:
-        if user.groups.exists():
-            continue
-        user.groups.add(choice(groups))
-        num_assignments += 1
-    return num_assignments
+def assign_to_groups(
+    *, users: Iterable[User], groups: Sequence[Group], chunk_size: int = 1000
+) -> int:
+    """
+    Randomly assign the given groups to the given users if they not already have a group.
+
+    The users without a group are selected with a single query, and the memberships
+    are inserted in chunks of chunk_size rows. As with any bulk insert, no
+    m2m_changed signals are sent, so the caches depending on the groups of the
+    users are invalidated explicitly.
+    """
+    if not isinstance(users, QuerySet):
+        users = User.objects.filter(pk__in=[user.pk for user in users])
+    user_ids = users.filter(groups=None).values_list("pk", flat=True)
+    Membership = User.groups.through
+    memberships = [Membership(user_id=user_id, group_id=choice(groups).pk) for user_id in user_ids]
+    # bulk_create inserts all chunks in a single transaction
+    Membership.objects.bulk_create(memberships, batch_size=chunk_size, ignore_conflicts=True)
+    invalidate_attachment_access(membership.user_id for membership in memberships)
+    return len(memberships)
 
 
 class Course(models.Model):
@@ -1,14 +1,23 @@
 import logging
+from typing import List
 
 from huey import crontab
-from huey.contrib.djhuey import db_periodic_task
+from huey.contrib.djhuey import db_periodic_task, db_task
 
 from inloop.accounts.models import prune_invalid_users
+from inloop.common.deletion import remove_files
 
 logger = logging.getLogger(__name__)
 
 
+@db_task()
+def remove_files_async(filenames: List[str]) -> None:
+    """Remove the files of pruned accounts in a separate background task."""
+    num_removed = remove_files(filenames)
+    logger.info(f"Removed {num_removed} of {len(filenames)} file(s) of pruned accounts.")
+
+
 @db_periodic_task(crontab(minute="*/30"))
 def autoprune_invalid_users() -> None:
-    num_deleted = prune_invalid_users()
+    num_deleted = prune_invalid_users(remove=remove_files_async)
     logger.info(f"Pruned {num_deleted} invalid account(s).")
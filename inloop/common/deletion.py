@@ -0,0 +1,74 @@
+"""
+Set-based deletion helpers that bypass Django's deletion collector.
+
+QuerySet.delete() loads every affected row into memory and sends pre/post_delete
+signals one instance at a time. That is fine for a handful of rows, but much too
+slow when pruning millions of rows. The helpers in this module issue one DELETE
+statement per affected table instead and leave side effects, such as removing
+files from storage, to the caller.
+"""
+
+import os
+from typing import Iterable, Tuple
+
+from django.core.files.storage import default_storage
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL, QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+
+def raw_delete_cascade(queryset: QuerySet) -> int:
+    """
+    Delete the rows of the given queryset including all rows that refer to them.
+
+    Referring rows are handled according to their on_delete behavior, which must be
+    one of CASCADE, SET_NULL or DO_NOTHING, otherwise a ValueError is raised before
+    anything is deleted. No model instances are loaded and no signals are sent.
+
+    This function should be called inside a transaction. Return the number of rows
+    deleted from the table of the given queryset.
+    """
+    _check_supported_relations(queryset.model)
+    return _raw_delete_cascade(queryset)
+
+
+def _check_supported_relations(model: type, seen: Tuple[type, ...] = ()) -> None:
+    if model in seen:
+        return
+    for relation in get_candidate_relations_to_delete(model._meta):
+        if relation.on_delete not in (CASCADE, SET_NULL, DO_NOTHING):
+            raise ValueError(f"unsupported on_delete behavior for {relation!r}")
+        if relation.on_delete is CASCADE:
+            _check_supported_relations(relation.related_model, seen + (model,))
+
+
+def _raw_delete_cascade(queryset: QuerySet) -> int:
+    for relation in get_candidate_relations_to_delete(queryset.model._meta):
+        field = relation.field
+        related = relation.related_model._base_manager.filter(
+            **{f"{field.name}__in": queryset.values(field.target_field.attname)}
+        )
+        if relation.on_delete is CASCADE:
+            _raw_delete_cascade(related)
+        elif relation.on_delete is SET_NULL:
+            related.update(**{field.name: None})
+    # children are deleted first, because their subqueries refer to the parent rows
+    return queryset._raw_delete(queryset.db)
+
+
+def remove_file(name: str) -> bool:
+    """
+    Remove the file with the given name from the default storage.
+
+    Return True if the file was removed and False if it did not exist or if
+    the current unix user is not permitted to remove it.
+    """
+    try:
+        os.remove(default_storage.path(name))
+    except (FileNotFoundError, PermissionError):
+        return False
+    return True
+
+
+def remove_files(names: Iterable[str]) -> int:
+    """Remove the given files from the default storage and return how many were removed."""
+    return sum(remove_file(name) for name in names)
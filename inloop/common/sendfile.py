@@ -1,13 +1,32 @@
+import mimetypes
+import posixpath
+import re
 from os.path import isabs, join, relpath
-from typing import Optional
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
 
 from django.conf import settings
-from django.http import Http404, HttpRequest, HttpResponse
-from django.views.static import serve
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
 
 
 def sendfile_nginx(
-    request: HttpRequest, path: str, document_root: Optional[str] = None
+    request: HttpRequest,
+    path: str,
+    document_root: Optional[str] = None,
+    *,
+    etag: Optional[str] = None,
 ) -> HttpResponse:
     """
     Serve a file via Nginx' X-Accel-Redirect header.
@@ -22,7 +41,7 @@ def sendfile_nginx(
     (replace with the values from the settings module)
 
     Currently, document_root must be a subdirectory of MEDIA_ROOT and path
-    must be relative.
+    must be relative. The etag argument is ignored, because Nginx sends its own.
     """
     if isabs(path):
         raise ValueError("path must be relative")
@@ -53,8 +72,118 @@ def sendfile_nginx(
     return response
 
 
+def sendfile_django(
+    request: HttpRequest,
+    path: str,
+    document_root: Optional[str] = None,
+    *,
+    etag: Optional[str] = None,
+) -> HttpResponse:
+    """
+    Serve a file with Django, which is meant for setups without Nginx.
+
+    In contrast to django.views.static.serve, HEAD requests are answered without
+    reading the file and single byte ranges are supported, so that large files can
+    be fetched in parts (e.g., by media players or download managers).
+
+    If an etag is given, it is sent with the response and used to evaluate the
+    If-Range header. Conditional requests using If-None-Match must be handled by
+    the caller.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    fullpath = Path(safe_join(document_root, path))
+    if not fullpath.is_file():
+        raise Http404
+    statobj = fullpath.stat()
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), statobj.st_mtime):
+        return HttpResponseNotModified()
+    content_type, encoding = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or "application/octet-stream"
+    size = statobj.st_size
+
+    byte_range = None
+    if if_range_matches(request, etag=etag, last_modified=statobj.st_mtime):
+        byte_range = parse_range(request.META.get("HTTP_RANGE", ""), size)
+    if byte_range == (-1, -1):
+        response = HttpResponse(status=416, content_type=content_type)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = str(size)
+    elif byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(fullpath.open("rb"), start, end), status=206, content_type=content_type
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        response = FileResponse(fullpath.open("rb"), content_type=content_type)
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = http_date(statobj.st_mtime)
+    if etag:
+        response["ETag"] = etag
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
+
+
+def if_range_matches(request: HttpRequest, *, etag: Optional[str], last_modified: float) -> bool:
+    """Return True if the If-Range header is absent or matches the current file."""
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        # weak etags must not be used with If-Range
+        return etag is not None and if_range == etag and not etag.startswith("W/")
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(last_modified) <= if_range_date
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header with a single byte range and return the first and last
+    byte position. Return None if the header is absent or not supported, and
+    (-1, -1) if the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # a suffix range, e.g., "bytes=-500" means the last 500 bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return -1, -1
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return -1, -1
+    return start, end
+
+
+def read_range(stream: BinaryIO, start: int, end: int, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Yield the bytes from start to end (inclusive) of the given stream and close it."""
+    with stream:
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = stream.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
 # Select the sendfile implementation based on the settings:
 if hasattr(settings, "X_ACCEL_LOCATION"):
     sendfile = sendfile_nginx
 else:
-    sendfile = serve
+    sendfile = sendfile_django
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import subprocess
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Any, Optional, Union
 from xml.etree.ElementTree import Element
 
 from django.conf import settings
+from django.core.cache import cache
 from django.template import Library
 from django.template.defaultfilters import stringfilter
 from django.utils.safestring import SafeText, mark_safe
@@ -90,17 +92,93 @@ class GitVersionProvider(VersionProvider):
             pass
 
 
+class StaticVersionProvider(VersionProvider):
+    """Provides a fixed version string, such as the id of an imported commit."""
+
+    def __init__(self, version: Optional[str]) -> None:
+        """Initialize with the given version string."""
+        self.version = version
+
+    def get_version(self) -> Optional[str]:
+        """Return the version string given at initialization."""
+        return self.version
+
+
+class CachedVersionProvider(VersionProvider):
+    """
+    Provides the version string stored in the cache after each import of the task
+    repository, so that it doesn't have to be determined for every conversion.
+    """
+
+    cache_key = "inloop:markdown:version"
+
+    def __init__(self, fallback: VersionProvider) -> None:
+        """Initialize with the provider to be used if the version is not cached."""
+        self.fallback = fallback
+
+    def get_version(self) -> Optional[str]:
+        """Return the cached version, asking the fallback provider on a cache miss."""
+        version = cache.get(self.cache_key)
+        if version is None:
+            version = self.fallback.get_version()
+            self.set_version(version)
+        # an empty string is cached if the version can't be determined
+        return version or None
+
+    @classmethod
+    def set_version(cls, version: Optional[str]) -> None:
+        """Store the given version in the cache."""
+        cache.set(cls.cache_key, version or "", timeout=None)
+
+
+def get_short_version(commit: Optional[str]) -> Optional[str]:
+    """Return the abbreviated form of the given commit id, as used for image urls."""
+    return commit[:7] if commit else None
+
+
+def create_markdown(version_provider: VersionProvider) -> Markdown:
+    """Return a Markdown converter with the extensions used throughout INLOOP."""
+    return Markdown(
+        output_format="html",
+        extensions=[
+            "markdown.extensions.toc",
+            "markdown.extensions.smarty",
+            "markdown.extensions.fenced_code",
+            "markdown.extensions.tables",
+            ImageVersionExtension(version_provider),
+        ],
+    )
+
+
+# Markdown instances keep state during a conversion and must not be shared between
+# threads, so each thread creates its own instance on first use.
+_thread_local = threading.local()
+
+
+def render_markdown(value: str, *, version: Optional[str] = None) -> str:
+    """
+    Convert the given markdown text to HTML, appending the given version string
+    to the urls of local images.
+    """
+    try:
+        md, version_provider = _thread_local.markdown
+    except AttributeError:
+        version_provider = StaticVersionProvider(None)
+        md = create_markdown(version_provider)
+        _thread_local.markdown = md, version_provider
+    version_provider.version = version
+    return md.reset().convert(value)
+
+
+repository_version = CachedVersionProvider(GitVersionProvider(settings.REPOSITORY_ROOT))
+
+
+def convert(value: str) -> str:
+    """Convert the given markdown text to HTML, versioning images with the repository."""
+    return render_markdown(value, version=repository_version.get_version())
+
+
 register = Library()
-convert = Markdown(
-    output_format="html",
-    extensions=[
-        "markdown.extensions.toc",
-        "markdown.extensions.smarty",
-        "markdown.extensions.fenced_code",
-        "markdown.extensions.tables",
-        ImageVersionExtension(GitVersionProvider(settings.REPOSITORY_ROOT)),
-    ],
-).convert
 
 
 @register.filter(is_safe=True)
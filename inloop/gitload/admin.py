@@ -0,0 +1,13 @@
+from django.contrib import admin
+from django.http import HttpRequest
+
+from inloop.gitload.models import TaskImport
+
+
+@admin.register(TaskImport)
+class TaskImportAdmin(admin.ModelAdmin):
+    list_display = ["commit", "created_at"]
+    readonly_fields = ["commit", "created_at", "summary"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
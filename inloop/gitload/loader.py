@@ -1,66 +1,183 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
+from django.core.exceptions import ValidationError
 from django.db.transaction import atomic
+from django.utils import timezone
+from django.utils.text import slugify
 
+from inloop.common.templatetags.markdown import get_short_version, render_markdown
+from inloop.gitload.models import TaskImport
 from inloop.gitload.repo import Repository
 from inloop.gitload.signals import repository_loaded
 from inloop.tasks.models import Category, FileTemplate, Task
 
 logger = logging.getLogger(__name__)
 
+# the task fields that are set from the task repository
+TASK_FIELDS = ["title", "slug", "description", "pubdate", "deadline", "category_id"]
+
 
 class InvalidTask(Exception):
     pass
 
 
-def load_tasks(repository: Repository) -> None:
+class TaskDefinition:
+    """Task as defined by a directory in the task repository."""
+
+    def __init__(
+        self,
+        task_dir: Path,
+        meta: Dict[str, Any],
+        description: str,
+        *,
+        version: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the definition from the parsed meta.json and the task description,
+        raising InvalidTask if a required field is missing or malformed. The given
+        version is appended to the image urls in the rendered description.
+        """
+        try:
+            self.category = meta["category"]
+            self.title = meta["title"]
+            self.pubdate = parse_datetime(meta["pubdate"])
+            self.deadline = parse_datetime(meta.get("deadline"))
+        except KeyError as key:
+            raise InvalidTask(f"{task_dir.name}: missing required field {key}")
+        except ValidationError as error:
+            raise InvalidTask(f"{task_dir.name}: malformed date ({error.messages[0]})")
+        self.system_name = task_dir.name
+        self.description = description
+        self.description_html = render_markdown(description, version=version)
+        self.templates = {}
+        for template in task_dir.glob("templates/*.java"):
+            with open(template) as stream:
+                self.templates[template.name] = stream.read()
+
+
+class ImportReport:
+    """Summary of the changes made by an import of the task repository."""
+
+    def __init__(self, *, commit: Optional[str], incremental: bool) -> None:
+        """Initialize an empty report for an import of the given commit."""
+        self.commit = commit
+        self.incremental = incremental
+        self.created: List[str] = []
+        self.updated: List[str] = []
+        self.unchanged: List[str] = []
+        self.disabled: List[str] = []
+        self.errors: List[str] = []
+
+    def __str__(self) -> str:
+        mode = "incremental" if self.incremental else "full"
+        lines = [f"Imported commit {self.commit or '(none)'} ({mode} import)."]
+        for label, names in [
+            ("Created", self.created),
+            ("Updated", self.updated),
+            ("Disabled", self.disabled),
+            ("Errors", self.errors),
+        ]:
+            if names:
+                lines.append(f"{label}: {', '.join(names)}")
+        lines.append(f"Unchanged: {len(self.unchanged)} task(s)")
+        return "\n".join(lines)
+
+
+def load_tasks(repository: Repository, *, full: bool = False, workers: int = 8) -> ImportReport:
+    """
+    Synchronize the repository and import the tasks that have changed since the
+    last import, or all tasks if full is True or the changes can't be determined.
+
+    The task directories are parsed by the given number of threads, before all
+    changes are written to the database at once.
+    """
     repository.synchronize()
     repository.call_make()
-    for task_file in repository.find_files("*/task.md"):
-        try:
-            load_task(task_file)
-        except InvalidTask as error:
-            logger.error("%s", error)
+    commit = repository.get_commit()
+    task_dirs = None
+    last_import = TaskImport.objects.last()
+    if not full and commit and last_import:
+        task_dirs = find_changed_task_dirs(repository, last_import.commit)
+    report = ImportReport(commit=commit, incremental=task_dirs is not None)
+    if task_dirs is None:
+        task_dirs = [task_file.parent for task_file in repository.find_files("*/task.md")]
+    version = get_short_version(commit)
+    definitions = parse_tasks(task_dirs, report, version=version, workers=workers)
+    with atomic():
+        save_tasks(definitions, report)
+        if commit:
+            TaskImport.objects.create(commit=commit, summary=str(report))
+    logger.info("%s", report)
     repository_loaded.send(__name__, repository=repository)
+    return report
 
 
-def load_task(task_file: Path) -> None:
-    task_dir = task_file.parent
-    meta = parse_metafile(task_dir)
-    if meta.get("disabled"):
-        return
+def find_changed_task_dirs(repository: Repository, commit: str) -> Optional[List[Path]]:
+    """
+    Return the task directories that contain changes since the given commit, or None
+    if the changes can't be determined or also affect files outside of task directories
+    (such as the Makefile), which may influence all tasks.
+    """
+    changed_files = repository.changed_files(commit)
+    if changed_files is None or any("/" not in path for path in changed_files):
+        return None
+    names = sorted({path.split("/", 1)[0] for path in changed_files})
+    return [
+        repository.path / name for name in names if (repository.path / name / "task.md").is_file()
+    ]
+
+
+def parse_tasks(
+    task_dirs: Iterable[Path], report: ImportReport, *, version: Optional[str], workers: int
+) -> List[TaskDefinition]:
+    """
+    Parse the given task directories concurrently and return the definitions of the
+    enabled and valid tasks. Disabled and invalid tasks are recorded in the report.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(partial(_try_parse_task, version=version), task_dirs))
+    definitions = []
+    for task_dir, result in results:
+        if isinstance(result, InvalidTask):
+            logger.error("%s", result)
+            report.errors.append(str(result))
+        elif result is None:
+            report.disabled.append(task_dir.name)
+        else:
+            definitions.append(result)
+    return definitions
+
+
+def _try_parse_task(
+    task_dir: Path, *, version: Optional[str]
+) -> Tuple[Path, Union[TaskDefinition, InvalidTask, None]]:
     try:
-        with open(task_file) as stream:
-            update_or_create(task_dir, meta, stream.read())
-    except KeyError as key:
-        raise InvalidTask(f"{task_dir.name}: missing required field {key}")
-
-
-def update_or_create(task_dir: Path, meta: Dict[str, str], task_text: str) -> None:
-    category, _ = Category.objects.get_or_create(name=meta["category"])
-    task, _ = Task.objects.update_or_create(
-        system_name=task_dir.name,
-        defaults={
-            "category": category,
-            "title": meta["title"],
-            "pubdate": meta["pubdate"],
-            "deadline": meta.get("deadline"),
-            "description": task_text,
-        },
-    )
-    load_task_templates(task, task_dir)
+        return task_dir, parse_task(task_dir, version=version)
+    except InvalidTask as error:
+        return task_dir, error
+
 
+def load_task(task_file: Path) -> None:
+    definition = parse_task(task_file.parent)
+    if definition is not None:
+        with atomic():
+            save_tasks([definition], ImportReport(commit=None, incremental=False))
 
-@atomic
-def load_task_templates(task: Task, task_dir: Path) -> None:
-    FileTemplate.objects.filter(task=task).delete()
-    for template in task_dir.glob("templates/*.java"):
-        with open(template) as stream:
-            FileTemplate.objects.create(name=template.name, task=task, contents=stream.read())
+
+def parse_task(task_dir: Path, *, version: Optional[str] = None) -> Optional[TaskDefinition]:
+    """Parse the given task directory, returning None if the task is disabled."""
+    meta = parse_metafile(task_dir)
+    if meta.get("disabled"):
+        return None
+    with open(task_dir / "task.md") as stream:
+        return TaskDefinition(task_dir, meta, stream.read(), version=version)
 
 
 def parse_metafile(task_dir: Path) -> Dict[str, Any]:
@@ -71,3 +188,97 @@ def parse_metafile(task_dir: Path) -> Dict[str, Any]:
         raise InvalidTask(f"{task_dir.name}: malformed meta.json ({error})")
     except FileNotFoundError:
         raise InvalidTask(f"{task_dir.name}: missing meta.json")
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse the given date string the same way as a DateTimeField would."""
+    result = Task._meta.get_field("pubdate").to_python(value)
+    if result is not None and timezone.is_naive(result):
+        result = timezone.make_aware(result)
+    return result
+
+
+def save_tasks(definitions: Iterable[TaskDefinition], report: ImportReport) -> None:
+    """
+    Create or update the tasks and their templates with a constant number of queries,
+    and record the changes in the given report. Must be called inside a transaction.
+    """
+    definitions = list(definitions)
+    categories = get_categories({definition.category for definition in definitions})
+    tasks = Task.objects.in_bulk(
+        [definition.system_name for definition in definitions], field_name="system_name"
+    )
+    templates: Dict[int, Dict[str, FileTemplate]] = {}
+    for template in FileTemplate.objects.filter(task__in=tasks.values()):
+        templates.setdefault(template.task_id, {})[template.name] = template
+
+    new_tasks, changed_tasks = [], []
+    new_templates, changed_templates, removed_templates = [], [], []
+    now = timezone.now()
+    for definition in definitions:
+        task = tasks.get(definition.system_name) or Task(system_name=definition.system_name)
+        old_values = [getattr(task, field) for field in TASK_FIELDS]
+        task.title = definition.title
+        task.slug = slugify(task.sluggable_title)
+        task.description = definition.description
+        task.pubdate = definition.pubdate
+        task.deadline = definition.deadline
+        task.category_id = categories[definition.category].id
+        # the rendered description also changes if only the version of its images changed
+        html_changed = task.description_html != definition.description_html
+        task.description_html = definition.description_html
+        new, changed, removed = diff_templates(task, templates.get(task.id, {}), definition)
+        new_templates.extend(new)
+        changed_templates.extend(changed)
+        removed_templates.extend(removed)
+        if task.pk is None:
+            new_tasks.append(task)
+            report.created.append(task.system_name)
+        elif new or changed or removed or old_values != [getattr(task, f) for f in TASK_FIELDS]:
+            # a change of the templates also counts as a modification of the task
+            task.updated_at = now
+            changed_tasks.append(task)
+            report.updated.append(task.system_name)
+        else:
+            if html_changed:
+                changed_tasks.append(task)
+            report.unchanged.append(task.system_name)
+    Task.objects.bulk_create(new_tasks)
+    Task.objects.bulk_update(
+        changed_tasks, TASK_FIELDS + ["description_html", "updated_at"], batch_size=100
+    )
+    FileTemplate.objects.bulk_create(new_templates)
+    FileTemplate.objects.bulk_update(changed_templates, ["contents"], batch_size=100)
+    FileTemplate.objects.filter(id__in=removed_templates).delete()
+
+
+def diff_templates(
+    task: Task, existing: Dict[str, FileTemplate], definition: TaskDefinition
+) -> Tuple[List[FileTemplate], List[FileTemplate], List[int]]:
+    """
+    Compare the existing templates of a task with the defined ones and return the
+    templates to be created, the templates to be updated and the ids of the templates
+    to be removed.
+    """
+    new, changed = [], []
+    for name, contents in definition.templates.items():
+        template = existing.get(name)
+        if template is None:
+            new.append(FileTemplate(task=task, name=name, contents=contents))
+        elif template.contents != contents:
+            template.contents = contents
+            changed.append(template)
+    removed = [
+        template.id for template in existing.values() if template.name not in definition.templates
+    ]
+    return new, changed, removed
+
+
+def get_categories(names: Iterable[str]) -> Dict[str, Category]:
+    """Return the categories with the given names, creating the missing ones."""
+    names = set(names)
+    categories = Category.objects.in_bulk(names, field_name="name")
+    Category.objects.bulk_create(
+        [Category(name=name, slug=slugify(name)) for name in names if name not in categories]
+    )
+    return Category.objects.in_bulk(names, field_name="name")
@@ -1,6 +1,6 @@
 from typing import Any
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandParser
 
 from constance import config
 
@@ -10,9 +10,16 @@ from inloop.gitload.tasks import load_tasks_async
 class Command(BaseCommand):
     help = "Synchronizes with the Git repository and loads the task into the system."
 
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--full",
+            help="Import all tasks instead of only the ones changed since the last import.",
+            action="store_true",
+        )
+
     def handle(self, *args: str, **options: Any) -> None:
         if config.GITLOAD_URL and config.GITLOAD_BRANCH:
-            load_tasks_async()
+            load_tasks_async(full=options["full"])
             self.stdout.write("Job submitted.")
         else:
             self.stderr.write("GITLOAD_URL or GITLOAD_BRANCH not configured.")
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class TaskImport(models.Model):
+    """Record of a successful import of the task repository."""
+
+    commit = models.CharField(max_length=40, help_text="Id of the imported commit")
+    created_at = models.DateTimeField(auto_now_add=True)
+    summary = models.TextField(default="", help_text="Summary of the imported changes")
+
+    def __str__(self) -> str:
+        return self.commit
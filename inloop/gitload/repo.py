@@ -5,7 +5,7 @@ Classes dealing with task repositories and their synchronization.
 import os
 import subprocess
 from pathlib import Path
-from typing import Any, Iterator, Optional, Union
+from typing import Any, Iterator, Optional, Set, Union
 
 
 class Repository:
@@ -44,6 +44,17 @@ class Repository:
     def synchronize(self) -> None:
         """Synchronize files with a remote source (optional)."""
 
+    def get_commit(self) -> Optional[str]:
+        """Return the id of the checked out commit, or None if there is no version control."""
+        return None
+
+    def changed_files(self, commit: str) -> Optional[Set[str]]:
+        """
+        Return the relative paths of the files that were added, modified or removed
+        since the given commit, or None if the changes can't be determined.
+        """
+        return None
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.path_s!r})"
 
@@ -99,6 +110,33 @@ class GitRepository(Repository):
             timeout=self.timeout,
         )
 
+    def git_output(self, *args: str) -> str:
+        """Perform given `git` subcommand (and arguments) and return its output."""
+        return subprocess.check_output(
+            ["git"] + list(args),
+            cwd=self.path_s,
+            env=_GIT_ENVIRON,
+            stderr=subprocess.DEVNULL,
+            timeout=self.timeout,
+            universal_newlines=True,
+        )
+
+    def get_commit(self) -> Optional[str]:
+        """Return the id of the checked out commit."""
+        return self.git_output("rev-parse", "HEAD").strip()
+
+    def changed_files(self, commit: str) -> Optional[Set[str]]:
+        """
+        Return the relative paths of the files that differ between the given commit
+        and the checked out commit, or None if the given commit is not available
+        (e.g., because it was not part of the shallow clone).
+        """
+        try:
+            output = self.git_output("diff", "--name-only", "--no-renames", "-z", commit, "HEAD")
+        except subprocess.CalledProcessError:
+            return None
+        return {path for path in output.split("\0") if path}
+
     def synchronize(self) -> None:
         """Synchronize files with the remote git repository."""
         if self.path.joinpath(".git").is_dir():
@@ -5,13 +5,23 @@ from django.dispatch import Signal, receiver
 from constance import config
 from constance.signals import config_updated
 
+from inloop.common.templatetags.markdown import CachedVersionProvider, get_short_version
+from inloop.gitload.repo import Repository
+
 repository_loaded = Signal()
 
 
+@receiver(repository_loaded, dispatch_uid="gitload_repository_loaded")
+def handle_repository_loaded(sender: Type[Any], repository: Repository, **kwargs: Any) -> None:
+    """Store the version of the imported repository, which is used to version images."""
+    CachedVersionProvider.set_version(get_short_version(repository.get_commit()))
+
+
 @receiver(config_updated, dispatch_uid="gitload_config_updated")
 def handle_config_updated(sender: Type[Any], key: str, **kwargs: Any) -> None:
     if key in ["GITLOAD_URL", "GITLOAD_BRANCH"]:
         if config.GITLOAD_URL and config.GITLOAD_BRANCH:
             from inloop.gitload.tasks import load_tasks_async
 
-            load_tasks_async()
+            # the task repository has changed, so the last import can't be diffed against
+            load_tasks_async(full=True)
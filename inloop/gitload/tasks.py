@@ -8,10 +8,11 @@ from inloop.gitload.repo import GitRepository
 
 
 @db_task()
-def load_tasks_async() -> None:
+def load_tasks_async(full: bool = False) -> None:
     with HUEY.lock_task("import-lock"):
         load_tasks(
             GitRepository(
                 settings.REPOSITORY_ROOT, url=config.GITLOAD_URL, branch=config.GITLOAD_BRANCH
-            )
+            ),
+            full=full,
         )
@@ -1,11 +1,19 @@
 from os.path import basename
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
+from django.conf import settings
 from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.db.models import QuerySet
 from django.http import HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import URLPattern, path, reverse
+from django.utils.html import format_html
 
+from inloop.grading.forms import SimilarityThresholdForm
 from inloop.grading.models import DetectedPlagiarism, PlagiarismTest
+from inloop.grading.similarity import apply_threshold, get_clusters
 
 
 class PlagiarismAdmin(admin.ModelAdmin):
@@ -38,9 +46,57 @@ class DetectedPlagiarismsAdmin(PlagiarismAdmin):
 
 @admin.register(PlagiarismTest)
 class PlagiarismTestsAdmin(PlagiarismAdmin):
-    list_display = ["id", "created_at", "command", "all_detected_plagiarisms"]
+    list_display = ["id", "created_at", "command", "all_detected_plagiarisms", "clusters"]
     actions = PlagiarismAdmin.actions + ("download_jplag_zip",)
 
+    def get_urls(self) -> List[URLPattern]:
+        return [
+            path(
+                "<int:test_id>/clusters/",
+                self.admin_site.admin_view(self.clusters_view),
+                name="grading_plagiarismtest_clusters",
+            ),
+            *super().get_urls(),
+        ]
+
+    def clusters(self, test: PlagiarismTest) -> str:
+        url = reverse("admin:grading_plagiarismtest_clusters", args=[test.id])
+        return format_html('<a href="{}">Show clusters</a>', url)
+
+    def clusters_view(self, request: HttpRequest, test_id: int) -> HttpResponse:
+        """
+        Show the groups of similar solutions of a test for a given threshold, and
+        update the detected plagiarisms of the test to that threshold on request.
+        """
+        test = get_object_or_404(PlagiarismTest, pk=test_id)
+        if not self.has_view_permission(request, test):
+            raise PermissionDenied
+        default = max(settings.JPLAG_DEFAULT_SIMILARITY, test.min_stored_similarity or 0)
+        data = request.POST or request.GET or {"min_similarity": default}
+        form = SimilarityThresholdForm(data, min_stored_similarity=test.min_stored_similarity)
+        if not form.is_valid():
+            clusters = []
+        elif request.method == "POST":
+            if not self.has_change_permission(request, test):
+                raise PermissionDenied
+            min_similarity = form.cleaned_data["min_similarity"]
+            count = apply_threshold(test, min_similarity)
+            msg = f"{count} solutions are now detected as plagiarisms."
+            self.message_user(request, msg, messages.SUCCESS)
+            return redirect(f"{request.path}?min_similarity={min_similarity:g}")
+        else:
+            clusters = get_clusters(test, form.cleaned_data["min_similarity"])
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Similar solutions of {test}",
+            "test": test,
+            "form": form,
+            "clusters": clusters,
+            "can_change": self.has_change_permission(request, test),
+        }
+        return TemplateResponse(request, "admin/grading/plagiarismtest/clusters.html", context)
+
     def download_jplag_zip(self, request: HttpRequest, queryset: QuerySet) -> HttpResponse:
         """
         Fetch the stored JPlag zip file and return it as a download.
@@ -2,21 +2,25 @@
 Plagiarism detection support using JPlag.
 """
 
+import os
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from shutil import copytree
+from shutil import copy2, copytree
 from tempfile import TemporaryDirectory
-from typing import Dict, Iterable, Optional, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import QuerySet
+from django.db.models import Max, QuerySet, Subquery
 
 from huey.api import Result
 from huey.contrib.djhuey import db_task
 
-from inloop.grading.models import save_plagiarism_set
+from inloop.grading.fingerprints import filter_candidates
+from inloop.grading.models import SolutionPair, save_plagiarism_set
 from inloop.solutions.models import Solution
 from inloop.tasks.models import Task
 
@@ -52,10 +56,18 @@ def jplag_check(
     tasks: Iterable[Task],
     min_similarity: Optional[int] = None,
     result_dir: Optional[Path] = None,
+    *,
+    workers: Optional[int] = None,
+    max_memory: Optional[str] = None,
+    prefilter: Optional[float] = None,
 ) -> Set[Solution]:
     """
     Check solutions of the given users for the given tasks with JPlag.
 
+    The solutions of all tasks are linked into a workspace first, before JPlag is
+    run for up to workers tasks concurrently, each in its own JVM. The results of
+    all tasks are saved as a single PlagiarismTest.
+
     Args:
         users: A User iterable (e.g., queryset).
         tasks: A Task iterable (e.g., queryset).
@@ -63,70 +75,100 @@ def jplag_check(
             shall be regarded as plagiarism (optional).
         result_dir: Directory where JPlag HTML files shall be saved to (optional).
             The given directory must not already exist.
+        workers: Maximum number of concurrent JPlag processes (optional).
+        max_memory: Maximum heap size of each JPlag process, e.g. "512m" (optional).
+        prefilter: Minimum fingerprint similarity (percent) of a pair of solutions
+            to be passed to JPlag (optional). If not given, JPlag compares all solutions.
 
     Returns:
         A set containing the solutions that have been identified as plagiarism.
     """
     if min_similarity is None:
         min_similarity = settings.JPLAG_DEFAULT_SIMILARITY
-    with TemporaryDirectory() as tmpdir:
+    if workers is None:
+        workers = settings.JPLAG_WORKERS
+    if max_memory is None:
+        max_memory = settings.JPLAG_MAX_MEMORY
+    if not isinstance(users, QuerySet):
+        users = list(users)
+    with TemporaryDirectory() as tmpdir, TemporaryDirectory() as solutions_dir:
         path = Path(tmpdir)
-        plagiarism_set = set()
-        for task in tasks:
-            plagiarism_set.update(jplag_check_task(users, task, min_similarity, path))
-        save_plagiarism_set(plagiarism_set, str(path))
         if result_dir:
-            copytree(src=path, dst=result_dir)
+            # write the results to their final place, instead of copying them afterwards
+            path = Path(result_dir)
+            path.mkdir(parents=True)
+        jobs = prepare_jobs(users, tasks, Path(solutions_dir), path, prefilter=prefilter)
+
+        stored_similarity = min(min_similarity, settings.JPLAG_MIN_STORED_SIMILARITY)
+
+        def run_job(job: Tuple[Path, Path, Dict[str, Solution]]) -> List[SolutionPair]:
+            root_path, result_path, last_solutions = job
+            output = exec_jplag(min_similarity, root_path, result_path, max_memory=max_memory)
+            return parse_pairs(output, stored_similarity, last_solutions)
+
+        # the threads only wait for the JPlag processes, which do the actual work
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            pairs = list(chain.from_iterable(executor.map(run_job, jobs)))
+        plagiarism_set = get_plagiarism_set(pairs, min_similarity)
+        # a prefiltered run has not compared all pairs, which rules out other thresholds
+        complete_similarity = stored_similarity if prefilter is None else None
+        save_plagiarism_set(plagiarism_set, str(path), pairs, complete_similarity)
         return plagiarism_set
 
 
-def jplag_check_task(
+def prepare_jobs(
     users: Iterable[User],
-    task: Task,
-    min_similarity: int,
+    tasks: Iterable[Task],
+    solutions_path: Path,
     result_path: Path,
-) -> Set[Solution]:
+    *,
+    prefilter: Optional[float] = None,
+) -> List[Tuple[Path, Path, Dict[str, Solution]]]:
     """
-    Check solutions of the given users for the given single task with JPlag.
-
-    Args:
-        users: A User queryset.
-        task: A Task object.
-        min_similarity: Minimum solution similarity after which two solutions
-            shall be regarded as plagiarism.
-        result_path: Directory where JPlag HTML files shall be saved to.
-
-    Returns:
-        A set containing the solutions that have been identified as plagiarism.
+    Link the last solutions of each task into its own directory below solutions_path
+    and return a list of (solutions directory, result directory, last solutions)
+    tuples for the tasks with at least two solutions to be compared.
     """
-    with TemporaryDirectory() as tmpdir:
-        root_path = Path(tmpdir)
+    jobs = []
+    for task in tasks:
         last_solutions = get_last_solutions(users, task)
+        if prefilter is not None:
+            last_solutions = filter_candidates(last_solutions, prefilter, task=task)
         if len(last_solutions) < 2:
-            return set()
+            continue
+        root_path = solutions_path.joinpath(task.slug)
         prepare_directories(root_path, last_solutions)
-        output = exec_jplag(min_similarity, root_path, result_path.joinpath(task.slug))
-    return parse_output(output, min_similarity, last_solutions)
+        jobs.append((root_path, result_path.joinpath(task.slug), last_solutions))
+    return jobs
 
 
 def get_last_solutions(users: Iterable[User], task: Task) -> Dict[str, Solution]:
     """
     Get the last valid solution of the given users for a given task.
+
+    The solutions are fetched with a single query, together with their authors,
+    and their files are prefetched with a second one.
     """
-    last_solutions = {}
-    for user in users:
-        last_solution = Solution.objects.filter(author=user, task=task, passed=True).last()
-        if last_solution is not None:
-            # escape hyphens in usernames with an unused (since
-            # disallowed) character, otherwise the usernames cannot
-            # be extracted from the jplag output
-            last_solutions[user.username.replace("-", "$")] = last_solution
-    return last_solutions
+    last_ids = (
+        Solution.objects.filter(author__in=users, task=task, passed=True)
+        .values("author_id")
+        .annotate(last_id=Max("id"))
+        .values("last_id")
+    )
+    solutions = (
+        Solution.objects.filter(id__in=Subquery(last_ids))
+        .select_related("author")
+        .prefetch_related("solutionfile_set")
+    )
+    # escape hyphens in usernames with an unused (since disallowed)
+    # character, otherwise the usernames cannot be extracted from the
+    # jplag output
+    return {solution.author.username.replace("-", "$"): solution for solution in solutions}
 
 
 def prepare_directories(root_path: Path, last_solutions: Dict[str, Solution]) -> None:
     """
-    Copy the given solutions to root_path, using the folder structure expected by JPlag.
+    Link the given solutions into root_path, using the folder structure expected by JPlag.
 
     The expected folder structure, for one task, will look like this:
 
@@ -137,40 +179,109 @@ def prepare_directories(root_path: Path, last_solutions: Dict[str, Solution]) ->
             user-2/
                 File1.java
                 File2.java
+
+    The solution files are hard linked instead of copied where possible. The files
+    of the solutions should be prefetched, otherwise one query per solution is
+    needed to determine its directory.
     """
     for username, last_solution in last_solutions.items():
-        copytree(src=last_solution.path, dst=root_path.joinpath(username))
+        copytree(
+            src=get_solution_path(last_solution),
+            dst=root_path.joinpath(username),
+            copy_function=link_or_copy,
+        )
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """
+    Create a hard link to the given file, or copy it if that is not possible,
+    e.g. because dst is located on another file system than src.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        copy2(src, dst)
+
+
+def get_solution_path(solution: Solution) -> Path:
+    """Return the directory of the given solution, using its prefetched files if any."""
+    solution_files = solution.solutionfile_set.all()
+    if not solution_files:
+        raise AssertionError(f"Empty solution: {solution!r}")
+    return solution_files[0].absolute_path.parent
 
 
 def parse_output(
-    output: str,
+    output: Iterable[str],
     min_similarity: int,
     last_solutions: Dict[str, Solution],
 ) -> Set[Solution]:
     """
-    Extract plagiarism check results from the given JPlag command line output.
+    Extract plagiarism check results from the given lines of JPlag command line output.
 
     Returns:
          A set containing the solutions that have been identified as plagiarism.
     """
-    plagiarism_set = set()
-    for match in LINE_REGEX.finditer(output):
+    return get_plagiarism_set(parse_pairs(output, min_similarity, last_solutions), min_similarity)
+
+
+def parse_pairs(
+    output: Iterable[str],
+    min_similarity: float,
+    last_solutions: Dict[str, Solution],
+) -> List[SolutionPair]:
+    """
+    Extract the compared pairs of solutions whose similarity is at least min_similarity
+    from the given lines of JPlag command line output.
+
+    Returns:
+        A list of (solution, solution, similarity) tuples.
+    """
+    pairs = []
+    for line in output:
+        match = LINE_REGEX.search(line)
+        if not match:
+            continue
         username1, username2, similarity = match.groups()
         similarity = float(similarity)
         if similarity >= min_similarity:
-            plagiarism_set.add(last_solutions[username1])
-            plagiarism_set.add(last_solutions[username2])
+            pairs.append((last_solutions[username1], last_solutions[username2], similarity))
+    return pairs
+
+
+def get_plagiarism_set(pairs: Iterable[SolutionPair], min_similarity: float) -> Set[Solution]:
+    """Return the solutions of the given pairs whose similarity is at least min_similarity."""
+    plagiarism_set = set()
+    for solution1, solution2, similarity in pairs:
+        if similarity >= min_similarity:
+            plagiarism_set.update([solution1, solution2])
     return plagiarism_set
 
 
-def exec_jplag(min_similarity: int, root_path: Path, result_path: Path) -> str:
+def exec_jplag(
+    min_similarity: int, root_path: Path, result_path: Path, *, max_memory: Optional[str] = None
+) -> Iterator[str]:
     """
-    Execute the JPlag Java program with the given parameters and return its output.
+    Execute the JPlag Java program with the given parameters and yield the lines
+    of its output while it is running.
+
+    If max_memory is given, the heap size of the JVM is limited accordingly.
+
+    Raises:
+        CalledProcessError: If JPlag exits with a non-zero return code.
     """
-    args = ["java", "-cp", settings.JPLAG_JAR_PATH, "jplag.JPlag"]
+    args = ["java"]
+    if max_memory:
+        args.append(f"-Xmx{max_memory}")
+    args.extend(["-cp", settings.JPLAG_JAR_PATH, "jplag.JPlag"])
     args.append("-vl")
     args.extend(["-l", "java19"])
     args.extend(["-m", f"{min_similarity}%"])
     args.extend(["-r", f"{result_path}"])
     args.append(f"{root_path}")
-    return subprocess.check_output(args, stderr=subprocess.DEVNULL, universal_newlines=True)
+    with subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True
+    ) as process:
+        yield from process.stdout
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args)
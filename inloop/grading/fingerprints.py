@@ -0,0 +1,245 @@
+"""
+Fingerprint index to preselect solutions for plagiarism checks.
+
+Each passed solution is fingerprinted by winnowing the hashes of the k-grams of
+its normalized Java tokens, as described by Schleimer et al. in "Winnowing: Local
+Algorithms for Document Fingerprinting". Identifiers, literals and comments are
+normalized, so that renaming variables does not change the fingerprints.
+
+The fingerprints are stored in an indexed table, which serves as an inverted
+index to find the pairs of solutions sharing many fingerprints. Only solutions
+appearing in such pairs need to be compared by JPlag.
+"""
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from itertools import combinations, groupby
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db.transaction import atomic
+
+from inloop.grading.models import Fingerprint
+from inloop.solutions.models import Solution
+from inloop.tasks.models import FileTemplate, Task
+
+logger = logging.getLogger(__name__)
+
+# number of tokens per k-gram
+K = 8
+
+# number of consecutive k-grams from which a fingerprint is selected; any common
+# sequence of at least K + WINDOW - 1 tokens is guaranteed to be detected
+WINDOW = 6
+
+# all pairs of the solutions sharing a fingerprint are counted up to this number of
+# solutions; larger groups only count the pairs of solutions adjacent by id, which
+# keeps the preselection linear while still connecting all members of a group
+MAX_PAIRED_OCCURRENCES = 10
+
+# fingerprints shared by more than this fraction of the compared solutions are
+# considered boilerplate, in addition to the fingerprints of the file templates
+MAX_OCCURRENCE_RATIO = 0.5
+
+JAVA_KEYWORDS = {
+    "abstract",
+    "assert",
+    "boolean",
+    "break",
+    "byte",
+    "case",
+    "catch",
+    "char",
+    "class",
+    "continue",
+    "default",
+    "do",
+    "double",
+    "else",
+    "enum",
+    "extends",
+    "final",
+    "finally",
+    "float",
+    "for",
+    "if",
+    "implements",
+    "import",
+    "instanceof",
+    "int",
+    "interface",
+    "long",
+    "new",
+    "package",
+    "private",
+    "protected",
+    "public",
+    "return",
+    "short",
+    "static",
+    "super",
+    "switch",
+    "synchronized",
+    "this",
+    "throw",
+    "throws",
+    "try",
+    "void",
+    "volatile",
+    "while",
+}
+
+TOKEN_REGEX = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<literal>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|\d[\w.]*)
+    | (?P<word>[A-Za-z_$][\w$]*)
+    | (?P<symbol>\S)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def tokenize(source: str) -> List[str]:
+    """
+    Return the normalized tokens of the given Java source code.
+
+    Comments are skipped, and all literals and identifiers other than keywords
+    are replaced by placeholders.
+    """
+    tokens = []
+    for match in TOKEN_REGEX.finditer(source):
+        kind, value = match.lastgroup, match.group()
+        if kind == "literal":
+            tokens.append("L")
+        elif kind == "word":
+            tokens.append(value if value in JAVA_KEYWORDS else "I")
+        elif kind == "symbol":
+            tokens.append(value)
+    return tokens
+
+
+def hash_kgram(tokens: Iterable[str]) -> int:
+    """Return a signed 64 bit hash of the given k-gram."""
+    digest = hashlib.blake2b(" ".join(tokens).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def winnow(tokens: List[str], *, k: int = K, window: int = WINDOW) -> Set[int]:
+    """Return the fingerprints of the given tokens."""
+    hashes = [hash_kgram(tokens[i : i + k]) for i in range(len(tokens) - k + 1)]
+    if len(hashes) <= window:
+        return set(hashes)
+    fingerprints = set()
+    for start in range(len(hashes) - window + 1):
+        fingerprints.add(min(hashes[start : start + window]))
+    return fingerprints
+
+
+def fingerprint_solution(solution: Solution) -> Set[int]:
+    """Return the fingerprints of all Java files of the given solution."""
+    fingerprints = set()
+    for solution_file in solution.solutionfile_set.all():
+        if solution_file.name.endswith(".java"):
+            with open(solution_file.absolute_path, errors="replace") as stream:
+                fingerprints.update(winnow(tokenize(stream.read())))
+    return fingerprints
+
+
+@atomic
+def index_solution(solution: Solution) -> None:
+    """Replace the stored fingerprints of the given solution."""
+    try:
+        fingerprints = fingerprint_solution(solution)
+    except OSError:
+        logger.warning("could not fingerprint %r", solution, exc_info=True)
+        return
+    Fingerprint.objects.filter(solution=solution).delete()
+    Fingerprint.objects.bulk_create(
+        [Fingerprint(solution=solution, value=value) for value in fingerprints], batch_size=1000
+    )
+
+
+def index_missing_solutions(solutions: Iterable[Solution]) -> int:
+    """Index the given solutions which have no fingerprints yet and return their number."""
+    solutions = list(solutions)
+    indexed = set(
+        Fingerprint.objects.filter(solution__in=solutions)
+        .values_list("solution_id", flat=True)
+        .distinct()
+    )
+    missing = [solution for solution in solutions if solution.id not in indexed]
+    for solution in missing:
+        index_solution(solution)
+    return len(missing)
+
+
+def get_template_fingerprints(task: Task) -> Set[int]:
+    """Return the fingerprints of the Java file templates (starter code) of the given task."""
+    fingerprints = set()
+    for template in FileTemplate.objects.filter(task=task, name__endswith=".java"):
+        fingerprints.update(winnow(tokenize(template.contents)))
+    return fingerprints
+
+
+def find_candidate_pairs(
+    solution_ids: Iterable[int], min_similarity: float, *, excluded: Set[int] = frozenset()
+) -> Dict[Tuple[int, int], float]:
+    """
+    Return the pairs of the given solutions whose fingerprint similarity is at least
+    min_similarity (in percent), together with their similarity.
+
+    The similarity of two solutions is the number of their shared fingerprints
+    relative to the number of fingerprints of the smaller solution. The excluded
+    fingerprints (e.g., of the file templates) and those shared by most of the
+    solutions are not taken into account.
+    """
+    solution_ids = set(solution_ids)
+    max_occurrences = max(MAX_PAIRED_OCCURRENCES, MAX_OCCURRENCE_RATIO * len(solution_ids))
+    rows = (
+        Fingerprint.objects.filter(solution_id__in=solution_ids)
+        .order_by("value", "solution_id")
+        .values_list("value", "solution_id")
+    )
+    sizes: Counter = Counter()
+    shared: Counter = Counter()
+    for value, group in groupby(rows.iterator(chunk_size=5000), key=lambda row: row[0]):
+        if value in excluded:
+            continue
+        members = [solution_id for _, solution_id in group]
+        if len(members) > max_occurrences:
+            continue
+        sizes.update(members)
+        if len(members) <= MAX_PAIRED_OCCURRENCES:
+            shared.update(combinations(members, 2))
+        else:
+            shared.update(zip(members, members[1:]))
+    candidates = {}
+    for (id1, id2), count in shared.items():
+        similarity = 100 * count / min(sizes[id1], sizes[id2])
+        if similarity >= min_similarity:
+            candidates[id1, id2] = similarity
+    return candidates
+
+
+def filter_candidates(
+    last_solutions: Dict[str, Solution], min_similarity: float, *, task: Task
+) -> Dict[str, Solution]:
+    """
+    Return the given solutions (by username) of the given task which form a candidate
+    pair with at least one of the other solutions, indexing the solutions first if
+    necessary.
+    """
+    index_missing_solutions(last_solutions.values())
+    pairs = find_candidate_pairs(
+        [solution.id for solution in last_solutions.values()],
+        min_similarity,
+        excluded=get_template_fingerprints(task),
+    )
+    flagged = {solution_id for pair in pairs for solution_id in pair}
+    return {
+        username: solution
+        for username, solution in last_solutions.items()
+        if solution.id in flagged
+    }
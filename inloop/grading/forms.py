@@ -0,0 +1,26 @@
+from typing import Any, Optional
+
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+class SimilarityThresholdForm(forms.Form):
+    min_similarity = forms.FloatField(min_value=0, max_value=100)
+
+    def __init__(self, *args: Any, min_stored_similarity: Optional[float], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.min_stored_similarity = min_stored_similarity
+
+    def clean_min_similarity(self) -> float:
+        """Reject thresholds below which the pairs of the test have not been stored."""
+        min_similarity = self.cleaned_data["min_similarity"]
+        if self.min_stored_similarity is None:
+            raise ValidationError(
+                "The similarities of this test are incomplete, since they have not been "
+                "stored or only the prefiltered solutions have been compared."
+            )
+        if min_similarity < self.min_stored_similarity:
+            raise ValidationError(
+                f"Only similarities of at least {self.min_stored_similarity:g}% have been stored."
+            )
+        return min_similarity
@@ -24,6 +24,23 @@ class Command(BaseCommand):
             type=int,
             default=default_similarity,
         )
+        parser.add_argument(
+            "--workers",
+            help=f"Number of concurrent JPlag processes (default: {settings.JPLAG_WORKERS})",
+            type=int,
+            default=settings.JPLAG_WORKERS,
+        )
+        parser.add_argument(
+            "--max_memory",
+            help=f"Maximum heap size per JPlag process (default: {settings.JPLAG_MAX_MEMORY})",
+            default=settings.JPLAG_MAX_MEMORY,
+        )
+        parser.add_argument(
+            "--prefilter",
+            help="Only check solutions with at least this fingerprint similarity (percent) "
+            "to another solution",
+            type=float,
+        )
 
     def handle(self, *args: str, **options: Any) -> None:
         users = User.objects.filter(is_staff=False)
@@ -31,4 +48,14 @@ class Command(BaseCommand):
         result_dir = Path(options["result_dir"])
         if result_dir.exists():
             raise CommandError("result_dir already exists")
-        jplag_check(users, tasks, options["min_similarity"], result_dir)
+        if options["workers"] < 1:
+            raise CommandError("workers must be >= 1")
+        jplag_check(
+            users,
+            tasks,
+            options["min_similarity"],
+            result_dir,
+            workers=options["workers"],
+            max_memory=options["max_memory"],
+            prefilter=options["prefilter"],
+        )
@@ -28,20 +28,22 @@ class Command(BaseCommand):
         start_date = datetime.strptime(options["start_date"], "%Y-%m-%d")
         self.stdout.write(f"Evaluating bonus points for solutions after {start_date}")
 
-        users = User.objects.filter(is_staff=False)
+        users = (
+            User.objects.filter(is_staff=False)
+            .select_related("studentdetails__course")
+            .iterator(chunk_size=2000)
+        )
         gradefunc = points_for_completed_tasks(options["category_name"], start_date, 10)
         grades = calculate_grades(users, gradefunc)
 
         if not options["zeroes"]:
             grades = filter_zeroes(grades)
 
-        # we guessed some names and can't sort at the database layer
-        grades = list(grades)
-        grades.sort()
-
+        # we guessed some names and can't sort at the database layer, but only the
+        # rows are kept in memory while the users are streamed from the database
         with open(options["csv_file"], mode="w", newline="") as csv_file:
             writer = csv.writer(csv_file)
-            for row in grades:
+            for row in sorted(grades):
                 writer.writerow(row)
 
         self.stdout.write(self.style.SUCCESS("Successfully created %s" % options["csv_file"]))
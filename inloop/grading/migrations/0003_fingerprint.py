@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2026-10-19 15:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("solutions", "0009_differential_checkpoints"),
+        ("grading", "0002_plagiarismtest_zip_file"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Fingerprint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "value",
+                    models.BigIntegerField(help_text="Hash of a winnowed k-gram of Java tokens"),
+                ),
+                (
+                    "solution",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="solutions.solution"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["value", "solution"], name="grading_fin_value_33fe29_idx")
+                ],
+                "unique_together": {("solution", "value")},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("solutions", "0009_differential_checkpoints"),
+        ("grading", "0003_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarityPair",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("similarity", models.FloatField(help_text="Similarity in percent")),
+                (
+                    "solution1",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="solutions.solution",
+                    ),
+                ),
+                (
+                    "solution2",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="solutions.solution",
+                    ),
+                ),
+                (
+                    "test",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="grading.plagiarismtest"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["test", "similarity"], name="grading_sim_test_id_9f298f_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_ripoff_tasks(apps, schema_editor):
+    DetectedPlagiarism = apps.get_model("grading", "DetectedPlagiarism")
+    RipoffTask = apps.get_model("grading", "RipoffTask")
+    rows = (
+        DetectedPlagiarism.objects.filter(veto=False)
+        .values_list("solution__author_id", "solution__task_id")
+        .distinct()
+    )
+    RipoffTask.objects.bulk_create(
+        (RipoffTask(user_id=user_id, task_id=task_id) for user_id, task_id in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tasks", "0010_task_description_html"),
+        ("grading", "0004_similaritypair"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RipoffTask",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="tasks.task"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "task")},
+            },
+        ),
+        migrations.RunPython(populate_ripoff_tasks, migrations.RunPython.noop),
+    ]
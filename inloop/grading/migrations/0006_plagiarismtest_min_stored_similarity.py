@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:23
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+
+def populate_min_stored_similarity(apps, schema_editor):
+    """
+    Regard the lowest similarity of the stored pairs of each test as its stored
+    minimum, which is safe since the actual minimum was not recorded and can only
+    be lower.
+    """
+    PlagiarismTest = apps.get_model("grading", "PlagiarismTest")
+    SimilarityPair = apps.get_model("grading", "SimilarityPair")
+    lowest = (
+        SimilarityPair.objects.filter(test=OuterRef("pk"))
+        .values("test")
+        .annotate(lowest=Min("similarity"))
+        .values("lowest")
+    )
+    PlagiarismTest.objects.update(min_stored_similarity=Subquery(lowest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grading", "0005_ripofftask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plagiarismtest",
+            name="min_stored_similarity",
+            field=models.FloatField(
+                help_text="Similarity down to which all compared pairs are stored (null if incomplete)",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(populate_min_stored_similarity, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,26 @@
 from __future__ import annotations
 
 import os
+from functools import reduce
+from operator import or_
+from pathlib import Path
 from shutil import make_archive
-from typing import Any, Set, Type
+from tempfile import TemporaryDirectory
+from typing import Any, Iterable, Optional, Set, Tuple, Type
 
 from django.contrib.auth.models import User
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files import File
 from django.db import models
+from django.db.models import Q
 from django.db.models.query import QuerySet
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from inloop.solutions.models import Solution
+from inloop.tasks.models import Task
+
+# two compared solutions and their similarity in percent
+SolutionPair = Tuple[Solution, Solution, float]
 
 
 def zipfile_upload_path(test: PlagiarismTest, filename: str) -> str:
@@ -24,6 +33,10 @@ class PlagiarismTest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     command = models.TextField(default="", help_text="Command that was used to perform the test")
     zip_file = models.FileField(upload_to=zipfile_upload_path, null=True)
+    min_stored_similarity = models.FloatField(
+        null=True,
+        help_text="Similarity down to which all compared pairs are stored (null if incomplete)",
+    )
 
     def __str__(self) -> str:
         return f"Plagiarism test #{self.id}"
@@ -60,21 +73,152 @@ class DetectedPlagiarism(models.Model):
         return f"solution #{self.solution_id:d}"
 
 
+class Fingerprint(models.Model):
+    """
+    Fingerprint of a solution, used to preselect solutions for plagiarism checks.
+
+    The index on the fingerprint values serves as an inverted index from the
+    fingerprints to the solutions containing them.
+    """
+
+    solution = models.ForeignKey(Solution, on_delete=models.CASCADE)
+    value = models.BigIntegerField(help_text="Hash of a winnowed k-gram of Java tokens")
+
+    class Meta:
+        unique_together = ("solution", "value")
+        indexes = [models.Index(fields=["value", "solution"])]
+
+    def __str__(self) -> str:
+        return f"{self.value:016x}"
+
+
+class SimilarityPair(models.Model):
+    """
+    Similarity of two solutions of the same task, as reported by JPlag.
+
+    The pairs are stored for the whole range of similarities which might be of
+    interest, so that the plagiarisms can be determined again with another
+    threshold without repeating the test.
+    """
+
+    test = models.ForeignKey(PlagiarismTest, on_delete=models.CASCADE)
+    solution1 = models.ForeignKey(Solution, on_delete=models.CASCADE, related_name="+")
+    solution2 = models.ForeignKey(Solution, on_delete=models.CASCADE, related_name="+")
+    similarity = models.FloatField(help_text="Similarity in percent")
+
+    class Meta:
+        indexes = [models.Index(fields=["test", "similarity"])]
+
+    def __str__(self) -> str:
+        return f"#{self.solution1_id} ~ #{self.solution2_id}: {self.similarity:.1f}%"
+
+
+class RipoffTask(models.Model):
+    """
+    Task for which a rip-off of a user has been detected and not been vetoed.
+
+    This is a denormalization of the detected plagiarisms, which allows grading
+    queries to exclude the tasks of a user without joining the solutions. It is
+    kept up to date by refresh_ripoff_tasks.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("user", "task")
+
+    def __str__(self) -> str:
+        return f"{self.user_id}@{self.task_id}"
+
+
 def get_ripoff_tasks_for_user(user: User) -> QuerySet:
     """Return tasks for which rip-offs were detected for this user."""
-    return (
-        DetectedPlagiarism.objects.filter(solution__author=user, veto=False)
-        .values_list("solution__task", flat=True)
-        .distinct()
+    return RipoffTask.objects.filter(user=user).values_list("task", flat=True)
+
+
+def refresh_ripoff_tasks(keys: Iterable[Tuple[int, int]]) -> None:
+    """
+    Bring the rip-off tasks of the given (user id, task id) pairs in line with the
+    detected plagiarisms.
+
+    This must be called after detected plagiarisms have been created, vetoed or
+    deleted without sending signals, e.g. with bulk_create or QuerySet.update.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    user_ids = {user_id for user_id, _ in keys}
+    task_ids = {task_id for _, task_id in keys}
+    detected = keys & set(
+        DetectedPlagiarism.objects.filter(
+            veto=False, solution__author_id__in=user_ids, solution__task_id__in=task_ids
+        ).values_list("solution__author_id", "solution__task_id")
+    )
+    stored = keys & set(
+        RipoffTask.objects.filter(user_id__in=user_ids, task_id__in=task_ids).values_list(
+            "user_id", "task_id"
+        )
+    )
+    stale = stored - detected
+    if stale:
+        RipoffTask.objects.filter(
+            reduce(or_, (Q(user_id=user_id, task_id=task_id) for user_id, task_id in stale))
+        ).delete()
+    RipoffTask.objects.bulk_create(
+        [RipoffTask(user_id=user_id, task_id=task_id) for user_id, task_id in detected - stored],
+        ignore_conflicts=True,
     )
 
 
-def save_plagiarism_set(plagiarism_set: Set[Solution], result_dir: str) -> None:
-    """Save the detected plagiarisms and zip file to the database."""
-    path_to_zip = make_archive(result_dir, "zip", result_dir)
-    with open(path_to_zip, mode="rb") as stream:
-        zip_file = SimpleUploadedFile("jplag_test.zip", stream.read())
-    test = PlagiarismTest.objects.create(zip_file=zip_file)
+def refresh_ripoff_tasks_of_solutions(solution_ids: Iterable[int]) -> None:
+    """Refresh the rip-off tasks of the authors of the given solutions."""
+    refresh_ripoff_tasks(
+        Solution.objects.filter(id__in=solution_ids).values_list("author_id", "task_id")
+    )
+
+
+@receiver(post_save, sender=DetectedPlagiarism, dispatch_uid="save_ripoff_task")
+@receiver(post_delete, sender=DetectedPlagiarism, dispatch_uid="delete_ripoff_task")
+def update_ripoff_task(
+    sender: Type[DetectedPlagiarism], instance: DetectedPlagiarism, **kwargs: Any
+) -> None:
+    """Refresh the rip-off task of a single detected plagiarism that was saved or deleted."""
+    refresh_ripoff_tasks_of_solutions([instance.solution_id])
+
+
+def save_plagiarism_set(
+    plagiarism_set: Set[Solution],
+    result_dir: str,
+    pairs: Iterable[SolutionPair] = (),
+    min_stored_similarity: Optional[float] = None,
+) -> None:
+    """
+    Save the detected plagiarisms, the compared pairs and zip file to the database.
+
+    The pairs must contain all compared pairs whose similarity is at least
+    min_stored_similarity, so that other thresholds can be applied later on.
+
+    The zip file is written to a temporary directory and streamed into the storage
+    from there, so that it is never held in memory as a whole.
+    """
+    with TemporaryDirectory() as tmpdir:
+        path_to_zip = make_archive(str(Path(tmpdir, "jplag_test")), "zip", result_dir)
+        with open(path_to_zip, mode="rb") as stream:
+            test = PlagiarismTest.objects.create(
+                zip_file=File(stream, name="jplag_test.zip"),
+                min_stored_similarity=min_stored_similarity,
+            )
     DetectedPlagiarism.objects.bulk_create(
         [DetectedPlagiarism(test=test, solution=solution) for solution in plagiarism_set]
     )
+    refresh_ripoff_tasks((solution.author_id, solution.task_id) for solution in plagiarism_set)
+    SimilarityPair.objects.bulk_create(
+        [
+            SimilarityPair(
+                test=test, solution1=solution1, solution2=solution2, similarity=similarity
+            )
+            for solution1, solution2, similarity in pairs
+        ],
+        batch_size=1000,
+    )
@@ -0,0 +1,108 @@
+"""
+Evaluation of the stored similarity pairs of plagiarism tests.
+
+Since JPlag reports the similarity of every compared pair, the plagiarisms of a
+test can be determined for any threshold down to the stored minimum from the
+database alone, without repeating the hour-long check.
+"""
+
+from typing import Dict, List
+
+from django.db.models import QuerySet
+from django.db.transaction import atomic
+
+from inloop.common.deletion import raw_delete_cascade
+from inloop.grading.models import (
+    DetectedPlagiarism,
+    PlagiarismTest,
+    SimilarityPair,
+    refresh_ripoff_tasks_of_solutions,
+)
+from inloop.solutions.models import Solution
+
+
+class Cluster:
+    """A group of solutions connected by pairs of similar solutions."""
+
+    def __init__(self) -> None:
+        self.solutions: Dict[int, Solution] = {}
+        self.pairs: List[SimilarityPair] = []
+
+    @property
+    def max_similarity(self) -> float:
+        return max(pair.similarity for pair in self.pairs)
+
+    def add(self, pair: SimilarityPair) -> None:
+        self.solutions[pair.solution1_id] = pair.solution1
+        self.solutions[pair.solution2_id] = pair.solution2
+        self.pairs.append(pair)
+
+    def merge(self, other: "Cluster") -> None:
+        self.solutions.update(other.solutions)
+        self.pairs.extend(other.pairs)
+
+
+def get_similar_pairs(test: PlagiarismTest, min_similarity: float) -> QuerySet:
+    """Return the pairs of the given test whose similarity is at least min_similarity."""
+    return (
+        SimilarityPair.objects.filter(test=test, similarity__gte=min_similarity)
+        .select_related("solution1__author", "solution1__task", "solution2__author")
+        .order_by("-similarity")
+    )
+
+
+def get_clusters(test: PlagiarismTest, min_similarity: float) -> List[Cluster]:
+    """
+    Return the connected groups of solutions of the given test whose similarity is at
+    least min_similarity, largest first.
+    """
+    clusters: Dict[int, Cluster] = {}
+    for pair in get_similar_pairs(test, min_similarity):
+        cluster = clusters.get(pair.solution1_id)
+        other = clusters.get(pair.solution2_id)
+        if cluster is None:
+            cluster, other = other, None
+        if cluster is None:
+            cluster = Cluster()
+        elif other is not None and other is not cluster:
+            cluster.merge(other)
+            for solution_id in other.solutions:
+                clusters[solution_id] = cluster
+        cluster.add(pair)
+        clusters[pair.solution1_id] = clusters[pair.solution2_id] = cluster
+    unique_clusters = {id(cluster): cluster for cluster in clusters.values()}.values()
+    return sorted(
+        unique_clusters,
+        key=lambda cluster: (len(cluster.solutions), cluster.max_similarity),
+        reverse=True,
+    )
+
+
+@atomic
+def apply_threshold(test: PlagiarismTest, min_similarity: float) -> int:
+    """
+    Replace the detected plagiarisms of the given test by the solutions of its pairs
+    whose similarity is at least min_similarity, and return their number.
+
+    Vetoed detections are kept, so that a veto survives a change of the threshold.
+    Raises ValueError if the pairs of the test have not been stored down to
+    min_similarity, since solutions would be dropped for lack of their pairs.
+    """
+    if test.min_stored_similarity is None or min_similarity < test.min_stored_similarity:
+        raise ValueError("the pairs of the test have not been stored down to min_similarity")
+    flagged = set()
+    for pair in get_similar_pairs(test, min_similarity).values_list("solution1", "solution2"):
+        flagged.update(pair)
+    removed = test.detectedplagiarism_set.filter(veto=False).exclude(solution_id__in=flagged)
+    removed_ids = set(removed.values_list("solution_id", flat=True))
+    # signals are not needed, since the rip-off tasks are refreshed at once below
+    raw_delete_cascade(removed)
+    existing = set(test.detectedplagiarism_set.values_list("solution_id", flat=True))
+    DetectedPlagiarism.objects.bulk_create(
+        [
+            DetectedPlagiarism(test=test, solution_id=solution_id)
+            for solution_id in flagged - existing
+        ]
+    )
+    refresh_ripoff_tasks_of_solutions(removed_ids | (flagged - existing))
+    return len(flagged)
@@ -3,15 +3,17 @@ Bonus point grading specific to TU Dresden.
 """
 
 import re
+from collections import Counter
 from datetime import datetime
 from string import capwords
-from typing import Callable, Iterable, Iterator, Tuple
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
 
 from django.contrib.auth.models import User
 from django.db.models import ObjectDoesNotExist
 from django.utils.timezone import make_aware
 
-from inloop.grading.models import get_ripoff_tasks_for_user
+from inloop.grading.models import RipoffTask
+from inloop.solutions.models import Solution
 from inloop.tasks.models import Category
 
 
@@ -54,25 +56,46 @@ def points_for_completed_tasks(
 
     Solutions are considered only if they were submitted after start_date.
     Points are limited by max_points.
+
+    The number of solved tasks is computed for all users at once on the first
+    call, so that grading any number of users takes a constant number of queries.
     """
     category = Category.objects.get(name=category_name)
     start_date = make_aware(start_date)
+    completed_tasks: Optional[Dict[int, int]] = None
 
     def func(user: User) -> int:
-        points = len(
-            category.task_set.exclude(id__in=get_ripoff_tasks_for_user(user))
-            .filter(
-                solution__passed=True,
-                solution__author=user,
-                solution__submission_date__gte=start_date,
-            )
-            .distinct()
-        )
-        return min(points, max_points)
+        nonlocal completed_tasks
+        if completed_tasks is None:
+            completed_tasks = count_completed_tasks(category, start_date)
+        return min(completed_tasks.get(user.id, 0), max_points)
 
     return func
 
 
+def count_completed_tasks(category: Category, start_date: datetime) -> Dict[int, int]:
+    """
+    Return the number of tasks in the category that each user has solved with a
+    solution submitted after start_date, by user id. Tasks for which rip-offs of
+    a user were detected are not counted for the user.
+    """
+    ripoffs = set(
+        RipoffTask.objects.filter(task__category=category).values_list("user_id", "task_id")
+    )
+    completed = (
+        Solution.objects.filter(
+            task__category=category, passed=True, submission_date__gte=start_date
+        )
+        .values_list("author_id", "task_id")
+        .distinct()
+    )
+    return Counter(
+        author_id
+        for author_id, task_id in completed.iterator(chunk_size=5000)
+        if (author_id, task_id) not in ripoffs
+    )
+
+
 def calculate_grades(users: Iterable[User], gradefunc: Callable[[User], int]) -> Iterator:
     """
     Generate a sequence of tuples with user data and the resulting grade using
@@ -225,12 +225,17 @@ HUEY = {
     "url": env("REDIS_URL"),
 }
 
+# buffered editor checkpoints must survive until they are flushed, so this Redis
+# must not evict keys (unlike a cache), see docs/INSTALL.md
+AUTOSAVE_REDIS_URL = env("AUTOSAVE_REDIS_URL", default=env("REDIS_URL"))
+
 # available options are documented in the DockerTestRunner class
 TESTRUNNER_OPTIONS = {
     "image": "inloop-testrunner",
     "timeout": 120,
     "output_limit": 30720,
     "filesize_limit": 81920,
+    "build_timeout": 600,
 }
 
 REPOSITORY_ROOT = str(Path(MEDIA_ROOT) / "repository")
@@ -268,3 +273,8 @@ CONSTANCE_CONFIG_FIELDSETS.update(tasks_constance.fieldsets)
 
 JPLAG_JAR_PATH = str(BASE_DIR / "lib" / "jplag-2.12.1-SNAPSHOT.jar")
 JPLAG_DEFAULT_SIMILARITY = 90
+JPLAG_WORKERS = env.int("JPLAG_WORKERS", default=2)
+JPLAG_MAX_MEMORY = env("JPLAG_MAX_MEMORY", default="1g")
+# pairs of solutions at least this similar are stored, so that plagiarism tests
+# can be evaluated with other thresholds afterwards
+JPLAG_MIN_STORED_SIMILARITY = env.int("JPLAG_MIN_STORED_SIMILARITY", default=50)
@@ -0,0 +1,146 @@
+"""
+Debounced autosave of editor checkpoints.
+
+The editor saves the files of a task every few seconds while a user is typing.
+Instead of writing each of these saves to the database, they are buffered in a
+Redis hash, where a newer save of a user for a task replaces the older one. A
+periodic task flushes the buffer to the database in batches.
+
+The buffer is kept on the Redis server of AUTOSAVE_REDIS_URL (by default the one
+of the queue) rather than on the cache server, which may evict keys under memory
+pressure. If no such server is configured, checkpoints are written to the
+database immediately.
+"""
+
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.transaction import atomic
+
+from redis import Redis
+from redis.exceptions import ResponseError
+
+from inloop.solutions.models import create_checkpoint
+from inloop.solutions.validators import validate_filenames
+from inloop.tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "inloop:autosave:buffer"
+FLUSHING_KEY = "inloop:autosave:flushing"
+
+
+_clients: Dict[str, Redis] = {}
+
+
+def get_connection() -> Optional[Redis]:
+    """Return a connection to the autosave Redis server or None if none is configured."""
+    url = settings.AUTOSAVE_REDIS_URL
+    if not url:
+        return None
+    if url not in _clients:
+        _clients[url] = _connect(url)
+    return _clients[url]
+
+
+def _connect(url: str) -> Redis:
+    return Redis.from_url(url)
+
+
+def _field(user_id: int, task_id: int) -> str:
+    return f"{user_id}:{task_id}"
+
+
+def save_checkpoint(files: Iterable[Dict], task: Task, user: User) -> None:
+    """
+    Validate the given files and save them as the user's checkpoint for the task.
+
+    The checkpoint is written to the autosave buffer, if available, and
+    otherwise to the database.
+    """
+    connection = get_connection()
+    if connection is None:
+        create_checkpoint(files, task, user)
+        return
+    validate_filenames([file["name"] for file in files])
+    payload = [{"name": file["name"], "contents": file["contents"]} for file in files]
+    connection.hset(BUFFER_KEY, _field(user.id, task.id), json.dumps(payload))
+
+
+def get_buffered_files(task: Task, user: User) -> Optional[List[Dict[str, str]]]:
+    """
+    Return the files of the user's checkpoint for the task that have not yet been
+    flushed to the database, or None if there is no such checkpoint.
+    """
+    connection = get_connection()
+    if connection is None:
+        return None
+    field = _field(user.id, task.id)
+    # MULTI/EXEC ensures we don't miss a checkpoint that is moved by a concurrent flush
+    pipeline = connection.pipeline()
+    pipeline.hget(BUFFER_KEY, field)
+    pipeline.hget(FLUSHING_KEY, field)
+    for payload in pipeline.execute():
+        if payload is not None:
+            return json.loads(payload)
+    return None
+
+
+def flush_checkpoints(*, batch_size: int = 100) -> int:
+    """
+    Write the buffered checkpoints to the database and return their number.
+
+    The buffer is atomically renamed before it is flushed, so that new saves can be
+    buffered meanwhile. If a flush is interrupted, the renamed buffer is left in place
+    and flushed first on the next invocation. Concurrent invocations are not allowed.
+    """
+    connection = get_connection()
+    if connection is None:
+        return 0
+    if not connection.exists(FLUSHING_KEY):
+        try:
+            connection.rename(BUFFER_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # the buffer key does not exist, i.e., nothing has been saved
+            return 0
+    num_flushed = 0
+    for batch in _batched_entries(connection.hscan_iter(FLUSHING_KEY), batch_size):
+        num_flushed += _flush_batch(batch)
+    connection.delete(FLUSHING_KEY)
+    return num_flushed
+
+
+def _batched_entries(
+    entries: Iterable[Tuple[bytes, bytes]], batch_size: int
+) -> Iterator[List[Tuple[int, int, List[Dict]]]]:
+    batch = []
+    for field, payload in entries:
+        user_id, task_id = map(int, field.split(b":"))
+        batch.append((user_id, task_id, json.loads(payload)))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@atomic
+def _flush_batch(batch: List[Tuple[int, int, List[Dict]]]) -> int:
+    users = User.objects.in_bulk({user_id for user_id, _, _ in batch})
+    tasks = Task.objects.in_bulk({task_id for _, task_id, _ in batch})
+    num_flushed = 0
+    for user_id, task_id, files in batch:
+        if user_id not in users or task_id not in tasks:
+            # the user or task has been deleted in the meantime
+            continue
+        try:
+            create_checkpoint(files, tasks[task_id], users[user_id])
+            num_flushed += 1
+        except ValidationError:
+            # e.g., the allowed filename extensions have been changed in the meantime
+            logger.warning("discarded invalid checkpoint of user %d for task %d", user_id, task_id)
+    return num_flushed
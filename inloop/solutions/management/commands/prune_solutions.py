@@ -1,9 +1,13 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db.models import QuerySet
 
-from inloop.solutions.models import get_prunable_solutions
+from inloop.common.deletion import remove_files
+from inloop.solutions.models import SolutionFile, delete_solutions_chunked, get_prunable_solutions
 from inloop.tasks.models import Task
 
 
@@ -17,21 +21,72 @@ class Command(BaseCommand):
             default=10,
             type=int,
         )
+        parser.add_argument(
+            "--chunk_size",
+            help="Number of solutions to delete per transaction (default is 1000).",
+            default=1000,
+            type=int,
+        )
+        parser.add_argument(
+            "--workers",
+            help="Number of threads used to remove files (default is 4).",
+            default=4,
+            type=int,
+        )
+        parser.add_argument(
+            "--dry_run",
+            help="Only report what would be pruned.",
+            action="store_true",
+        )
 
     def handle(self, *args: str, **options: Any) -> None:
         max_keep = options["max_keep"]
         if max_keep < 1:
             raise CommandError("max_keep must be >= 1.")
-        solutions_to_delete = get_prunable_solutions(
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("chunk_size and workers must be >= 1.")
+        solutions = get_prunable_solutions(
             users=User.objects.all(),
             tasks=Task.objects.all(),
             max_keep=max_keep,
         )
-        num_deleted = 0
-        for solutions in solutions_to_delete:
-            num_deleted += solutions.count()
-            solutions.delete()
-        self.stdout.write(f"Pruned {num_deleted} solution(s) from the database.")
-        self.stdout.write("If the unix uid that ran this command was not the owner of the ")
-        self.stdout.write("MEDIA_ROOT/solutions folder, you need to review and delete files ")
-        self.stdout.write("manually using the unreferenced_files management command.")
+        if options["dry_run"]:
+            self.report(solutions)
+        else:
+            self.prune(solutions, chunk_size=options["chunk_size"], workers=options["workers"])
+
+    def report(self, solutions: QuerySet) -> None:
+        num_solutions = solutions.count()
+        num_files = SolutionFile.objects.filter(solution_id__in=solutions.values("id")).count()
+        self.stdout.write(f"Would prune {num_solutions} solution(s) with {num_files} file(s).")
+
+    def prune(self, solutions: QuerySet, *, chunk_size: int, workers: int) -> None:
+        num_deleted = num_files = 0
+        start_time = time.perf_counter()
+        # files are removed in the background while the next chunks are deleted
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for num_chunk_deleted, filenames in delete_solutions_chunked(
+                solutions, chunk_size=chunk_size
+            ):
+                num_deleted += num_chunk_deleted
+                num_files += len(filenames)
+                futures.extend(
+                    executor.submit(remove_files, filenames[i : i + 100])
+                    for i in range(0, len(filenames), 100)
+                )
+            db_duration = time.perf_counter() - start_time
+            num_removed = sum(future.result() for future in futures)
+        duration = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Pruned {num_deleted} solution(s) from the database in {db_duration:.2f}s "
+            f"({num_deleted / max(db_duration, 1e-6):.0f} solutions/s)."
+        )
+        self.stdout.write(
+            f"Removed {num_removed} of {num_files} file(s) in {duration:.2f}s "
+            f"using {workers} worker(s)."
+        )
+        if num_removed < num_files:
+            self.stdout.write("If the unix uid that ran this command was not the owner of the ")
+            self.stdout.write("MEDIA_ROOT/solutions folder, you need to review and delete files ")
+            self.stdout.write("manually using the unreferenced_files management command.")
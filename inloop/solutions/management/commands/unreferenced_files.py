@@ -0,0 +1,159 @@
+import heapq
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.functions import Collate
+
+from inloop.common.deletion import remove_file
+from inloop.solutions.models import Solution, SolutionFile
+
+# the MEDIA_ROOT subdirectories which contain files referenced by solutions
+SCANNED_DIRS = ["archives", "solutions"]
+
+
+def scan_files(root: str, relpath: str, *, max_mtime: float) -> Iterator[str]:
+    """
+    Recursively yield the paths of all files under root/relpath, relative to root
+    and in ascending (code point) order. Files modified after max_mtime are skipped.
+
+    Only one directory listing is held in memory at a time. The entries of a
+    directory are sorted with a trailing slash appended to subdirectory names, so
+    that the generated paths are in the same order as a sorted list of path strings.
+    """
+    try:
+        with os.scandir(os.path.join(root, relpath)) as iterator:
+            entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in iterator]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry[0] + "/" if entry[1] else entry[0])
+    for name, is_dir in entries:
+        path = f"{relpath}/{name}"
+        if is_dir:
+            yield from scan_files(root, path, max_mtime=max_mtime)
+        elif os.lstat(os.path.join(root, path)).st_mtime <= max_mtime:
+            yield path
+
+
+def stream_sorted(queryset: QuerySet, field: str, *, chunk_size: int = 5000) -> Iterator[str]:
+    """
+    Yield the non-empty values of the given field in ascending (code point) order,
+    using a server-side cursor to keep memory usage bounded.
+    """
+    # sort bytewise instead of by the database's locale-aware default collation
+    collation = "C" if connection.vendor == "postgresql" else "BINARY"
+    return (
+        queryset.filter(**{f"{field}__gt": ""})
+        .order_by(Collate(field, collation))
+        .values_list(field, flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def find_unreferenced(files: Iterable[str], references: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the files that are not contained in references, using a sorted merge.
+
+    Both iterables must be sorted in ascending order.
+    """
+    references = iter(references)
+    reference = next(references, None)
+    for file in files:
+        while reference is not None and reference < file:
+            reference = next(references, None)
+        if reference != file:
+            yield file
+
+
+def batched(iterable: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Yield lists with up to size items from the given iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Find files in MEDIA_ROOT/archives and MEDIA_ROOT/solutions that are not "
+        "referenced by any solution, and optionally delete or quarantine them."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument("--delete", help="Delete unreferenced files.", action="store_true")
+        action.add_argument(
+            "--quarantine",
+            metavar="DIR",
+            help="Move unreferenced files to the given directory, preserving their paths.",
+        )
+        parser.add_argument(
+            "--min_age",
+            help="Ignore files modified less than this many minutes ago (default is 60).",
+            default=60,
+            type=int,
+        )
+        parser.add_argument(
+            "--workers",
+            help="Number of threads used to delete or move files (default is 4).",
+            default=4,
+            type=int,
+        )
+
+    def handle(self, *args: str, **options: Any) -> None:
+        if options["min_age"] < 0 or options["workers"] < 1:
+            raise CommandError("min_age must be >= 0 and workers must be >= 1.")
+        quarantine = options["quarantine"]
+        media_root = os.path.realpath(settings.MEDIA_ROOT)
+        if quarantine and os.path.realpath(quarantine).startswith(media_root + os.sep):
+            raise CommandError("The quarantine directory must not be inside MEDIA_ROOT.")
+        max_mtime = time.time() - options["min_age"] * 60
+        files = heapq.merge(
+            *(scan_files(settings.MEDIA_ROOT, path, max_mtime=max_mtime) for path in SCANNED_DIRS)
+        )
+        references = heapq.merge(
+            stream_sorted(SolutionFile.objects.all(), "file"),
+            stream_sorted(Solution.objects.all(), "archive"),
+        )
+        unreferenced = find_unreferenced(files, references)
+        if quarantine:
+            self.process(unreferenced, self.quarantine_file(quarantine), options["workers"])
+        elif options["delete"]:
+            self.process(unreferenced, remove_file, options["workers"])
+        else:
+            num_files = 0
+            for file in unreferenced:
+                self.stdout.write(file)
+                num_files += 1
+            self.stdout.write(f"Found {num_files} unreferenced file(s).")
+
+    def quarantine_file(self, quarantine: str) -> Callable[[str], bool]:
+        def func(name: str) -> bool:
+            target = os.path.join(quarantine, name)
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(os.path.join(settings.MEDIA_ROOT, name), target)
+            except (FileNotFoundError, PermissionError):
+                return False
+            return True
+
+        return func
+
+    def process(self, files: Iterable[str], action: Callable[[str], bool], workers: int) -> None:
+        num_files = num_processed = 0
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in batched(files, 1000):
+                num_files += len(batch)
+                num_processed += sum(executor.map(action, batch))
+        duration = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Processed {num_processed} of {num_files} unreferenced file(s) "
+            f"in {duration:.2f}s using {workers} worker(s)."
+        )
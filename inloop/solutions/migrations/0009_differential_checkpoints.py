@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-19 15:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0009_task_group"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("solutions", "0009_remove_duplicate_checkpoints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="checkpointfile",
+            name="sha1",
+            field=models.CharField(
+                default="", help_text="SHA1 hash of the contents", max_length=40
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="checkpoint",
+            unique_together={("author", "task")},
+        ),
+        migrations.AlterUniqueTogether(
+            name="checkpointfile",
+            unique_together={("checkpoint", "name")},
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-19 15:32
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep only the latest checkpoint per author and task, and file per checkpoint."""
+    Checkpoint = apps.get_model("solutions", "Checkpoint")
+    CheckpointFile = apps.get_model("solutions", "CheckpointFile")
+    latest_checkpoints = Checkpoint.objects.values("author", "task").annotate(
+        latest_id=Max("id")
+    )
+    Checkpoint.objects.exclude(id__in=latest_checkpoints.values("latest_id")).delete()
+    latest_files = CheckpointFile.objects.values("checkpoint", "name").annotate(
+        latest_id=Max("id")
+    )
+    CheckpointFile.objects.exclude(id__in=latest_files.values("latest_id")).delete()
+
+
+# The duplicates are removed in a migration of their own, since PostgreSQL can't
+# alter a table with pending trigger events of deleted rows in the same transaction.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("solutions", "0008_remove_checkpoint_md5"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    """Regard existing checkpoints as last updated when they were created."""
+    Checkpoint = apps.get_model("solutions", "Checkpoint")
+    Checkpoint.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("solutions", "0009_differential_checkpoints"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="checkpoint",
+            options={"ordering": ["updated_at"]},
+        ),
+        migrations.AddField(
+            model_name="checkpoint",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-19 16:32
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_counted(apps, schema_editor):
+    """The existing solutions have been counted by the rollups of the statistics app."""
+    Solution = apps.get_model("solutions", "Solution")
+    Solution.objects.update(counted_passed=F("passed"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("solutions", "0010_checkpoint_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="solution",
+            name="counted_passed",
+            field=models.BooleanField(
+                editable=False,
+                help_text="Result the solution is counted with in statistics",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(mark_counted, migrations.RunPython.noop),
+    ]
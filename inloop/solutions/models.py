@@ -1,21 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
 import string
 from contextlib import suppress
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, Type, Union
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Type, Union
 from zipfile import ZIP_DEFLATED, ZipFile
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.db import IntegrityError, models
-from django.db.models import QuerySet
+from django.db.models import F, QuerySet, Window
 from django.db.models.aggregates import Max
-from django.db.models.functions import Coalesce
+from django.db.models.functions import Coalesce, RowNumber
 from django.db.models.signals import post_delete
 from django.db.transaction import atomic
 from django.dispatch import receiver
@@ -25,8 +26,10 @@ from django.utils import timezone
 from constance import config
 from huey.contrib.djhuey import db_task, lock_task
 
+from inloop.common.deletion import raw_delete_cascade
 from inloop.solutions.signals import solution_submitted
 from inloop.solutions.validators import validate_filenames
+from inloop.statistics.models import update_rollups_on_commit
 from inloop.tasks.models import Task
 
 hash_chars = string.digits + string.ascii_lowercase[:22]
@@ -58,22 +61,81 @@ def get_upload_path(obj: SolutionFile, filename: str) -> str:
     )
 
 
-def get_prunable_solutions(
-    *, users: Iterable[User], tasks: Iterable[Task], max_keep: int
-) -> Iterator[QuerySet]:
+def get_prunable_solutions(*, users: QuerySet, tasks: QuerySet, max_keep: int) -> QuerySet:
     """
-    Yield querysets of solutions that can be deleted if only max_keep solutions
+    Return a queryset of solutions that can be deleted if only max_keep solutions
     should be retained per user and task of the given user and task querysets.
 
+    The solutions are ranked per author and task with the window function
+    ROW_NUMBER() OVER (PARTITION BY author, task ORDER BY id DESC), so a single
+    query finds all prunable solutions regardless of the number of users and tasks.
+
     `max_keep` should be chosen such that it is not smaller than the current
     highest submission limit for a task, because this breaks some assumptions
     made about counting the submissions.
     """
-    for user in users:
-        for task in tasks:
-            solutions = Solution.objects.filter(task=task, author=user)
-            solutions_to_keep = solutions.order_by("-id")[:max_keep]
-            yield solutions.exclude(id__in=solutions_to_keep)
+    return (
+        Solution.objects.filter(author__in=users, task__in=tasks)
+        .annotate(
+            row_number=Window(
+                RowNumber(), partition_by=[F("author"), F("task")], order_by=F("id").desc()
+            )
+        )
+        .filter(row_number__gt=max_keep)
+    )
+
+
+def get_solution_filenames(solution_ids: Iterable[int]) -> List[str]:
+    """Return the storage names of all files and archives of the given solutions."""
+    filenames = list(
+        SolutionFile.objects.filter(solution_id__in=solution_ids).values_list("file", flat=True)
+    )
+    filenames.extend(
+        Solution.objects.filter(id__in=solution_ids, archive__gt="").values_list(
+            "archive", flat=True
+        )
+    )
+    return filenames
+
+
+def delete_solutions_chunked(
+    solutions: QuerySet, *, chunk_size: int
+) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Delete the given solutions in chunks of chunk_size, each chunk in its own
+    transaction, and yield the number of deleted solutions along with the storage
+    names of their files after every committed chunk.
+
+    Rows are removed with set-based DELETE statements, so neither model instances
+    are loaded nor post_delete signals are sent. Hence, it is the caller's
+    responsibility to remove the yielded files from storage. The rip-off tasks of
+    deleted solutions with detected plagiarisms are refreshed explicitly.
+
+    Chunks are selected in ascending id order (keyset pagination). This is compatible
+    with get_prunable_solutions(…), because the rank of a solution only depends on the
+    solutions with a higher id in its partition.
+    """
+    from inloop.grading.models import refresh_ripoff_tasks
+
+    last_id = 0
+    while True:
+        ids = list(
+            solutions.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        chunk = Solution.objects.filter(id__in=ids)
+        with atomic():
+            filenames = get_solution_filenames(ids)
+            flagged = list(
+                chunk.filter(detectedplagiarism__isnull=False).values_list("author_id", "task_id")
+            )
+            num_deleted = raw_delete_cascade(chunk)
+            refresh_ripoff_tasks(flagged)
+        yield num_deleted, filenames
+        last_id = ids[-1]
 
 
 def get_archive_upload_path(solution: Solution, filename: str) -> str:
@@ -98,7 +160,7 @@ def create_archive(solution: Solution) -> None:
     solution.archive = SimpleUploadedFile(
         name=stream.name, content=stream.getvalue(), content_type="application/zip"
     )
-    solution.save()
+    solution.save(update_fields=["archive"])
 
 
 @db_task()
@@ -156,6 +218,7 @@ def _atomic_submit(files: Iterable[UploadedFile], author: User, task: Task) -> S
     SolutionFile.objects.bulk_create(
         [SolutionFile(solution=solution, file=file) for file in files]
     )
+    update_rollups_on_commit(solution)
     return solution
 
 
@@ -177,6 +240,9 @@ class Solution(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     passed = models.BooleanField(default=False)
+    counted_passed = models.BooleanField(
+        null=True, editable=False, help_text="Result the solution is counted with in statistics"
+    )
 
     archive = models.FileField(upload_to=get_archive_upload_path, blank=True, null=True)
 
@@ -309,17 +375,40 @@ def auto_delete_file_on_delete(
             os.remove(instance.file.path)
 
 
+def hash_contents(contents: str) -> str:
+    """Return the SHA1 hex digest of the given file contents."""
+    return hashlib.sha1(contents.encode(errors="replace")).hexdigest()
+
+
 @atomic
 def create_checkpoint(files: Iterable[Dict], task: Task, user: User) -> None:
+    """
+    Save the given files as the user's checkpoint for the given task.
+
+    Only files whose content hash has changed since the last save are written (using
+    a single UPSERT statement), and files that are no longer present are deleted.
+    """
     validate_filenames([file["name"] for file in files])
-    Checkpoint.objects.filter(author=user, task=task).delete()
-    checkpoint = Checkpoint.objects.create(author=user, task=task)
-    CheckpointFile.objects.bulk_create(
-        [
-            CheckpointFile(checkpoint=checkpoint, name=file["name"], contents=file["contents"])
-            for file in files
-        ]
-    )
+    # an update of an existing checkpoint refreshes its updated_at
+    checkpoint, _ = Checkpoint.objects.update_or_create(author=user, task=task)
+    contents = {file["name"]: file["contents"] for file in files}
+    stored_hashes = dict(checkpoint.checkpointfile_set.values_list("name", "sha1"))
+    if stored_hashes.keys() - contents.keys():
+        checkpoint.checkpointfile_set.exclude(name__in=contents).delete()
+    changed_files = []
+    for name, content in contents.items():
+        sha1 = hash_contents(content)
+        if stored_hashes.get(name) != sha1:
+            changed_files.append(
+                CheckpointFile(checkpoint=checkpoint, name=name, contents=content, sha1=sha1)
+            )
+    if changed_files:
+        CheckpointFile.objects.bulk_create(
+            changed_files,
+            update_conflicts=True,
+            unique_fields=["checkpoint", "name"],
+            update_fields=["contents", "sha1"],
+        )
 
 
 class Checkpoint(models.Model):
@@ -328,15 +417,18 @@ class Checkpoint(models.Model):
 
     After the user saves his solution in the online code editor,
     a checkpoint is created. This checkpoint can be used to restore
-    the last workstate in the online code editor.
+    the last workstate in the online code editor. There is at most
+    one checkpoint per user and task, which is updated on every save.
     """
 
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ["created_at"]
+        ordering = ["updated_at"]
+        unique_together = ("author", "task")
 
     def __str__(self) -> str:
         return f"task_id={self.task_id}, author_id={self.author_id}"
@@ -348,9 +440,11 @@ class CheckpointFile(models.Model):
     checkpoint = models.ForeignKey(Checkpoint, on_delete=models.CASCADE)
     name = models.TextField()
     contents = models.TextField()
+    sha1 = models.CharField(max_length=40, default="", help_text="SHA1 hash of the contents")
 
     class Meta:
         ordering = ["name"]
+        unique_together = ("checkpoint", "name")
 
     def __str__(self) -> str:
         return self.name
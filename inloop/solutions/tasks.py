@@ -0,0 +1,16 @@
+import logging
+
+from huey import crontab
+from huey.contrib.djhuey import HUEY, db_periodic_task
+
+from inloop.solutions.autosave import flush_checkpoints
+
+logger = logging.getLogger(__name__)
+
+
+@db_periodic_task(crontab(minute="*"))
+def autoflush_checkpoints() -> None:
+    with HUEY.lock_task("autosave-flush-lock"):
+        num_flushed = flush_checkpoints()
+    if num_flushed:
+        logger.info(f"Flushed {num_flushed} buffered checkpoint(s).")
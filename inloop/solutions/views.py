@@ -9,6 +9,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models import ObjectDoesNotExist, Q
@@ -17,6 +18,12 @@ from django.http import Http404, HttpRequest, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils.cache import (
+    add_never_cache_headers,
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
@@ -26,17 +33,17 @@ from django.views.generic import DetailView, View
 from constance import config
 from huey.exceptions import TaskLockedException
 
+from inloop.solutions import autosave
 from inloop.solutions.models import (
     Checkpoint,
     Solution,
     SolutionFile,
     SubmissionError,
     create_archive_async,
-    create_checkpoint,
     submit,
 )
 from inloop.solutions.prettyprint.junit import checkeroutput_filter, xml_to_dict
-from inloop.tasks.models import FileTemplate, Task
+from inloop.tasks.models import FileTemplate, Task, get_file_templates_version
 
 
 class HttpResponseBadJsonRequest(JsonResponse):
@@ -136,7 +143,7 @@ class SideBySideEditorView(LoginRequiredMixin, View):
             # if it's a name and not a slug, get_visible_task_or_404(…) will make it fail with 404
             task = get_visible_task_or_404(request.user, slug_or_name)
             data = parse_json_payload(request.body)
-            create_checkpoint(data["files"], task, request.user)
+            autosave.save_checkpoint(data["files"], task, request.user)
             files = [
                 SimpleUploadedFile(file["name"], file["contents"].encode())
                 for file in data["files"]
@@ -324,18 +331,45 @@ class SolutionFileView(LoginRequiredMixin, DetailView):
         return context
 
 
-@never_cache
 @login_required
 def get_last_checkpoint(request: HttpRequest, slug: str) -> HttpResponse:
     task = get_object_or_404(Task.objects.published(), slug=slug)
-    last_checkpoint = Checkpoint.objects.filter(author=request.user, task=task).last()
-    queryset = []
-    if last_checkpoint:
-        queryset = last_checkpoint.checkpointfile_set.order_by("id")
-    if not queryset:
-        queryset = FileTemplate.objects.filter(task=task)
-    files = [{"name": _file.name, "contents": _file.contents} for _file in queryset]
-    return JsonResponse({"success": True, "files": files})
+    files = autosave.get_buffered_files(task, request.user)
+    if files is None:
+        last_checkpoint = Checkpoint.objects.filter(author=request.user, task=task).last()
+        files = []
+        if last_checkpoint:
+            queryset = last_checkpoint.checkpointfile_set.order_by("id")
+            files = [{"name": _file.name, "contents": _file.contents} for _file in queryset]
+    if not files:
+        return file_templates_response(request, task)
+    response = JsonResponse({"success": True, "files": files})
+    add_never_cache_headers(response)
+    return response
+
+
+def file_templates_response(request: HttpRequest, task: Task) -> HttpResponse:
+    """
+    Return the file templates of the given task in the same format as the checkpoints.
+
+    The serialized templates are cached per task and version, and clients are
+    required to revalidate them using the ETag header.
+    """
+    version = get_file_templates_version(task)
+    etag = quote_etag(version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f"inloop:filetemplates:{version}"
+        content = cache.get(cache_key)
+        if content is None:
+            queryset = FileTemplate.objects.filter(task=task)
+            files = [{"name": _file.name, "contents": _file.contents} for _file in queryset]
+            content = json.dumps({"success": True, "files": files})
+            cache.set(cache_key, content, timeout=24 * 3600)
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True, max_age=0)
+    return response
 
 
 @require_POST
@@ -344,7 +378,7 @@ def save_checkpoint(request: HttpRequest, slug: str) -> HttpResponse:
     task = get_object_or_404(Task.objects.published(), slug=slug)
     try:
         files = parse_json_payload(request.body)["files"]
-        create_checkpoint(files, task, request.user)
+        autosave.save_checkpoint(files, task, request.user)
     except JSONDecodeError:
         return HttpResponseBadJsonRequest()
     except ValidationError as error:
@@ -0,0 +1,75 @@
+"""
+Per-task metrics about how students work on a task.
+
+The metrics are computed by the database using aggregations and window functions,
+so that only a single row per student (or per attempt number) has to be fetched.
+"""
+
+from statistics import median
+from typing import Any, Dict, Iterable, Optional
+
+from django.db.models import Case, Count, F, Min, Q, When, Window
+from django.db.models.functions import CumeDist
+
+from inloop.solutions.models import Solution
+from inloop.testrunner.models import TestResult
+
+DURATION_PERCENTILES = [50, 90, 99]
+
+
+def get_task_metrics(task_id: int) -> Dict[str, Any]:
+    """Return the metrics of the given task as a JSON serializable dict."""
+    return {
+        "median_time_to_pass": get_median_time_to_pass(task_id),
+        "pass_rates": get_pass_rates(task_id),
+        "duration_percentiles": get_duration_percentiles(task_id, DURATION_PERCENTILES),
+    }
+
+
+def get_median_time_to_pass(task_id: int) -> Optional[float]:
+    """
+    Return the median number of seconds from the first submission of a student to
+    their first passed submission, or None if nobody has passed the task.
+    """
+    first_passes = (
+        Solution.objects.filter(task_id=task_id)
+        .annotate(
+            first_submission=Window(Min("submission_date"), partition_by=[F("author_id")]),
+            first_pass=Window(
+                Min(Case(When(passed=True, then="scoped_id"))), partition_by=[F("author_id")]
+            ),
+        )
+        .filter(scoped_id=F("first_pass"))
+        .values_list("submission_date", "first_submission")
+    )
+    durations = [(passed - first).total_seconds() for passed, first in first_passes]
+    return median(durations) if durations else None
+
+
+def get_pass_rates(task_id: int) -> Dict[int, float]:
+    """Return the share of passed solutions for each attempt number."""
+    attempts = (
+        Solution.objects.filter(task_id=task_id)
+        .values("scoped_id")
+        .annotate(total=Count("pk"), passed=Count("pk", filter=Q(passed=True)))
+        .order_by("scoped_id")
+    )
+    return {row["scoped_id"]: row["passed"] / row["total"] for row in attempts}
+
+
+def get_duration_percentiles(task_id: int, percentiles: Iterable[int]) -> Dict[int, float]:
+    """
+    Return the given percentiles (nearest-rank) of the time taken by the test runner
+    to check the solutions of the given task, omitting them if there are no results.
+    """
+    results = TestResult.objects.filter(solution__task_id=task_id).annotate(
+        cume_dist=Window(CumeDist(), order_by=F("time_taken").asc())
+    )
+    values = {}
+    for percentile in percentiles:
+        value = results.filter(cume_dist__gte=percentile / 100).aggregate(value=Min("time_taken"))[
+            "value"
+        ]
+        if value is not None:
+            values[percentile] = value
+    return values
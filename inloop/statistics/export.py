@@ -0,0 +1,119 @@
+"""
+Export of raw per-solution data for course evaluations.
+
+The solutions are read with a server-side cursor and written row by row, so that
+the memory usage stays bounded regardless of the number of exported solutions.
+"""
+
+import csv
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.db.models import OuterRef, QuerySet, Subquery
+from django.utils import timezone
+
+from inloop.solutions.models import Solution
+from inloop.testrunner.models import TestResult
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+EXPORT_COLUMNS = [
+    "solution_id",
+    "scoped_id",
+    "author",
+    "task",
+    "category",
+    "submission_date",
+    "passed",
+    "status",
+    "time_taken",
+]
+
+
+class Echo:
+    """File-like object that returns what is written instead of buffering it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def get_export_queryset(filters: Dict[str, Any]) -> QuerySet:
+    """
+    Return the rows of the solutions matching the given cleaned data of a
+    SubmissionsHistogramForm, together with the return code and the duration of
+    their latest test result.
+    """
+    latest_result = TestResult.objects.filter(solution=OuterRef("pk")).order_by("-id")
+    queryset = Solution.objects.all()
+    if filters.get("from_timestamp"):
+        queryset = queryset.filter(submission_date__gte=filters["from_timestamp"])
+    if filters.get("to_timestamp"):
+        queryset = queryset.filter(submission_date__lte=filters["to_timestamp"])
+    if filters.get("passed") is not None:
+        queryset = queryset.filter(passed=filters["passed"])
+    if filters.get("category_id") is not None:
+        queryset = queryset.filter(task__category_id=filters["category_id"])
+    return (
+        queryset.annotate(
+            return_code=Subquery(latest_result.values("return_code")[:1]),
+            time_taken=Subquery(latest_result.values("time_taken")[:1]),
+        )
+        .order_by("id")
+        .values_list(
+            "id",
+            "scoped_id",
+            "author__username",
+            "task__system_name",
+            "task__category__name",
+            "submission_date",
+            "passed",
+            "return_code",
+            "time_taken",
+        )
+    )
+
+
+def get_status(return_code: Optional[int]) -> str:
+    """Return the status of a solution whose latest test result has the given return code."""
+    if return_code is None:
+        return "pending"
+    return TestResult(return_code=return_code).status()
+
+
+def export_rows(filters: Dict[str, Any], *, chunk_size: int = 2000) -> Iterator[Tuple]:
+    """Yield the export rows of the solutions matching the given filters."""
+    for row in get_export_queryset(filters).iterator(chunk_size=chunk_size):
+        *values, submission_date, passed, return_code, time_taken = row
+        yield (
+            *values,
+            timezone.localtime(submission_date).isoformat(),
+            passed,
+            get_status(return_code),
+            time_taken,
+        )
+
+
+def write_csv(rows: Iterable[Tuple]) -> Iterator[str]:
+    """Yield the given rows as lines of a CSV file with a header."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_ndjson(rows: Iterable[Tuple]) -> Iterator[str]:
+    """Yield the given rows as newline-delimited JSON objects."""
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n"
+
+
+def export(filters: Dict[str, Any], export_format: str) -> Iterator[str]:
+    """Yield the solutions matching the given filters in the given format."""
+    writer = write_ndjson if export_format == "ndjson" else write_csv
+    return writer(export_rows(filters))
+
+
+def get_export_filename(export_format: str) -> str:
+    """Return the name of an export file created now."""
+    return f"solutions-{datetime.now():%Y%m%d-%H%M%S}.{export_format}"
@@ -26,6 +26,14 @@ class SubmissionsHistogramForm(forms.Form):
     granularity = forms.CharField(validators=[validate_granularity], required=False)
 
 
+class SubmissionsExportForm(SubmissionsHistogramForm):
+    format = forms.ChoiceField(choices=[("csv", "CSV"), ("ndjson", "NDJSON")], required=False)
+
+
 class AttemptsHistogramForm(forms.Form):
     queryset_limit = forms.IntegerField(required=False)
     task_id = forms.IntegerField()
+
+
+class TaskAnalyticsForm(forms.Form):
+    task_id = forms.IntegerField()
@@ -0,0 +1,44 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from inloop.statistics.export import export
+from inloop.statistics.forms import SubmissionsExportForm
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the submitted solutions with their task, category and latest test result "
+        "status to stdout as CSV or NDJSON."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--format", help="Output format (default is csv).", choices=["csv", "ndjson"]
+        )
+        parser.add_argument(
+            "--from", help="Export solutions submitted since this date (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--to", help="Export solutions submitted until this date (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--passed",
+            help="Export only passed (true) or only failed (false) solutions.",
+            choices=["true", "false"],
+        )
+        parser.add_argument("--category", help="Export only solutions of this category id.")
+
+    def handle(self, *args: str, **options: Any) -> None:
+        data = {
+            "format": options["format"],
+            "from_timestamp": options["from"],
+            "to_timestamp": options["to"],
+            "passed": options["passed"],
+            "category_id": options["category"],
+        }
+        form = SubmissionsExportForm({key: value for key, value in data.items() if value})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        for chunk in export(form.cleaned_data, form.cleaned_data["format"] or "csv"):
+            self.stdout.write(chunk, ending="")
@@ -0,0 +1,13 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from inloop.statistics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the rollup tables of the statistics views from all solutions."
+
+    def handle(self, *args: str, **options: Any) -> None:
+        rebuild_rollups()
+        self.stdout.write("Rebuilt the statistics rollups.")
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.3 on 2026-10-19 15:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("tasks", "0010_task_description_html"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[
+                            ("minute", "minute"),
+                            ("hour", "hour"),
+                            ("day", "day"),
+                            ("month", "month"),
+                            ("year", "year"),
+                        ],
+                        max_length=6,
+                    ),
+                ),
+                ("date", models.DateTimeField(help_text="Start of the time bucket")),
+                ("passed", models.BooleanField()),
+                ("num_submissions", models.PositiveIntegerField(default=0)),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="tasks.task"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("granularity", "date", "task", "passed")},
+            },
+        ),
+        migrations.CreateModel(
+            name="FirstPass",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "scoped_id",
+                    models.PositiveIntegerField(help_text="Number of attempts until passed"),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="tasks.task"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("task", "author")},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Trunc
+
+GRANULARITIES = ["minute", "hour", "day", "month", "year"]
+
+
+def populate_rollups(apps, schema_editor):
+    Solution = apps.get_model("solutions", "Solution")
+    SubmissionCount = apps.get_model("statistics", "SubmissionCount")
+    FirstPass = apps.get_model("statistics", "FirstPass")
+    for granularity in GRANULARITIES:
+        rows = (
+            Solution.objects.annotate(date=Trunc("submission_date", granularity))
+            .values("date", "task_id", "passed")
+            .annotate(num_submissions=Count("pk"))
+            .order_by()
+        )
+        SubmissionCount.objects.bulk_create(
+            (SubmissionCount(granularity=granularity, **row) for row in rows), batch_size=1000
+        )
+    rows = (
+        Solution.objects.filter(passed=True)
+        .values("task_id", "author_id")
+        .annotate(first=Min("scoped_id"))
+        .order_by()
+    )
+    FirstPass.objects.bulk_create(
+        (
+            FirstPass(task_id=row["task_id"], author_id=row["author_id"], scoped_id=row["first"])
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("solutions", "0009_differential_checkpoints"),
+        ("statistics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,191 @@
+"""
+Rollup tables for the statistics views.
+
+Instead of aggregating all solutions on every request, the histograms are
+answered from tables with precomputed counts. The counts are updated
+incrementally whenever a solution is submitted or checked, and rebuilt from
+scratch by a nightly job, which also accounts for deleted or edited solutions.
+
+The incremental updates run in a huey task after the submitting transaction has
+committed, so that concurrent submissions don't wait for each other's locks on
+the shared count rows. Each solution remembers the result it has been counted
+with, which makes the updates idempotent and independent of their order.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Type
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from huey.contrib.djhuey import db_task
+
+from inloop.tasks.models import Task
+
+if TYPE_CHECKING:
+    from inloop.solutions.models import Solution
+
+GRANULARITIES = ["minute", "hour", "day", "month", "year"]
+
+ROLLUPS_TOKEN_KEY = "inloop:statistics:token"
+
+
+class SubmissionCount(models.Model):
+    """
+    Number of solutions submitted for a task within a time bucket.
+
+    There is one set of buckets for each granularity, starting at the truncated
+    submission dates in the current time zone (like the Trunc database function).
+    Counts per category are obtained by summing up the counts of its tasks.
+    """
+
+    granularity = models.CharField(max_length=6, choices=[(g, g) for g in GRANULARITIES])
+    date = models.DateTimeField(help_text="Start of the time bucket")
+    task = models.ForeignKey(Task, on_delete=models.CASCADE)
+    passed = models.BooleanField()
+    num_submissions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("granularity", "date", "task", "passed")
+
+    def __str__(self) -> str:
+        return f"{self.task_id}@{self.date.isoformat()}/{self.granularity}"
+
+
+class FirstPass(models.Model):
+    """The first passed solution of an author for a task."""
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    scoped_id = models.PositiveIntegerField(help_text="Number of attempts until passed")
+
+    class Meta:
+        unique_together = ("task", "author")
+
+    def __str__(self) -> str:
+        return f"{self.author_id}@{self.task_id}: {self.scoped_id}"
+
+
+def truncate(date: datetime, granularity: str) -> datetime:
+    """Truncate the given date in the current time zone to the given granularity."""
+    date = timezone.localtime(date).replace(second=0, microsecond=0)
+    if granularity == "minute":
+        return date
+    date = date.replace(minute=0)
+    if granularity == "hour":
+        return date
+    date = date.replace(hour=0)
+    if granularity == "day":
+        return date
+    date = date.replace(day=1)
+    if granularity == "month":
+        return date
+    return date.replace(month=1)
+
+
+def get_bucket_end(date: datetime, granularity: str) -> datetime:
+    """Return the end of the bucket of the given granularity that contains the given date."""
+    start = truncate(date, granularity)
+    if granularity == "minute":
+        return start + timedelta(minutes=1)
+    if granularity == "hour":
+        return start + timedelta(hours=1)
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start.replace(year=start.year + 1)
+
+
+def get_rollups_version() -> str:
+    """Return a version identifier which changes whenever the rollups are rebuilt."""
+    return cache.get_or_set(ROLLUPS_TOKEN_KEY, uuid4().hex, timeout=None)
+
+
+def invalidate_rollups() -> None:
+    """Change the rollups version once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete(ROLLUPS_TOKEN_KEY))
+
+
+def update_rollups_on_commit(solution: Solution) -> None:
+    """Count the given solution with its current result once the transaction commits."""
+    transaction.on_commit(lambda: update_rollups_async(solution.id))
+
+
+@db_task()
+def update_rollups_async(solution_id: int) -> None:
+    update_rollups(solution_id)
+
+
+@atomic
+def update_rollups(solution_id: int) -> None:
+    """
+    Count the solution specified by the given id with its current result, and
+    revoke the result it has been counted with before (if any).
+
+    The counted result is kept in Solution.counted_passed, and the solution is
+    locked meanwhile. Hence, repeated or concurrent calls for the same solution
+    count it exactly once, no matter in which order they run. Deleted solutions
+    are skipped, the nightly rebuild accounts for them.
+    """
+    from inloop.solutions.models import Solution
+
+    solution = Solution.objects.select_for_update().filter(pk=solution_id).first()
+    if solution is None or solution.counted_passed == solution.passed:
+        return
+    if solution.counted_passed is not None:
+        _add_submissions(solution, passed=solution.counted_passed, delta=-1)
+    _add_submissions(solution, passed=solution.passed, delta=1)
+    if solution.passed:
+        _record_first_pass(solution)
+    Solution.objects.filter(pk=solution_id).update(counted_passed=solution.passed)
+
+
+def _add_submissions(solution: Solution, *, passed: bool, delta: int) -> None:
+    for granularity in GRANULARITIES:
+        key = {
+            "granularity": granularity,
+            "date": truncate(solution.submission_date, granularity),
+            "task_id": solution.task_id,
+            "passed": passed,
+        }
+        if delta < 0:
+            # never go below zero, e.g. if a rebuild has not counted the solution
+            SubmissionCount.objects.filter(**key, num_submissions__gte=-delta).update(
+                num_submissions=F("num_submissions") + delta
+            )
+        else:
+            _upsert(
+                SubmissionCount,
+                key,
+                update={"num_submissions": F("num_submissions") + delta},
+                create={"num_submissions": delta},
+            )
+
+
+def _record_first_pass(solution: Solution) -> None:
+    _upsert(
+        FirstPass,
+        {"task_id": solution.task_id, "author_id": solution.author_id},
+        update={"scoped_id": Least("scoped_id", solution.scoped_id)},
+        create={"scoped_id": solution.scoped_id},
+    )
+
+
+def _upsert(model: Type[models.Model], key: Dict[str, Any], *, update: Dict, create: Dict) -> None:
+    if model.objects.filter(**key).update(**update):
+        return
+    try:
+        with atomic():
+            model.objects.create(**key, **create)
+    except IntegrityError:
+        # the row has been created by a concurrent transaction in the meantime
+        model.objects.filter(**key).update(**update)
@@ -0,0 +1,41 @@
+from typing import List
+
+from django.db.models import Count, F, Min
+from django.db.models.functions import Trunc
+from django.db.transaction import atomic
+
+from inloop.solutions.models import Solution
+from inloop.statistics.models import GRANULARITIES, FirstPass, SubmissionCount, invalidate_rollups
+
+
+@atomic
+def rebuild_rollups(*, batch_size: int = 1000) -> None:
+    """
+    Recompute all rollup tables from the solutions and invalidate the cached
+    statistics derived from them.
+
+    The solutions are marked as counted with their current result, so that pending
+    incremental updates don't count them again.
+    """
+    counts: List[SubmissionCount] = []
+    for granularity in GRANULARITIES:
+        rows = (
+            Solution.objects.annotate(date=Trunc("submission_date", granularity))
+            .values("date", "task_id", "passed")
+            .annotate(num_submissions=Count("pk"))
+            .order_by()
+        )
+        counts.extend(SubmissionCount(granularity=granularity, **row) for row in rows)
+    first_passes = [
+        FirstPass(task_id=row["task_id"], author_id=row["author_id"], scoped_id=row["first"])
+        for row in Solution.objects.filter(passed=True)
+        .values("task_id", "author_id")
+        .annotate(first=Min("scoped_id"))
+        .order_by()
+    ]
+    SubmissionCount.objects.all().delete()
+    SubmissionCount.objects.bulk_create(counts, batch_size=batch_size)
+    FirstPass.objects.all().delete()
+    FirstPass.objects.bulk_create(first_passes, batch_size=batch_size)
+    Solution.objects.exclude(counted_passed=F("passed")).update(counted_passed=F("passed"))
+    invalidate_rollups()
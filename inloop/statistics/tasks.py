@@ -0,0 +1,10 @@
+from huey import crontab
+from huey.contrib.djhuey import HUEY, db_periodic_task
+
+from inloop.statistics.rollups import rebuild_rollups
+
+
+@db_periodic_task(crontab(hour="4", minute="0"))
+def rebuild_rollups_nightly() -> None:
+    with HUEY.lock_task("statistics-rebuild-lock"):
+        rebuild_rollups()
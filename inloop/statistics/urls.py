@@ -15,6 +15,11 @@ urlpatterns = [
         views.SubmissionsHistogramJsonView.as_view(),
         name="submissions_histogram_api",
     ),
+    path(
+        "solutions/export/",
+        views.SubmissionsExportView.as_view(),
+        name="submissions_export",
+    ),
     path(
         "solutions/histogram/attempts/template/",
         views.AttemptsHistogramTemplateView.as_view(),
@@ -25,4 +30,9 @@ urlpatterns = [
         views.AttemptsHistogramJsonView.as_view(),
         name="attempts_histogram_api",
     ),
+    path(
+        "tasks/analytics/api/",
+        views.TaskAnalyticsJsonView.as_view(),
+        name="task_analytics_api",
+    ),
 ]
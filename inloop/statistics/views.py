@@ -1,15 +1,37 @@
-from collections import Counter
+import hashlib
+import json
+from datetime import datetime
 from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db import models
-from django.db.models import functions
-from django.http import Http404, HttpRequest, JsonResponse
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import View
 from django.views.generic import TemplateView
 
 from inloop.solutions.models import Solution
-from inloop.statistics.forms import AttemptsHistogramForm, SubmissionsHistogramForm
+from inloop.statistics.analytics import get_task_metrics
+from inloop.statistics.export import EXPORT_FORMATS, export, get_export_filename
+from inloop.statistics.forms import (
+    AttemptsHistogramForm,
+    SubmissionsExportForm,
+    SubmissionsHistogramForm,
+    TaskAnalyticsForm,
+)
+from inloop.statistics.models import (
+    FirstPass,
+    SubmissionCount,
+    get_bucket_end,
+    get_rollups_version,
+    truncate,
+)
 from inloop.tasks.models import Category, Task
 
 
@@ -40,6 +62,76 @@ def queryset_limit_reached(
     )
 
 
+# how long histograms which may still change are cached (in seconds)
+OPEN_RANGE_TIMEOUT = 60
+
+# how long histograms of ended time ranges are cached (in seconds), which bounds the
+# lifetime of entries under outdated rollups versions
+CLOSED_RANGE_TIMEOUT = 24 * 60 * 60
+
+# how long the task metrics are cached (in seconds)
+ANALYTICS_TIMEOUT = 15 * 60
+
+
+def get_cached(
+    name: str, filters: Dict[str, Any], compute: Callable[[], Any], *, timeout: Optional[int]
+) -> Any:
+    """
+    Return the value computed by the given function, which is cached for the given
+    timeout (or until the rollups are rebuilt) under a key derived from the
+    normalized filters.
+    """
+    key_data = json.dumps(filters, cls=DjangoJSONEncoder, sort_keys=True)
+    digest = hashlib.md5(f"{get_rollups_version()}:{key_data}".encode()).hexdigest()
+    cache_key = f"inloop:statistics:{name}:{digest}"
+    value = cache.get(cache_key)
+    if value is None:
+        value = compute()
+        cache.set(cache_key, value, timeout=timeout)
+    return value
+
+
+def cached_json_response(request: HttpRequest, content: str) -> HttpResponse:
+    """
+    Return a response with the given serialized JSON, which clients are required
+    to revalidate using the ETag header.
+    """
+    etag = quote_etag(hashlib.md5(content.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True, max_age=0)
+    return response
+
+
+def histogram_response(
+    request: HttpRequest,
+    name: str,
+    filters: Dict[str, Any],
+    compute: Callable[[], Tuple[int, Any]],
+    *,
+    queryset_limit: Optional[int],
+    timeout: Optional[int],
+) -> HttpResponse:
+    """
+    Return a JsonResponse with the histogram computed by the given function, which
+    must also return the number of objects counted by the histogram.
+
+    The histogram is cached using get_cached(), and the queryset limit is applied
+    to the cached number of objects.
+    """
+
+    def compute_content() -> Tuple[int, str]:
+        queryset_count, histogram = compute()
+        return queryset_count, json.dumps({"histogram": histogram}, cls=DjangoJSONEncoder)
+
+    queryset_count, content = get_cached(name, filters, compute_content, timeout=timeout)
+    if queryset_limit is not None and queryset_count > queryset_limit:
+        return queryset_limit_reached(queryset_count)
+    return cached_json_response(request, content)
+
+
 class AdminView(UserPassesTestMixin, LoginRequiredMixin, View):
     """Provide a base view with superuser and staff restricted access."""
 
@@ -93,52 +185,131 @@ class SubmissionsHistogramJsonView(AdminView):
     over a given timespan.
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
         Get a filtered solution submission histogram.
 
         Since the HTTP request type is GET, all parameters must be
         supplied as GET parameters. Validate these parameters first and
-        filter the queryset of all solutions based on the parameters.
-        Use an SQL truncator to create buckets and
-        return a JsonResponse with the mapped histogram.
+        filter the precomputed submission counts of the requested
+        granularity based on the parameters. All buckets overlapping the
+        time range are included as a whole. Sum up the counts of each bucket and
+        return a JsonResponse with the mapped histogram, which is cached
+        indefinitely if the time range has ended and briefly otherwise.
 
         It is possible to pass a queryset limit to
-        avoid computation of too many objects.
+        avoid transmission of too many submissions.
         """
         form = SubmissionsHistogramForm(request.GET)
         if not form.is_valid():
             return bad_request("The supplied form was invalid.")
 
-        queryset_limit = form.cleaned_data.get("queryset_limit")
-        from_timestamp = form.cleaned_data.get("from_timestamp")
-        to_timestamp = form.cleaned_data.get("to_timestamp")
-        passed = form.cleaned_data.get("passed")
-        category_id = form.cleaned_data.get("category_id")
-        granularity = form.cleaned_data.get("granularity", "minute")
-
-        truncator = functions.Trunc("submission_date", granularity)
+        filters = {
+            "from_timestamp": form.cleaned_data.get("from_timestamp"),
+            "to_timestamp": form.cleaned_data.get("to_timestamp"),
+            "passed": form.cleaned_data.get("passed"),
+            "category_id": form.cleaned_data.get("category_id"),
+            "granularity": form.cleaned_data.get("granularity") or "minute",
+        }
+
+        # Histograms of time ranges that have ended (including the time needed to
+        # check the last submissions) only change when the rollups are rebuilt, which
+        # happens nightly
+        to_timestamp = filters["to_timestamp"]
+        closed = to_timestamp is not None and (
+            get_bucket_end(to_timestamp, filters["granularity"])
+            <= timezone.now() - Solution.TIMEOUT
+        )
+        return histogram_response(
+            request,
+            "submissions",
+            filters,
+            lambda: self.get_histogram(**filters),
+            queryset_limit=form.cleaned_data.get("queryset_limit"),
+            timeout=CLOSED_RANGE_TIMEOUT if closed else OPEN_RANGE_TIMEOUT,
+        )
 
-        queryset = Solution.objects
+    def get_histogram(
+        self,
+        *,
+        from_timestamp: Optional[datetime],
+        to_timestamp: Optional[datetime],
+        passed: Optional[bool],
+        category_id: Optional[int],
+        granularity: str,
+    ) -> Tuple[int, list]:
+        """Return the number of submissions and the histogram for the given filters."""
+        queryset = SubmissionCount.objects.filter(granularity=granularity)
         if from_timestamp:
-            queryset = queryset.filter(submission_date__gte=from_timestamp)
+            # include the bucket containing from_timestamp, like the one of to_timestamp
+            queryset = queryset.filter(date__gte=truncate(from_timestamp, granularity))
         if to_timestamp:
-            queryset = queryset.filter(submission_date__lte=to_timestamp)
+            queryset = queryset.filter(date__lte=to_timestamp)
         if passed is not None:
             queryset = queryset.filter(passed=passed)
         if category_id is not None:
             queryset = queryset.filter(task__category_id=category_id)
 
-        # Check the queryset count before any expensive ORM computing is done
-        queryset_count = queryset.count()
-        if queryset_limit is not None and queryset_count > queryset_limit:
-            return queryset_limit_reached(queryset_count)
-
         histogram_queryset = (
-            queryset.annotate(date=truncator).values("date").annotate(count=models.Count("pk"))
+            queryset.values("date").annotate(count=Sum("num_submissions")).order_by("date")
         )
+        histogram = list(histogram_queryset)
+        return sum(bucket["count"] for bucket in histogram), histogram
 
-        return JsonResponse({"histogram": list(histogram_queryset)})
+
+class TaskAnalyticsJsonView(AdminView):
+    """
+    Provide the REST endpoint for the metrics of a task.
+
+    The metrics contain the median time from the first submission of a user
+    to their first passed submission, the pass rate per attempt number and
+    percentiles of the time taken by the test runner.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        """
+        Get the metrics of the task given by the task_id GET parameter.
+
+        Since computing the metrics involves all solutions and test results
+        of the task, they are cached for a few minutes.
+        """
+        form = TaskAnalyticsForm(request.GET)
+        if not form.is_valid():
+            return bad_request("The supplied form was invalid.")
+
+        task_id = form.cleaned_data["task_id"]
+        content = get_cached(
+            "analytics",
+            {"task_id": task_id},
+            lambda: json.dumps(get_task_metrics(task_id)),
+            timeout=ANALYTICS_TIMEOUT,
+        )
+        return cached_json_response(request, content)
+
+
+class SubmissionsExportView(AdminView):
+    """
+    Provide the raw data of the submitted solutions as a file download.
+
+    Each solution is exported together with its task, category and the
+    status of its latest test result, either as CSV or as NDJSON.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponseBase:
+        """
+        Stream the solutions matching the same filters as the submissions
+        histogram in the requested format (CSV by default).
+        """
+        form = SubmissionsExportForm(request.GET)
+        if not form.is_valid():
+            return bad_request("The supplied form was invalid.")
+        export_format = form.cleaned_data["format"] or "csv"
+        response = StreamingHttpResponse(
+            export(form.cleaned_data, export_format), content_type=EXPORT_FORMATS[export_format]
+        )
+        filename = get_export_filename(export_format)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
 
 class AttemptsHistogramJsonView(AdminView):
@@ -150,17 +321,18 @@ class AttemptsHistogramJsonView(AdminView):
     until they were able to succeed.
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
         Get a filtered attempts histogram.
 
         Since the HTTP request type is GET, all parameters must be
         supplied as GET parameters. Validate these parameters first and
-        filter the queryset of all solutions based on the parameters.
+        filter the first passes of the given task.
         The number of trials until the first passed solution
-        is computed through the minimum scoped id of all passed
-        solutions for each user. Group these values into buckets
-        and return a JsonResponse with the mapped histogram.
+        is the minimum scoped id of all passed solutions of a user,
+        which is kept in the FirstPass rollup table. Group these values
+        into buckets and return a JsonResponse with the briefly cached
+        histogram.
 
         It is possible to pass a queryset limit to
         avoid computation of too many objects.
@@ -169,19 +341,22 @@ class AttemptsHistogramJsonView(AdminView):
         if not form.is_valid():
             return bad_request("The supplied form was invalid.")
 
-        queryset_limit = form.cleaned_data.get("queryset_limit")
         task_id = form.cleaned_data["task_id"]
-
-        queryset = (
-            Solution.objects.filter(passed=True, task_id=task_id)
-            .values("author_id")
-            .annotate(num_trials=models.Min("scoped_id"))
+        return histogram_response(
+            request,
+            "attempts",
+            {"task_id": task_id},
+            lambda: self.get_histogram(task_id),
+            queryset_limit=form.cleaned_data.get("queryset_limit"),
+            timeout=OPEN_RANGE_TIMEOUT,
         )
 
-        # Check the queryset count before any expensive computing is done
-        queryset_count = queryset.count()
-        if queryset_limit is not None and queryset_count > queryset_limit:
-            return queryset_limit_reached(queryset_count)
-
-        histogram = Counter(queryset.values_list("num_trials", flat=True))
-        return JsonResponse({"histogram": histogram})
+    def get_histogram(self, task_id: int) -> Tuple[int, Dict[int, int]]:
+        """Return the number of users who passed the task and the histogram."""
+        histogram = dict(
+            FirstPass.objects.filter(task_id=task_id)
+            .values("scoped_id")
+            .annotate(count=Count("pk"))
+            .values_list("scoped_id", "count")
+        )
+        return sum(histogram.values()), histogram
@@ -1,9 +1,11 @@
 from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.db.models import QuerySet
+from django.forms import ModelForm
 from django.http import HttpRequest
 from django.utils.text import Truncator
 
+from inloop.common.templatetags.markdown import render_markdown, repository_version
 from inloop.grading.admin import PlagiarismAdmin
 from inloop.grading.copypasta import jplag_check_async
 from inloop.tasks.models import Category, FileTemplate, Task, TaskQuerySet
@@ -25,6 +27,13 @@ class TaskAdmin(PlagiarismAdmin):
     actions = PlagiarismAdmin.actions + ("jplag_check_tasks",)
     ordering = ["pubdate", "deadline", "title"]
 
+    def save_model(self, request: HttpRequest, obj: Task, form: ModelForm, change: bool) -> None:
+        if "description" in form.changed_data:
+            obj.description_html = render_markdown(
+                obj.description, version=repository_version.get_version()
+            )
+        super().save_model(request, obj, form, change)
+
     def jplag_check_tasks(self, request: HttpRequest, queryset: TaskQuerySet) -> None:
         """
         Admin action which starts a plagiarism check on the selected tasks.
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0009_task_group"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="description_html",
+            field=models.TextField(
+                default="", editable=False, help_text="Task description rendered as HTML"
+            ),
+        ),
+    ]
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import hashlib
 import itertools
 import re
 from datetime import timedelta
-from typing import Any, Dict, Iterable
+from typing import Any, Dict, Iterable, Optional, Set, Type
+from uuid import uuid4
 
 from django.contrib.auth.models import Group, User
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.db.models import Q
 from django.db.models.expressions import Value
 from django.db.models.fields import BooleanField
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.text import slugify
 
@@ -99,6 +104,9 @@ class Task(models.Model):
     system_name = models.CharField(max_length=100, unique=True, help_text="Internally used name")
     slug = models.SlugField(max_length=50, unique=True, help_text="URL name")
     description = models.TextField(help_text="Task description")
+    description_html = models.TextField(
+        default="", editable=False, help_text="Task description rendered as HTML"
+    )
     pubdate = models.DateTimeField(help_text="When should the task be published?")
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
 
@@ -174,3 +182,71 @@ class FileTemplate(models.Model):
 
     def __str__(self) -> str:
         return self.name
+
+
+def _file_templates_token_key(task_id: int) -> str:
+    return f"inloop:filetemplates:token:{task_id}"
+
+
+def get_file_templates_version(task: Task) -> str:
+    """
+    Return a version identifier for the file templates of the given task.
+
+    The version changes whenever the task is imported (which updates the task's
+    modification time) or when a template is changed by other means.
+    """
+    token = cache.get_or_set(_file_templates_token_key(task.id), uuid4().hex, timeout=None)
+    version = f"{task.id}:{task.updated_at.isoformat()}:{token}"
+    return hashlib.md5(version.encode()).hexdigest()
+
+
+def invalidate_file_templates(task_id: int) -> None:
+    """Change the file templates version of the given task once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete(_file_templates_token_key(task_id)))
+
+
+@receiver(post_save, sender=FileTemplate, dispatch_uid="file_template_saved")
+@receiver(post_delete, sender=FileTemplate, dispatch_uid="file_template_deleted")
+def handle_file_template_changed(
+    sender: Type[FileTemplate], instance: FileTemplate, **kwargs: Any
+) -> None:
+    invalidate_file_templates(instance.task_id)
+
+
+def _attachment_access_token_key(user_id: int) -> str:
+    return f"inloop:attachments:token:{user_id}"
+
+
+def get_attachment_access_version(user_id: int) -> str:
+    """
+    Return a version identifier for the cached attachment permissions of the given
+    user, which changes whenever the groups of the user are changed.
+    """
+    return cache.get_or_set(_attachment_access_token_key(user_id), uuid4().hex, timeout=None)
+
+
+def invalidate_attachment_access(user_ids: Iterable[int]) -> None:
+    """Change the attachment access version of the given users once the transaction commits."""
+    keys = [_attachment_access_token_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid="user_groups_changed")
+def handle_user_groups_changed(
+    sender: Type[models.Model],
+    instance: models.Model,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[Set[int]],
+    **kwargs: Any,
+) -> None:
+    if action in ("post_add", "post_remove"):
+        user_ids = pk_set if reverse else [instance.pk]
+    elif action == "pre_clear" and reverse:
+        # the members of a group are unknown after it has been cleared
+        user_ids = instance.user_set.values_list("pk", flat=True)
+    elif action == "post_clear" and not reverse:
+        user_ids = [instance.pk]
+    else:
+        return
+    invalidate_attachment_access(user_ids)
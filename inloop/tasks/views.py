@@ -3,20 +3,32 @@ Views to manage tasks and task categories and submitted solutions.
 
 """
 
+import hashlib
 import re
 from os.path import join
+from typing import Optional
 from urllib.parse import unquote
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 from constance import config
 
 from inloop.common.sendfile import sendfile
-from inloop.tasks.models import Category, Task
+from inloop.common.templatetags.markdown import repository_version
+from inloop.tasks.models import Category, Task, get_attachment_access_version
+
+# how long the result of an attachment permission check is cached, in seconds
+ATTACHMENT_ACCESS_TIMEOUT = 60
+
+# attachments requested with a version query string never change
+ATTACHMENT_MAX_AGE = 365 * 24 * 3600
 
 
 @login_required
@@ -66,7 +78,50 @@ def serve_attachment(request: HttpRequest, slug: str, path: str) -> HttpResponse
     if ".." in unquote(path):
         raise Http404
 
-    task = get_object_or_404(Task.objects.published().visible_by(user=request.user), slug=slug)
-    filesystem_path = join(task.system_name, path)
+    system_name = get_attachment_dir(request.user, slug)
+    if system_name is None:
+        raise Http404
+    filesystem_path = join(system_name, path)
+
+    # the files only change with the task repository, whose version busts caches
+    etag = None
+    version = repository_version.get_version()
+    if version is not None:
+        digest = hashlib.md5(filesystem_path.encode()).hexdigest()
+        etag = f'"{version}-{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = sendfile(request, filesystem_path, settings.REPOSITORY_ROOT, etag=etag)
+    if etag is not None:
+        response["ETag"] = etag
+    if "v" in request.GET:
+        patch_cache_control(response, private=True, max_age=ATTACHMENT_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    return sendfile(request, filesystem_path, settings.REPOSITORY_ROOT)
+
+def get_attachment_dir(user: User, slug: str) -> Optional[str]:
+    """
+    Return the system name of the task with the given slug, if it is published and
+    visible by the given user, or None otherwise.
+
+    The result is cached for a short time per task and user, because a task
+    description may embed many attachments. Cache hits need no database query,
+    and changes of the user's groups take effect immediately.
+    """
+    version = get_attachment_access_version(user.pk)
+    key = f"inloop:attachments:{user.pk}:{version}:{slug}"
+    system_name = cache.get(key)
+    if system_name is None:
+        task = (
+            Task.objects.published()
+            .visible_by(user=user)
+            .filter(slug=slug)
+            .only("system_name")
+            .first()
+        )
+        # an empty string caches the denied access
+        system_name = task.system_name if task else ""
+        cache.set(key, system_name, timeout=ATTACHMENT_ACCESS_TIMEOUT)
+    return system_name or None
@@ -0,0 +1,162 @@
+"""
+Building of the Docker image used by the test runner.
+
+The image is built from the task repository whenever the repository has been
+imported. To avoid needless rebuilds, the image is labeled with a hash of the
+build context, and the build is skipped if the current image has the same label.
+Each build is additionally tagged with its version, and outdated versions are removed
+after a successful build, keeping only the current and the previous one.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import subprocess
+from typing import Iterable, List, Optional, Tuple
+
+from inloop.gitload.repo import Repository
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_HASH_LABEL = "inloop.context-hash"
+
+_BUILD_ENVIRON = os.environ.copy()
+_BUILD_ENVIRON["DOCKER_BUILDKIT"] = "1"
+
+
+def hash_build_context(path: str) -> str:
+    """
+    Return a hash of the paths, contents and executable bits of all files under the
+    given directory, skipping .git directories.
+    """
+    sha256 = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(name for name in dirs if name != ".git")
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            relpath = os.path.relpath(file_path, path)
+            mode = os.lstat(file_path).st_mode
+            sha256.update(f"{relpath}\0{mode & 0o111:o}\0".encode())
+            if stat.S_ISLNK(mode):
+                sha256.update(os.readlink(file_path).encode())
+            else:
+                with open(file_path, "rb") as stream:
+                    for chunk in iter(lambda: stream.read(65536), b""):
+                        sha256.update(chunk)
+            sha256.update(b"\0")
+    return sha256.hexdigest()
+
+
+def get_context_hash(image: str) -> Optional[str]:
+    """Return the context hash the given image was built from, or None if unknown."""
+    result = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{json .Config.Labels}}", image],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        return None
+    labels = json.loads(result.stdout) or {}
+    return labels.get(CONTEXT_HASH_LABEL)
+
+
+def split_tag(image: str) -> Tuple[str, str]:
+    """Split the given image name into repository and tag, which defaults to latest."""
+    name, _, tag = image.rpartition(":")
+    if not name or "/" in tag:
+        # there is no tag, the colon (if any) belongs to a registry host:port
+        return image, "latest"
+    return name, tag
+
+
+def get_versioned_name(image: str, version: str) -> str:
+    """Return the given image name with its tag (if any) replaced by version."""
+    name, _ = split_tag(image)
+    return f"{name}:{version}"
+
+
+def get_image_tags(image: str) -> List[str]:
+    """Return the tags of the given image within its repository, or [] if unknown."""
+    result = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{json .RepoTags}}", image],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        return []
+    name, _ = split_tag(image)
+    return [tag for repo, tag in map(split_tag, json.loads(result.stdout) or []) if repo == name]
+
+
+def remove_outdated_images(image: str, keep: Iterable[str]) -> None:
+    """
+    Remove all tags of the given image's repository except the ones to keep.
+
+    Images which are still in use by running containers cannot be removed. This is
+    not an error, they will be removed by one of the following builds instead.
+    """
+    name, _ = split_tag(image)
+    result = subprocess.run(
+        ["docker", "image", "ls", "--format", "{{.Tag}}", name],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        return
+    keep = set(keep)
+    for tag in result.stdout.split():
+        if tag in keep or tag == "<none>":
+            continue
+        removed = subprocess.run(
+            ["docker", "rmi", f"{name}:{tag}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if removed.returncode == 0:
+            logger.info("removed outdated image %s:%s", name, tag)
+        else:
+            logger.info("could not remove outdated image %s:%s, it is probably in use", name, tag)
+
+
+def build_image(repository: Repository, image: str, *, timeout: int = 600) -> bool:
+    """
+    Build the image from the given repository, unless the build context is unchanged
+    since the last successful build. Return True if the image was rebuilt.
+
+    The image is built with BuildKit, using the current image as cache source, and
+    tagged with the repository's commit (or the context hash, if there is no commit).
+    Afterwards, the given image name is moved to the new image with a single
+    `docker tag`, so that checks which have already been started keep using the old
+    image, which is retained by its own tag. All versions except the new and the
+    previous one are removed afterwards.
+    """
+    context_hash = hash_build_context(repository.path_s)
+    if get_context_hash(image) == context_hash:
+        logger.info("build context is unchanged, skipping build of %s", image)
+        return False
+    previous_tags = get_image_tags(image)
+    version = (repository.get_commit() or context_hash)[:12]
+    versioned_image = get_versioned_name(image, version)
+    args = [
+        "docker",
+        "build",
+        "--tag",
+        versioned_image,
+        "--label",
+        f"{CONTEXT_HASH_LABEL}={context_hash}",
+        "--cache-from",
+        image,
+        "--build-arg",
+        "BUILDKIT_INLINE_CACHE=1",
+        ".",
+    ]
+    subprocess.check_call(args, cwd=repository.path_s, env=_BUILD_ENVIRON, timeout=timeout)
+    subprocess.check_call(["docker", "tag", versioned_image, image])
+    logger.info("built %s and tagged it as %s", versioned_image, image)
+    remove_outdated_images(image, keep=[split_tag(image)[1], version, *previous_tags])
+    return True
@@ -8,7 +8,9 @@ from django.db.transaction import atomic
 
 from huey.contrib.djhuey import db_task
 
+from inloop.grading.fingerprints import index_solution
 from inloop.solutions.models import Solution
+from inloop.statistics.models import update_rollups_on_commit
 from inloop.testrunner.runner import DockerTestRunner
 
 
@@ -30,7 +32,8 @@ def check_solution(solution: Solution) -> TestResult:
     """
     Check the given solution with the test runner and return a TestResult.
 
-    This function will block until the test runner has finished.
+    This function will block until the test runner has finished. Passed solutions
+    are added to the fingerprint index used to preselect plagiarism checks.
     """
     runner = DockerTestRunner(settings.TESTRUNNER_OPTIONS)
     test_output = runner.check_task(solution.task.system_name, str(solution.path))
@@ -49,7 +52,11 @@ def check_solution(solution: Solution) -> TestResult:
             ]
         )
         solution.passed = test_result.is_success()
-        solution.save()
+        # counted_passed is maintained concurrently by the rollups task
+        solution.save(update_fields=["passed"])
+        update_rollups_on_commit(solution)
+    if solution.passed:
+        index_solution(solution)
     return test_result
 
 
@@ -1,4 +1,3 @@
-from subprocess import check_call
 from typing import Any, Type
 
 from django.conf import settings
@@ -8,6 +7,7 @@ from inloop.gitload.repo import Repository
 from inloop.gitload.signals import repository_loaded
 from inloop.solutions.models import Solution
 from inloop.solutions.signals import solution_submitted
+from inloop.testrunner.images import build_image
 from inloop.testrunner.models import check_solution_async
 
 
@@ -16,9 +16,8 @@ def handle_repository_loaded(sender: Type[Any], repository: Repository, **kwargs
     """
     Listen for the repository_loaded signal and (re-) build the docker image.
     """
-    image_name = settings.TESTRUNNER_OPTIONS["image"]
-    args = ["docker", "build", "-t", image_name, "."]
-    check_call(args, cwd=repository.path, timeout=60)
+    options = settings.TESTRUNNER_OPTIONS
+    build_image(repository, options["image"], timeout=options.get("build_timeout", 600))
 
 
 @receiver(solution_submitted, dispatch_uid="testrunner_solution_submitted")
@@ -9,6 +9,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--with-typeguard", action="store_true", help="run with dynamic type checks"
     )
+    parser.add_argument(
+        "--with-benchmarks", action="store_true", help="also run tests tagged as benchmark"
+    )
     parser.add_argument(
         "test_args", nargs="*", help="arguments to pass to ./manage.py test (separate with --)"
     )
@@ -27,4 +30,7 @@ if __name__ == "__main__":
 
     from django.core.management import execute_from_command_line
 
-    execute_from_command_line(["./manage.py", "test", *options.test_args])
+    test_args = options.test_args
+    if not options.with_benchmarks:
+        test_args.append("--exclude-tag=benchmark")
+    execute_from_command_line(["./manage.py", "test", *test_args])
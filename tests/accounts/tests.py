@@ -3,29 +3,38 @@ import re
 import sys
 from datetime import timedelta
 from io import StringIO
+from pathlib import Path
 from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, Group, User
 from django.contrib.sites.models import Site
 from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
 from django.db.models import ObjectDoesNotExist
 from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from constance.test import override_config
 
 from inloop.accounts.forms import SignupForm, StudentDetailsForm
+from inloop.accounts.middleware import OWNWORK_CONFIRMED_SESSION_KEY, LocalConfig
 from inloop.accounts.models import (
     Course,
     StudentDetails,
+    assign_to_groups,
     prune_invalid_users,
     user_profile_complete,
 )
 from inloop.accounts.tasks import autoprune_invalid_users
 from inloop.accounts.views import signup
+from inloop.solutions.models import Solution, SolutionFile
 
 from tests.accounts.mixins import SimpleAccountsData
+from tests.solutions.mixins import SimpleTaskData
+from tests.tools import TemporaryMediaRootTestCase
 
 
 class AccountModelsTest(TestCase):
@@ -142,6 +151,53 @@ class PruneInvalidUsersTest(TestCase):
         self.assertFalse(User.objects.filter(username="bob").exists())
 
 
+class PruneInvalidUsersChunkedTest(SimpleTaskData, TemporaryMediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        date_joined = timezone.now() - timedelta(days=settings.ACCOUNT_ACTIVATION_DAYS + 1)
+        self.solution_files = []
+        for username in ["bob", "carol", "dave"]:
+            user = User.objects.create_user(username, is_active=False, date_joined=date_joined)
+            solution = Solution.objects.create(author=user, task=self.task)
+            self.solution_files.append(
+                SolutionFile.objects.create(
+                    solution=solution, file=SimpleUploadedFile("Main.java", b"class Main {}")
+                )
+            )
+        self.alice = User.objects.create_user("alice", is_active=False)
+
+    def test_chunks(self):
+        removed = []
+        num_deleted = prune_invalid_users(chunk_size=2, remove=removed.append)
+        self.assertEqual(num_deleted, 3)
+        self.assertEqual([len(filenames) for filenames in removed], [2, 1])
+        self.assertEqual(list(User.objects.values_list("username", flat=True)), ["alice"])
+        self.assertFalse(Solution.objects.exists())
+        # files are left to the remove callback
+        self.assertTrue(all(Path(file.absolute_path).exists() for file in self.solution_files))
+
+    def test_files_are_removed(self):
+        num_deleted = prune_invalid_users()
+        self.assertEqual(num_deleted, 3)
+        self.assertFalse(any(Path(file.absolute_path).exists() for file in self.solution_files))
+
+    def test_files_are_removed_by_queue(self):
+        with self.assertLogs("inloop.accounts.tasks") as capture_logs:
+            autoprune_invalid_users.call_local()
+        self.assertIn("Removed 3 of 3 file(s)", capture_logs.output[0])
+        self.assertIn("Pruned 3 invalid account(s)", capture_logs.output[1])
+        self.assertFalse(any(Path(file.absolute_path).exists() for file in self.solution_files))
+
+    def test_fallback_to_collector(self):
+        with mock.patch(
+            "inloop.accounts.models.raw_delete_cascade", side_effect=ValueError
+        ) as mocked:
+            num_deleted = prune_invalid_users(remove=self.fail)
+        self.assertTrue(mocked.called)
+        self.assertEqual(num_deleted, 3)
+        self.assertFalse(any(Path(file.absolute_path).exists() for file in self.solution_files))
+
+
 class AssignUsersTest(TestCase):
     def setUp(self):
         super().setUp()
@@ -170,6 +226,30 @@ class AssignUsersTest(TestCase):
         self.assertEqual(1, self.frank.groups.count())
         self.assertIn(self.frank.groups.first().name, ["Group1", "Group2"])
 
+    def test_assign_to_groups_query_count(self):
+        """Verify that the number of queries does not depend on the number of users."""
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(50))
+        groups = [Group.objects.create(name="Group1"), Group.objects.create(name="Group2")]
+        self.bob.groups.add(groups[0])
+        with self.assertNumQueries(2):
+            num_users = assign_to_groups(users=User.objects.all(), groups=groups, chunk_size=1000)
+        self.assertEqual(num_users, 52)
+        self.assertFalse(User.objects.filter(groups=None).exists())
+        self.assertEqual(User.groups.through.objects.count(), 53)
+
+    def test_assign_to_given_users(self):
+        groups = [Group.objects.create(name="Group1")]
+        self.assertEqual(assign_to_groups(users=[self.bob, self.alice], groups=groups), 2)
+        self.assertFalse(self.frank.groups.exists())
+
+    def test_command_reports_throughput(self):
+        stdout = StringIO()
+        call_command("assign_groups", "Group1", "--chunk_size", "2", stdout=stdout)
+        self.assertRegex(
+            stdout.getvalue(), r"Distributed 3 users to 1 groups in \d+\.\d\ds \(\d+ users/s\)"
+        )
+        self.assertEqual(User.groups.through.objects.count(), 3)
+
 
 class AutoGroupAssignTest(TestCase):
     def setUp(self):
@@ -205,6 +285,48 @@ class AutoGroupAssignTest(TestCase):
         self.assertFalse(self.alice.groups.exists())
 
 
+class RequireOwnWorkDeclarationTest(SimpleAccountsData, TestCase):
+    URL = reverse("tasks:index")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+
+    @override_config(REQUIRE_OWNWORK_DECLARATION=True)
+    def test_redirect_before_view(self):
+        with mock.patch("inloop.tasks.views.Category.objects") as mocked_categories:
+            response = self.client.get(self.URL)
+        self.assertRedirects(
+            response, reverse("accounts:confirm_ownwork"), fetch_redirect_response=False
+        )
+        self.assertEqual(mocked_categories.mock_calls, [])
+        self.assertEqual(self.client.get(reverse("accounts:confirm_ownwork")).status_code, 200)
+
+    @override_config(REQUIRE_OWNWORK_DECLARATION=True)
+    def test_confirmation_is_cached_in_session(self):
+        details = StudentDetails.objects.create(user=self.bob, ownwork_confirmed=True)
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+        self.assertEqual(self.client.session[OWNWORK_CONFIRMED_SESSION_KEY], self.bob.pk)
+        details.ownwork_confirmed = False
+        details.save()
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(self.URL).status_code, 302)
+
+    @override_config(REQUIRE_OWNWORK_DECLARATION=False)
+    def test_declaration_not_required(self):
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+
+    def test_local_config(self):
+        local_config = LocalConfig(ttl=10)
+        with mock.patch("inloop.accounts.middleware.time.monotonic", return_value=100):
+            with override_config(REQUIRE_OWNWORK_DECLARATION=True):
+                self.assertTrue(local_config.REQUIRE_OWNWORK_DECLARATION)
+            self.assertTrue(local_config.REQUIRE_OWNWORK_DECLARATION)
+        with mock.patch("inloop.accounts.middleware.time.monotonic", return_value=111):
+            self.assertFalse(local_config.REQUIRE_OWNWORK_DECLARATION)
+
+
 class StudentDetailsFormTest(TestCase):
     def test_matnum_validation(self):
         form1 = StudentDetailsForm(data={"matnum": "invalid"})
@@ -1,15 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest import TestCase
+from unittest.mock import Mock
 
 from django.conf import settings
+from django.core.cache import cache
 
 from markdown import Markdown
 
 from inloop.common.templatetags.markdown import (
+    CachedVersionProvider,
     GitVersionProvider,
     ImageVersionExtension,
     VersionProvider,
+    render_markdown,
 )
 
 
@@ -95,3 +100,45 @@ class NoopImageVersioningTest(TestCase):
     def test_no_version_is_appended(self):
         html = self.md.convert("![alt text](a/b/c.jpeg)")
         self.assertIn('src="a/b/c.jpeg"', html)
+
+
+class CachedVersionProviderTest(TestCase):
+    def setUp(self):
+        cache.delete(CachedVersionProvider.cache_key)
+        self.fallback = Mock(spec=VersionProvider)
+        self.provider = CachedVersionProvider(self.fallback)
+
+    def test_fallback_is_asked_only_once(self):
+        self.fallback.get_version.return_value = "cafebabe"
+        self.assertEqual(self.provider.get_version(), "cafebabe")
+        self.assertEqual(self.provider.get_version(), "cafebabe")
+        self.fallback.get_version.assert_called_once()
+
+    def test_unknown_version_is_cached(self):
+        self.fallback.get_version.return_value = None
+        self.assertIsNone(self.provider.get_version())
+        self.assertIsNone(self.provider.get_version())
+        self.fallback.get_version.assert_called_once()
+
+    def test_set_version(self):
+        CachedVersionProvider.set_version("deadbeef")
+        self.assertEqual(self.provider.get_version(), "deadbeef")
+        self.fallback.get_version.assert_not_called()
+
+
+class RenderMarkdownTest(TestCase):
+    def test_version_is_appended(self):
+        html = render_markdown("![alt text](a.png)", version="cafebabe")
+        self.assertIn('src="a.png?v=cafebabe"', html)
+        html = render_markdown("![alt text](a.png)")
+        self.assertIn('src="a.png"', html)
+
+    def test_concurrent_conversions(self):
+        def render(i):
+            return render_markdown(f"# Heading {i}\n\n![alt](img{i}.png)", version=str(i))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(render, range(200)))
+        for i, html in enumerate(results):
+            self.assertIn(f'<h1 id="heading-{i}">Heading {i}</h1>', html)
+            self.assertIn(f'src="img{i}.png?v={i}"', html)
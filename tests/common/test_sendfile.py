@@ -1,9 +1,12 @@
+from tempfile import TemporaryDirectory
+
 from django.conf import settings
 from django.http import Http404
 from django.test import SimpleTestCase, override_settings
 from django.test.client import RequestFactory
+from django.utils.http import http_date
 
-from inloop.common.sendfile import sendfile_nginx
+from inloop.common.sendfile import parse_range, sendfile_django, sendfile_nginx
 
 
 @override_settings(MEDIA_ROOT=str(settings.PACKAGE_DIR), X_ACCEL_LOCATION="/sendfile")
@@ -35,3 +38,74 @@ class NginxSendfileTests(SimpleTestCase):
     def test_nginx_sendfile_not_a_subdir(self):
         with self.assertRaises(Http404):
             sendfile_nginx(self.request, "test.jpg", self.invalid_docroot)
+
+
+class DjangoSendfileTests(SimpleTestCase):
+    factory = RequestFactory()
+    data = bytes(range(256)) * 4
+
+    def setUp(self):
+        tmpdir = TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.docroot = tmpdir.name
+        with open(f"{self.docroot}/test.bin", "wb") as stream:
+            stream.write(self.data)
+
+    def sendfile(self, method="get", **headers):
+        request = getattr(self.factory, method)("/test.bin", **headers)
+        response = sendfile_django(request, "test.bin", self.docroot, etag='"v1"')
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_response(self):
+        response = self.sendfile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], '"v1"')
+
+    def test_head_request(self):
+        response = self.sendfile("head")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Length"], "1024")
+
+    def test_range_request(self):
+        response = self.sendfile(HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+        self.assertEqual(response["Content-Range"], "bytes 100-199/1024")
+        self.assertEqual(response["Content-Length"], "100")
+
+    def test_unsatisfiable_range(self):
+        response = self.sendfile(HTTP_RANGE="bytes=2000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_if_range(self):
+        response = self.sendfile(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"v1"')
+        self.assertEqual(response.status_code, 206)
+        response = self.sendfile(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"v0"')
+        self.assertEqual(response.status_code, 200)
+        response = self.sendfile(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        response = self.sendfile(HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_file(self):
+        request = self.factory.get("/missing.bin")
+        with self.assertRaises(Http404):
+            sendfile_django(request, "missing.bin", self.docroot)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-", 10), (0, 9))
+        self.assertEqual(parse_range("bytes=5-100", 10), (5, 9))
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-30", 10), (0, 9))
+        self.assertEqual(parse_range("bytes=10-", 10), (-1, -1))
+        self.assertIsNone(parse_range("", 10))
+        self.assertIsNone(parse_range("bytes=5-2", 10))
+        self.assertIsNone(parse_range("bytes=0-1,3-4", 10))
+        self.assertIsNone(parse_range("items=0-1", 10))
@@ -1,9 +1,21 @@
-from unittest.mock import patch
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+from unittest.mock import Mock, patch
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
 
+from inloop.common.templatetags.markdown import repository_version
 from inloop.gitload.loader import InvalidTask, load_task, load_tasks, parse_metafile
-from inloop.gitload.repo import Repository
+from inloop.gitload.models import TaskImport
+from inloop.gitload.repo import GitRepository, Repository
+from inloop.gitload.signals import handle_repository_loaded
 from inloop.tasks.models import Category, FileTemplate, Task
 
 from . import TESTREPO_PATH
@@ -13,9 +25,15 @@ class TaskLoadTest(TestCase):
     @patch("inloop.gitload.loader.repository_loaded")
     @patch("inloop.gitload.loader.logger")
     def test_load_tasks(self, mocked_logger, mocked_signal):
-        load_tasks(Repository(TESTREPO_PATH))
+        report = load_tasks(Repository(TESTREPO_PATH))
         mocked_signal.send.assert_called_once()
         self.assertEqual(3, mocked_logger.error.call_count)
+        self.assertEqual(["task1", "task6"], sorted(report.created))
+        self.assertEqual(["task2_disabled"], report.disabled)
+        self.assertEqual(3, len(report.errors))
+        self.assertFalse(report.incremental)
+        # without version control, there is nothing to diff against
+        self.assertFalse(TaskImport.objects.exists())
 
     def test_load_task(self):
         self.assertEqual(0, len(Task.objects.all()))
@@ -84,3 +102,163 @@ class TaskLoadTest(TestCase):
         self.assertEqual(1, len(templates))
         self.assertEqual("Example.java", templates[0].name)
         self.assertEqual("/* example */\n", templates[0].contents)
+
+    def test_description_is_rendered(self):
+        load_task(TESTREPO_PATH.joinpath("task6/task.md"))
+        self.assertEqual("<p>task6 text</p>", Task.objects.get().description_html)
+
+    def test_unchanged_task_is_not_updated(self):
+        load_task(TESTREPO_PATH.joinpath("task6/task.md"))
+        updated_at = Task.objects.get().updated_at
+        load_task(TESTREPO_PATH.joinpath("task6/task.md"))
+        self.assertEqual(updated_at, Task.objects.get().updated_at)
+        FileTemplate.objects.update(contents="changed")
+        load_task(TESTREPO_PATH.joinpath("task6/task.md"))
+        self.assertLess(updated_at, Task.objects.get().updated_at)
+        self.assertEqual("/* example */\n", FileTemplate.objects.get().contents)
+
+
+GIT_ENVIRON = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@example.org",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@example.org",
+}
+
+
+@patch("inloop.gitload.loader.logger", Mock())
+@patch("inloop.gitload.loader.repository_loaded", Mock())
+class IncrementalLoadTest(TestCase):
+    def setUp(self):
+        tmpdir = TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.origin = os.path.join(tmpdir.name, "origin")
+        shutil.copytree(TESTREPO_PATH.joinpath("task1"), os.path.join(self.origin, "task1"))
+        shutil.copytree(TESTREPO_PATH.joinpath("task6"), os.path.join(self.origin, "task6"))
+        shutil.copy(TESTREPO_PATH.joinpath("Makefile"), self.origin)
+        self.git("init", "--quiet", "--initial-branch=main")
+        self.commit("Initial commit")
+        self.repository = GitRepository(
+            os.path.join(tmpdir.name, "clone"), url=f"file://{self.origin}", branch="main"
+        )
+
+    def git(self, *args):
+        subprocess.check_call(["git", *args], cwd=self.origin, env=GIT_ENVIRON)
+
+    def commit(self, message):
+        self.git("add", "--all")
+        self.git("commit", "--quiet", "--message", message)
+
+    def write(self, path, contents):
+        path = os.path.join(self.origin, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as stream:
+            stream.write(contents)
+
+    def test_first_import_is_full(self):
+        report = load_tasks(self.repository)
+        self.assertFalse(report.incremental)
+        self.assertEqual(["task1", "task6"], sorted(report.created))
+        self.assertEqual(self.repository.get_commit(), TaskImport.objects.get().commit)
+
+    def test_only_changed_tasks_are_imported(self):
+        load_tasks(self.repository)
+        self.write("task6/templates/Other.java", "/* other */")
+        self.write("task6/task.md", "new text")
+        self.commit("Change task6")
+        report = load_tasks(self.repository)
+        self.assertTrue(report.incremental)
+        self.assertEqual(["task6"], report.updated)
+        self.assertEqual([], report.created + report.unchanged)
+        task = Task.objects.get(system_name="task6")
+        self.assertEqual("new text", task.description)
+        self.assertEqual("<p>new text</p>", task.description_html)
+        self.assertEqual(2, FileTemplate.objects.filter(task=task).count())
+        self.assertIn("Updated: task6", TaskImport.objects.last().summary)
+
+    def test_unchanged_repository(self):
+        load_tasks(self.repository)
+        report = load_tasks(self.repository)
+        self.assertTrue(report.incremental)
+        self.assertEqual([], report.created + report.updated + report.unchanged)
+
+    def test_toplevel_changes_cause_full_import(self):
+        load_tasks(self.repository)
+        self.write("Makefile", "default:\n\ttrue\n")
+        self.commit("Change Makefile")
+        report = load_tasks(self.repository)
+        self.assertFalse(report.incremental)
+        self.assertEqual(["task1", "task6"], sorted(report.unchanged))
+
+    def test_version_is_cached(self):
+        load_tasks(self.repository)
+        handle_repository_loaded(sender=None, repository=self.repository)
+        self.assertEqual(self.repository.get_commit()[:7], repository_version.get_version())
+
+    def test_unknown_commit_causes_full_import(self):
+        load_tasks(self.repository)
+        TaskImport.objects.update(commit="0" * 40)
+        self.assertIsNone(self.repository.changed_files("0" * 40))
+        self.assertFalse(load_tasks(self.repository).incremental)
+
+
+@tag("benchmark")
+@patch("inloop.gitload.loader.logger", Mock())
+@patch("inloop.gitload.loader.repository_loaded", Mock())
+class LoadTasksBenchmark(TestCase):
+    """
+    Import a synthetic repository with many tasks and report the time it takes.
+
+    Excluded by default, run with
+    `./runtests.py --with-benchmarks -- tests.gitload.test_loader.LoadTasksBenchmark`.
+    """
+
+    num_tasks = 500
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = TemporaryDirectory()
+        for i in range(cls.num_tasks):
+            task_dir = os.path.join(cls.tmpdir.name, f"task{i}")
+            os.makedirs(os.path.join(task_dir, "templates"))
+            meta = {
+                "category": f"Category {i % 10}",
+                "title": f"Task {i}",
+                "pubdate": "2018-01-01",
+            }
+            with open(os.path.join(task_dir, "meta.json"), "w") as stream:
+                json.dump(meta, stream)
+            with open(os.path.join(task_dir, "task.md"), "w") as stream:
+                stream.write(f"# Task {i}\n\n" + "Lorem ipsum dolor sit amet. " * 200)
+            for name in ["Main.java", "Helper.java"]:
+                with open(os.path.join(task_dir, "templates", name), "w") as stream:
+                    stream.write(f"class {name[:-5]} {{ /* task {i} */ }}\n")
+        with open(os.path.join(cls.tmpdir.name, "Makefile"), "w") as stream:
+            stream.write("default:\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+    def load_tasks(self, label):
+        with CaptureQueriesContext(connection) as context:
+            start_time = time.perf_counter()
+            report = load_tasks(Repository(self.tmpdir.name))
+            duration = time.perf_counter() - start_time
+        sys.stderr.write(
+            f"\n{label} of {self.num_tasks} tasks: {duration:.2f}s, {len(context)} queries "
+        )
+        return report, len(context)
+
+    def test_import(self):
+        report, num_queries = self.load_tasks("initial import")
+        self.assertEqual(self.num_tasks, len(report.created))
+        self.assertEqual(2 * self.num_tasks, FileTemplate.objects.count())
+        # the number of queries must not depend on the number of tasks
+        self.assertLess(num_queries, 20)
+        report, num_queries = self.load_tasks("reimport")
+        self.assertEqual(self.num_tasks, len(report.unchanged))
+        self.assertLess(num_queries, 20)
@@ -3,12 +3,20 @@ from io import StringIO
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.test import TestCase
 
+from inloop.accounts.models import StudentDetails
 from inloop.grading.management.commands import tud_export_bonuspoints_csv
 from inloop.grading.management.commands.tud_export_bonuspoints_csv import filter_zeroes
-from inloop.grading.models import DetectedPlagiarism, PlagiarismTest, get_ripoff_tasks_for_user
+from inloop.grading.models import (
+    DetectedPlagiarism,
+    PlagiarismTest,
+    RipoffTask,
+    get_ripoff_tasks_for_user,
+    refresh_ripoff_tasks,
+)
 from inloop.grading.tud import calculate_grades, points_for_completed_tasks
 from inloop.solutions.models import Solution
 
@@ -38,6 +46,33 @@ class RipoffTest(DetectedPlagiarismData, TestCase):
         task_ids = get_ripoff_tasks_for_user(self.alice)
         self.assertIn(self.task.id, task_ids)
 
+    def test_ripoff_tasks_follow_vetoes(self):
+        self.detected_plagiarism_alice.veto = True
+        self.detected_plagiarism_alice.save()
+        self.assertNotIn(self.task.id, get_ripoff_tasks_for_user(self.alice))
+        self.assertIn(self.task.id, get_ripoff_tasks_for_user(self.bob))
+        self.detected_plagiarism_alice.veto = False
+        self.detected_plagiarism_alice.save()
+        self.assertIn(self.task.id, get_ripoff_tasks_for_user(self.alice))
+
+    def test_ripoff_tasks_follow_deletions(self):
+        DetectedPlagiarism.objects.create(
+            test=PlagiarismTest.objects.create(), solution=self.passed_solution_alice
+        )
+        self.detected_plagiarism_alice.delete()
+        self.assertIn(self.task.id, get_ripoff_tasks_for_user(self.alice))
+        self.plagiarism_test.delete()
+        self.assertIn(self.task.id, get_ripoff_tasks_for_user(self.alice))
+        self.assertNotIn(self.task.id, get_ripoff_tasks_for_user(self.bob))
+        DetectedPlagiarism.objects.all().delete()
+        self.assertFalse(RipoffTask.objects.exists())
+
+    def test_bulk_updates_are_refreshed(self):
+        DetectedPlagiarism.objects.update(veto=True)
+        refresh_ripoff_tasks([(self.alice.id, self.task.id)])
+        self.assertNotIn(self.task.id, get_ripoff_tasks_for_user(self.alice))
+        self.assertIn(self.task.id, get_ripoff_tasks_for_user(self.bob))
+
 
 class BasicBonuspointCalculationTest(SolutionsData, TestCase):
     """Test basic functionality behind bonus point calculation."""
@@ -264,3 +299,32 @@ class BonusPointsExportPlagiarismTimingTest(PassedSolutionsData, TemporaryMediaR
 
         self.assertIn("alice", rows)
         self.assertNotIn("bob", rows, "Bob should get no bonus for his plagiated solution!")
+
+
+class BonusPointsQueryCountTest(PlagiarismTestData, TestCase):
+    def create_students(self, start, stop):
+        for i in range(start, stop):
+            student = get_user_model().objects.create_user(
+                username=f"student{i}", email=f"student{i}@example.org"
+            )
+            StudentDetails.objects.create(user=student, matnum=str(i))
+            solution = Solution.objects.create(author=student, task=self.task, passed=True)
+            if i % 2:
+                DetectedPlagiarism.objects.create(test=self.plagiarism_test, solution=solution)
+
+    def test_constant_query_count(self):
+        """
+        Validate that the number of queries of the export does
+        not depend on the number of students.
+        """
+        category_name = self.task.category.name
+        self.create_students(0, 5)
+        # category, users with their details, solved tasks and rip-offs
+        with self.assertNumQueries(4):
+            stdout, file_contents, path = export_bonuspoints(category_name, datetime(1970, 1, 1))
+        self.assertEqual(len(file_contents), 5)
+        self.create_students(5, 20)
+        with self.assertNumQueries(4):
+            stdout, file_contents, path = export_bonuspoints(category_name, datetime(1970, 1, 1))
+        self.assertEqual(len(file_contents), 12)
+        self.assertIn("student10,student10@example.org,10,", "".join(file_contents))
@@ -0,0 +1,187 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from inloop.grading.copypasta import jplag_check
+from inloop.grading.fingerprints import (
+    filter_candidates,
+    find_candidate_pairs,
+    index_solution,
+    tokenize,
+    winnow,
+)
+from inloop.grading.models import Fingerprint, PlagiarismTest
+from inloop.solutions.models import Solution, SolutionFile
+from inloop.tasks.models import FileTemplate
+
+from tests.accounts.mixins import SimpleAccountsData
+from tests.solutions.mixins import SimpleTaskData
+from tests.tools import TemporaryMediaRootTestCase
+
+FIBONACCI = """
+public class Fibonacci {
+    // computes the x-th fibonacci number
+    public static int fib(final int x) {
+        if (x < 0) {
+            throw new IllegalArgumentException("x must be greater than or equal zero");
+        }
+        int a = 0;
+        int b = 1;
+        for (int i = 0; i < x; i++) {
+            int sum = a + b;
+            a = b;
+            b = sum;
+        }
+        return a;
+    }
+}
+"""
+
+RENAMED_FIBONACCI = """
+public class Fib {
+    /* Renamed, but otherwise the same. */
+    public static int fib(final int n) {
+        if (n < 0) {
+            throw new IllegalArgumentException("negative");
+        }
+        int prev = 0;
+        int curr = 1;
+        for (int j = 0; j < n; j++) {
+            int next = prev + curr;
+            prev = curr;
+            curr = next;
+        }
+        return prev;
+    }
+}
+"""
+
+GCD = """
+public class Gcd {
+    public static long gcd(long a, long b) {
+        while (b != 0) {
+            long t = b;
+            b = a % b;
+            a = t;
+        }
+        return Math.abs(a);
+    }
+
+    public static long lcm(long a, long b) {
+        return a / gcd(a, b) * b;
+    }
+}
+"""
+
+
+class TokenizeTest(TestCase):
+    def test_normalization(self):
+        self.assertEqual(
+            tokenize('int x = 42; // answer\nString s = "a;b"; /* c */'),
+            ["int", "I", "=", "L", ";", "I", "I", "=", "L", ";"],
+        )
+
+    def test_renamed_code_has_same_fingerprints(self):
+        self.assertEqual(winnow(tokenize(FIBONACCI)), winnow(tokenize(RENAMED_FIBONACCI)))
+        self.assertFalse(winnow(tokenize(FIBONACCI)) & winnow(tokenize(GCD)))
+
+    def test_short_code(self):
+        self.assertEqual(winnow(tokenize("int x;")), set())
+        self.assertEqual(len(winnow(tokenize("int x = y + z + w;"), k=8)), 2)
+
+
+class FingerprintIndexTest(SimpleAccountsData, SimpleTaskData, TemporaryMediaRootTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.solutions = {}
+        for author, source in [(cls.alice, FIBONACCI), (cls.bob, RENAMED_FIBONACCI)]:
+            cls.solutions[author.username] = cls.create_solution(author, source)
+
+    @classmethod
+    def create_solution(cls, author, source):
+        solution = Solution.objects.create(author=author, task=cls.task, passed=True)
+        SolutionFile.objects.create(
+            solution=solution, file=SimpleUploadedFile("Main.java", source.encode())
+        )
+        return solution
+
+    def test_index_solution(self):
+        solution = self.solutions["alice"]
+        index_solution(solution)
+        values = set(Fingerprint.objects.filter(solution=solution).values_list("value", flat=True))
+        self.assertEqual(values, winnow(tokenize(FIBONACCI)))
+        # indexing again replaces the fingerprints
+        index_solution(solution)
+        self.assertEqual(Fingerprint.objects.filter(solution=solution).count(), len(values))
+
+    def test_candidate_pairs(self):
+        carol = get_user_model().objects.create_user(username="carol")
+        gcd_solution = self.create_solution(carol, GCD)
+        for solution in [*self.solutions.values(), gcd_solution]:
+            index_solution(solution)
+        ids = [solution.id for solution in self.solutions.values()] + [gcd_solution.id]
+        pairs = find_candidate_pairs(ids, 50)
+        self.assertEqual(pairs, {(self.solutions["alice"].id, self.solutions["bob"].id): 100.0})
+
+    def create_solutions(self, sources):
+        solutions = list(self.solutions.values())
+        for i, source in enumerate(sources):
+            author = get_user_model().objects.create_user(username=f"user{i}")
+            solutions.append(self.create_solution(author, source))
+        for solution in solutions:
+            index_solution(solution)
+        return solutions
+
+    @patch("inloop.grading.fingerprints.MAX_PAIRED_OCCURRENCES", 2)
+    def test_large_groups_are_chained(self):
+        solutions = self.create_solutions([FIBONACCI, GCD, GCD, GCD])
+        pairs = find_candidate_pairs([solution.id for solution in solutions], 50)
+        self.assertEqual(
+            pairs,
+            {
+                (solutions[0].id, solutions[1].id): 100.0,
+                (solutions[1].id, solutions[2].id): 100.0,
+                (solutions[3].id, solutions[4].id): 100.0,
+                (solutions[4].id, solutions[5].id): 100.0,
+            },
+        )
+
+    @patch("inloop.grading.fingerprints.MAX_PAIRED_OCCURRENCES", 2)
+    def test_fingerprints_of_most_solutions_are_ignored(self):
+        solutions = self.create_solutions([FIBONACCI, GCD])
+        pairs = find_candidate_pairs([solution.id for solution in solutions], 50)
+        self.assertEqual(pairs, {})
+
+    def test_template_fingerprints_are_ignored(self):
+        FileTemplate.objects.create(task=self.task, name="Fibonacci.java", contents=FIBONACCI)
+        self.assertEqual(filter_candidates(self.solutions, 50, task=self.task), {})
+
+    def test_filter_candidates_indexes_missing_solutions(self):
+        self.assertEqual(filter_candidates(self.solutions, 50, task=self.task), self.solutions)
+        self.assertTrue(Fingerprint.objects.filter(solution=self.solutions["bob"]).exists())
+
+    def test_jplag_check_is_skipped_without_candidates(self):
+        carol = get_user_model().objects.create_user(username="carol")
+        self.create_solution(carol, GCD)
+        with patch("inloop.grading.copypasta.exec_jplag") as mocked_exec_jplag:
+            with TemporaryDirectory() as tmpdir:
+                output = jplag_check(
+                    [self.alice, carol], [self.task], 90, Path(tmpdir, "jplag"), prefilter=50
+                )
+        mocked_exec_jplag.assert_not_called()
+        self.assertEqual(output, set())
+
+    def test_prefiltered_similarities_are_incomplete(self):
+        def exec_jplag(min_similarity, root_path, result_path, *, max_memory):
+            result_path.mkdir()
+            yield "Comparing alice-bob: 95.0\n"
+
+        with patch("inloop.grading.copypasta.exec_jplag", side_effect=exec_jplag):
+            output = jplag_check([self.alice, self.bob], [self.task], 90, prefilter=50)
+        self.assertEqual(output, set(self.solutions.values()))
+        self.assertIsNone(PlagiarismTest.objects.get().min_stored_similarity)
@@ -1,11 +1,21 @@
 from pathlib import Path
 from tempfile import TemporaryDirectory, mkdtemp
+from unittest.mock import patch
+from zipfile import ZipFile
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import tag
 
-from inloop.grading.copypasta import jplag_check
-from inloop.solutions.models import SolutionFile
+from inloop.grading.copypasta import (
+    get_last_solutions,
+    jplag_check,
+    parse_output,
+    prepare_directories,
+)
+from inloop.grading.models import PlagiarismTest, SimilarityPair, save_plagiarism_set
+from inloop.solutions.models import Solution, SolutionFile
 from inloop.tasks.models import Task
 
 from tests.grading.mixins import PlagiatedSolutionsData
@@ -103,6 +113,103 @@ class JPlagCheckTest(PlagiatedSolutionsData, TemporaryMediaRootTestCase):
         task_without_solutions.delete()
 
 
+class ParallelJPlagCheckTest(PlagiatedSolutionsData, TemporaryMediaRootTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_task = Task.objects.create(
+            pubdate="2000-01-01 00:00Z",
+            category_id=1337,
+            title="Other task",
+            slug="other-task",
+            system_name="other-task",
+        )
+        for task in [cls.task, cls.other_task]:
+            for author in [cls.alice, cls.bob]:
+                solution = Solution.objects.create(author=author, task=task, passed=True)
+                SolutionFile.objects.create(
+                    solution=solution,
+                    file=SimpleUploadedFile("Fibonacci.java", FIBONACCI.encode()),
+                )
+
+    def test_last_solutions_query_count(self):
+        """Verify that the last solutions are fetched and copied with two queries."""
+        get_user_model().objects.create_user(username="no-solutions", password="secret")
+        with TemporaryDirectory() as tmpdir, self.assertNumQueries(2):
+            last_solutions = get_last_solutions(get_user_model().objects.all(), self.task)
+            prepare_directories(Path(tmpdir), last_solutions)
+            self.assertTrue(Path(tmpdir, "alice", "Fibonacci.java").is_file())
+        self.assertEqual(sorted(last_solutions), ["alice", "bob"])
+        self.assertEqual(
+            last_solutions["alice"],
+            Solution.objects.filter(author=self.alice, task=self.task, passed=True).last(),
+        )
+
+    def test_solutions_are_linked(self):
+        """Verify that the workspace contains hard links instead of copies, if possible."""
+        last_solutions = get_last_solutions([self.alice], self.task)
+        source = last_solutions["alice"].solutionfile_set.get().absolute_path
+        with TemporaryDirectory(dir=settings.MEDIA_ROOT) as tmpdir:
+            prepare_directories(Path(tmpdir), last_solutions)
+            self.assertTrue(Path(tmpdir, "alice", "Fibonacci.java").samefile(source))
+
+    def test_parse_output_lines(self):
+        last_solutions = get_last_solutions([self.alice, self.bob], self.task)
+        output = iter(["Comparing alice-bob: 95.5\n", "Comparing bob-alice: 12.0\n", "\n"])
+        self.assertEqual(parse_output(output, 90, last_solutions), set(last_solutions.values()))
+        self.assertEqual(parse_output(["Comparing alice-bob: 80.0\n"], 90, last_solutions), set())
+
+    def test_save_plagiarism_set_streams_archive(self):
+        with TemporaryDirectory() as tmpdir:
+            Path(tmpdir, "index.html").write_text("results")
+            save_plagiarism_set(set(), tmpdir)
+            self.assertEqual(sorted(path.name for path in Path(tmpdir).iterdir()), ["index.html"])
+        test = PlagiarismTest.objects.get()
+        self.assertTrue(test.zip_file.name.endswith(".zip"))
+        with ZipFile(test.zip_file.path) as zip_file:
+            self.assertEqual(zip_file.read("index.html"), b"results")
+
+    def test_tasks_are_merged_into_one_test(self):
+        def exec_jplag(min_similarity, root_path, result_path, *, max_memory):
+            self.assertEqual(sorted(path.name for path in root_path.iterdir()), ["alice", "bob"])
+            result_path.mkdir()
+            yield "Comparing alice-bob: 100.0\n"
+
+        with patch("inloop.grading.copypasta.exec_jplag", side_effect=exec_jplag) as mocked:
+            with TemporaryDirectory() as tmpdir:
+                output = jplag_check(
+                    users=[self.alice, self.bob],
+                    tasks=[self.task, self.other_task],
+                    min_similarity=90,
+                    result_dir=Path(tmpdir, "jplag"),
+                    workers=2,
+                    max_memory="256m",
+                )
+                result_dirs = sorted(path.name for path in Path(tmpdir, "jplag").iterdir())
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual(mocked.call_args.kwargs["max_memory"], "256m")
+        self.assertEqual(result_dirs, sorted([self.task.slug, self.other_task.slug]))
+        self.assertEqual(len(output), 4)
+        self.assertEqual(PlagiarismTest.objects.get().detectedplagiarism_set.count(), 4)
+        self.assertEqual(
+            sorted(SimilarityPair.objects.values_list("similarity", flat=True)), [100.0, 100.0]
+        )
+
+    def test_similarity_pairs_below_threshold_are_stored(self):
+        def exec_jplag(min_similarity, root_path, result_path, *, max_memory):
+            result_path.mkdir()
+            yield "Comparing alice-bob: 60.0\n"
+
+        with patch("inloop.grading.copypasta.exec_jplag", side_effect=exec_jplag):
+            with self.settings(JPLAG_MIN_STORED_SIMILARITY=50):
+                output = jplag_check(users=[self.alice, self.bob], tasks=[self.task])
+        self.assertEqual(output, set())
+        pair = SimilarityPair.objects.get()
+        self.assertEqual(pair.similarity, 60.0)
+        self.assertEqual({pair.solution1.author, pair.solution2.author}, {self.alice, self.bob})
+        self.assertEqual(PlagiarismTest.objects.get().min_stored_similarity, 50)
+
+
 @tag("slow")
 class JPlagFailedSolutionDetectionTest(FailedSolutionsData, TemporaryMediaRootTestCase):
     @classmethod
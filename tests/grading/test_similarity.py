@@ -0,0 +1,125 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from inloop.grading.models import DetectedPlagiarism, PlagiarismTest, RipoffTask, SimilarityPair
+from inloop.grading.similarity import apply_threshold, get_clusters
+from inloop.solutions.models import Solution
+
+from tests.accounts.mixins import AccountsData
+from tests.solutions.mixins import SimpleTaskData
+
+
+class SimilarityPairsData(AccountsData, SimpleTaskData):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.solutions = {
+            user.username: Solution.objects.create(author=user, task=cls.task, passed=True)
+            for user in [cls.alice, cls.bob, cls.chuck, cls.arnold]
+        }
+        cls.plagiarism_test = PlagiarismTest.objects.create(min_stored_similarity=10)
+        for username1, username2, similarity in [
+            ("alice", "bob", 95.0),
+            ("chuck", "bob", 80.0),
+            ("arnold", "chuck", 30.0),
+        ]:
+            SimilarityPair.objects.create(
+                test=cls.plagiarism_test,
+                solution1=cls.solutions[username1],
+                solution2=cls.solutions[username2],
+                similarity=similarity,
+            )
+
+    def get_detected_authors(self):
+        return sorted(
+            DetectedPlagiarism.objects.filter(veto=False).values_list(
+                "solution__author__username", flat=True
+            )
+        )
+
+
+class ClustersTest(SimilarityPairsData, TestCase):
+    def test_clusters(self):
+        clusters = get_clusters(self.plagiarism_test, 50)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(
+            sorted(solution.author.username for solution in clusters[0].solutions.values()),
+            ["alice", "bob", "chuck"],
+        )
+        self.assertEqual(clusters[0].max_similarity, 95.0)
+        self.assertEqual(len(get_clusters(self.plagiarism_test, 90)[0].solutions), 2)
+        self.assertEqual(len(get_clusters(self.plagiarism_test, 10)[0].solutions), 4)
+        self.assertEqual(get_clusters(self.plagiarism_test, 99), [])
+
+    def test_clusters_are_merged(self):
+        SimilarityPair.objects.create(
+            test=self.plagiarism_test,
+            solution1=self.solutions["arnold"],
+            solution2=self.solutions["alice"],
+            similarity=85.0,
+        )
+        clusters = get_clusters(self.plagiarism_test, 90)
+        self.assertEqual(len(clusters), 1)
+        clusters = get_clusters(self.plagiarism_test, 50)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(len(clusters[0].solutions), 4)
+        self.assertEqual(len(clusters[0].pairs), 3)
+
+    def test_apply_threshold(self):
+        self.assertEqual(apply_threshold(self.plagiarism_test, 90), 2)
+        self.assertEqual(self.get_detected_authors(), ["alice", "bob"])
+        self.assertEqual(
+            sorted(RipoffTask.objects.values_list("user__username", flat=True)), ["alice", "bob"]
+        )
+        vetoed = DetectedPlagiarism.objects.get(solution=self.solutions["alice"])
+        vetoed.veto = True
+        vetoed.save()
+        self.assertEqual(apply_threshold(self.plagiarism_test, 50), 3)
+        self.assertEqual(self.get_detected_authors(), ["bob", "chuck"])
+        self.assertEqual(apply_threshold(self.plagiarism_test, 99), 0)
+        self.assertEqual(self.get_detected_authors(), [])
+        self.assertFalse(RipoffTask.objects.exists())
+        self.assertTrue(DetectedPlagiarism.objects.filter(veto=True).exists())
+
+    def test_threshold_below_stored_minimum(self):
+        with self.assertRaises(ValueError):
+            apply_threshold(self.plagiarism_test, 5)
+        with self.assertRaises(ValueError):
+            apply_threshold(PlagiarismTest.objects.create(), 90)
+        self.assertFalse(DetectedPlagiarism.objects.exists())
+
+
+class ClustersAdminTest(SimilarityPairsData, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("admin:grading_plagiarismtest_clusters", args=[self.plagiarism_test.id])
+
+    def test_show_clusters(self):
+        self.client.force_login(self.chuck)
+        response = self.client.get(self.url, {"min_similarity": 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["clusters"]), 1)
+        self.assertContains(response, "95.0%")
+        response = self.client.get(self.url, {"min_similarity": 101})
+        self.assertEqual(response.context["clusters"], [])
+
+    def test_apply_threshold(self):
+        self.client.force_login(self.chuck)
+        response = self.client.post(self.url, {"min_similarity": 90})
+        self.assertRedirects(response, f"{self.url}?min_similarity=90")
+        self.assertEqual(self.get_detected_authors(), ["alice", "bob"])
+
+    def test_threshold_below_stored_minimum(self):
+        self.client.force_login(self.chuck)
+        response = self.client.post(self.url, {"min_similarity": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Only similarities of at least 10% have been stored.")
+        self.assertFalse(DetectedPlagiarism.objects.exists())
+
+    def test_requires_staff(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.arnold)
+        self.assertEqual(self.client.post(self.url, {"min_similarity": 90}).status_code, 403)
+        self.assertFalse(DetectedPlagiarism.objects.exists())
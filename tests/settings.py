@@ -5,6 +5,9 @@ HUEY = {
     "immediate": True,
 }
 
+# write editor checkpoints to the database, tests of the buffer use a fake Redis
+AUTOSAVE_REDIS_URL = None
+
 PASSWORD_HASHERS = [
     # speed up tests involving user authentication
     "django.contrib.auth.hashers.SHA1PasswordHasher",
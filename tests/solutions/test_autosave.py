@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from constance.test import override_config
+from redis.exceptions import ResponseError
+
+from inloop.solutions.autosave import (
+    flush_checkpoints,
+    get_buffered_files,
+    get_connection,
+    save_checkpoint,
+)
+from inloop.solutions.models import Checkpoint
+
+from tests.accounts.mixins import SimpleAccountsData
+from tests.tasks.mixins import TaskData
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the redis commands used by the autosave buffer."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field.encode())
+
+    def hscan_iter(self, key):
+        yield from list(self.hashes.get(key, {}).items())
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def rename(self, src, dst):
+        if src not in self.hashes:
+            raise ResponseError("no such key")
+        self.hashes[dst] = self.hashes.pop(src)
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def hget(self, key, field):
+        self.results.append(self.redis.hget(key, field))
+
+    def execute(self):
+        return self.results
+
+
+@override_config(ALLOWED_FILENAME_EXTENSIONS=".java")
+@override_settings(AUTOSAVE_REDIS_URL="redis://autosave.example.org:6379/2")
+class AutosaveTest(SimpleAccountsData, TaskData, TestCase):
+    files1 = [{"name": "Foo.java", "contents": "1"}]
+    files2 = [{"name": "Foo.java", "contents": "2"}]
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch("inloop.solutions.autosave._clients", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("inloop.solutions.autosave._connect", return_value=self.redis)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connection_is_reused(self):
+        self.assertIs(get_connection(), self.redis)
+        self.assertIs(get_connection(), self.redis)
+        self.connect.assert_called_once_with("redis://autosave.example.org:6379/2")
+
+    @override_settings(AUTOSAVE_REDIS_URL=None)
+    def test_without_redis(self):
+        self.assertIsNone(get_connection())
+        save_checkpoint(self.files1, self.published_task1, self.alice)
+        self.assertIsNone(get_buffered_files(self.published_task1, self.alice))
+        self.assertEqual(flush_checkpoints(), 0)
+        self.assertEqual(Checkpoint.objects.count(), 1)
+
+    @override_settings(AUTOSAVE_REDIS_URL=None)
+    def test_update_is_timestamped(self):
+        save_checkpoint(self.files1, self.published_task1, self.alice)
+        checkpoint = Checkpoint.objects.get()
+        save_checkpoint(self.files2, self.published_task1, self.alice)
+        updated_checkpoint = Checkpoint.objects.get()
+        self.assertEqual(updated_checkpoint.created_at, checkpoint.created_at)
+        self.assertGreater(updated_checkpoint.updated_at, checkpoint.updated_at)
+
+    def test_saves_are_coalesced(self):
+        save_checkpoint(self.files1, self.published_task1, self.alice)
+        save_checkpoint(self.files2, self.published_task1, self.alice)
+        self.assertFalse(Checkpoint.objects.exists())
+        self.assertEqual(get_buffered_files(self.published_task1, self.alice), self.files2)
+        self.assertIsNone(get_buffered_files(self.published_task1, self.bob))
+
+    def test_invalid_files_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            save_checkpoint([{"name": "foo.txt", "contents": ""}], self.published_task1, self.bob)
+        self.assertIsNone(get_buffered_files(self.published_task1, self.bob))
+
+    def test_flush(self):
+        save_checkpoint(self.files1, self.published_task1, self.alice)
+        save_checkpoint(self.files2, self.published_task2, self.alice)
+        save_checkpoint(self.files2, self.published_task1, self.bob)
+        self.assertEqual(flush_checkpoints(batch_size=2), 3)
+        self.assertEqual(Checkpoint.objects.count(), 3)
+        checkpoint = Checkpoint.objects.get(author=self.alice, task=self.published_task1)
+        self.assertEqual(checkpoint.checkpointfile_set.get().contents, "1")
+        self.assertIsNone(get_buffered_files(self.published_task1, self.alice))
+        self.assertEqual(flush_checkpoints(), 0)
+
+    def test_interrupted_flush_is_resumed(self):
+        save_checkpoint(self.files1, self.published_task1, self.alice)
+        with patch("inloop.solutions.autosave._flush_batch", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                flush_checkpoints()
+        # a newer save must still be visible and win over the interrupted flush
+        save_checkpoint(self.files2, self.published_task1, self.alice)
+        self.assertEqual(get_buffered_files(self.published_task1, self.alice), self.files2)
+        self.assertEqual(flush_checkpoints(), 1)
+        self.assertEqual(flush_checkpoints(), 1)
+        checkpoint = Checkpoint.objects.get(author=self.alice, task=self.published_task1)
+        self.assertEqual(checkpoint.checkpointfile_set.get().contents, "2")
+
+    def test_editor_reads_buffered_files(self):
+        save_checkpoint(self.files2, self.published_task1, self.alice)
+        self.assertTrue(self.client.login(username="alice", password="secret"))
+        response = self.client.get(
+            reverse("solutions:get-last-checkpoint", kwargs={"slug": self.published_task1.slug})
+        )
+        self.assertJSONEqual(response.content, {"success": True, "files": self.files2})
@@ -1,16 +1,26 @@
+import os
+import time
 from datetime import datetime
 from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import CommandError, call_command
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
-from inloop.solutions.models import Solution
+from inloop.grading.models import DetectedPlagiarism, PlagiarismTest, RipoffTask
+from inloop.solutions.management.commands.unreferenced_files import find_unreferenced, scan_files
+from inloop.solutions.models import Solution, SolutionFile
 from inloop.tasks.models import Task
+from inloop.testrunner.models import TestResult
 
+from tests.accounts.mixins import SimpleAccountsData
 from tests.solutions.mixins import SimpleTaskData
+from tests.tools import TemporaryMediaRootTestCase
 
 User = get_user_model()
 
@@ -66,3 +76,115 @@ class GenerateSubmissionsCommandTest(SimpleTaskData, TestCase):
             with self.assertRaisesRegex(CommandError, "Too many solutions requested"):
                 call_command("generate_submissions", "2", "5")
         self.assertEqual(Solution.objects.count(), 0)
+
+
+class PruneSolutionsCommandTest(SimpleAccountsData, SimpleTaskData, TemporaryMediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.solutions = [self.create_solution(self.alice) for _ in range(3)]
+        self.solutions.append(self.create_solution(self.bob))
+
+    def create_solution(self, author):
+        solution = Solution.objects.create(author=author, task=self.task)
+        SolutionFile.objects.create(
+            solution=solution, file=SimpleUploadedFile("Fibonacci.java", b"class Fibonacci {}")
+        )
+        return solution
+
+    def test_max_keep_is_validated(self):
+        with self.assertRaisesRegex(CommandError, "max_keep must be >= 1"):
+            call_command("prune_solutions", max_keep=0)
+
+    def test_dry_run_deletes_nothing(self):
+        stdout = StringIO()
+        call_command("prune_solutions", max_keep=1, dry_run=True, stdout=stdout)
+        self.assertIn("Would prune 2 solution(s) with 2 file(s).", stdout.getvalue())
+        self.assertEqual(Solution.objects.count(), 4)
+
+    def test_last_solutions_are_kept(self):
+        paths = [solution.solutionfile_set.get().absolute_path for solution in self.solutions]
+        stdout = StringIO()
+        call_command("prune_solutions", max_keep=1, chunk_size=1, stdout=stdout)
+        self.assertIn("Pruned 2 solution(s)", stdout.getvalue())
+        self.assertIn("Removed 2 of 2 file(s)", stdout.getvalue())
+        self.assertQuerysetEqual(
+            Solution.objects.order_by("id"), [self.solutions[2], self.solutions[3]]
+        )
+        self.assertEqual(SolutionFile.objects.count(), 2)
+        self.assertFalse(paths[0].exists())
+        self.assertFalse(paths[1].exists())
+        self.assertTrue(paths[2].exists())
+
+    def test_test_results_are_deleted(self):
+        TestResult.objects.create(solution=self.solutions[0])
+        call_command("prune_solutions", max_keep=2, stdout=StringIO())
+        self.assertFalse(TestResult.objects.exists())
+        self.assertEqual(Solution.objects.count(), 3)
+
+    def test_ripoff_tasks_are_refreshed(self):
+        test = PlagiarismTest.objects.create()
+        DetectedPlagiarism.objects.create(test=test, solution=self.solutions[0])
+        DetectedPlagiarism.objects.create(test=test, solution=self.solutions[3])
+        self.assertEqual(RipoffTask.objects.count(), 2)
+        call_command("prune_solutions", max_keep=1, stdout=StringIO())
+        self.assertQuerysetEqual(RipoffTask.objects.values_list("user", flat=True), [self.bob.id])
+
+
+class UnreferencedFilesCommandTest(SimpleAccountsData, SimpleTaskData, TestCase):
+    def setUp(self):
+        super().setUp()
+        # use a private media root, other tests may leave files behind in TEST_MEDIA_ROOT
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings = self.settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        solution = Solution.objects.create(author=self.alice, task=self.task)
+        self.solution_file = SolutionFile.objects.create(
+            solution=solution, file=SimpleUploadedFile("Fibonacci.java", b"class Fibonacci {}")
+        )
+        self.orphan = Path(self.media_root, "solutions", "2000", "task", "x", "Orphan.java")
+        self.orphan.parent.mkdir(parents=True)
+        self.orphan.write_text("class Orphan {}")
+
+    def test_scan_files_is_sorted(self):
+        root = Path(self.media_root, "scan")
+        for path in ["a/b", "a-c", "a/a/a", "b"]:
+            root.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+            root.joinpath(path).touch()
+        files = list(scan_files(str(root.parent), "scan", max_mtime=time.time()))
+        self.assertEqual(files, ["scan/a-c", "scan/a/a/a", "scan/a/b", "scan/b"])
+
+    def test_find_unreferenced(self):
+        files = ["a", "b", "c", "d"]
+        self.assertEqual(list(find_unreferenced(files, ["b", "d", "e"])), ["a", "c"])
+        self.assertEqual(list(find_unreferenced(files, [])), files)
+
+    def test_report_only(self):
+        stdout = StringIO()
+        call_command("unreferenced_files", min_age=0, stdout=stdout)
+        self.assertIn("solutions/2000/task/x/Orphan.java", stdout.getvalue())
+        self.assertIn("Found 1 unreferenced file(s).", stdout.getvalue())
+        self.assertTrue(self.orphan.exists())
+
+    def test_min_age(self):
+        stdout = StringIO()
+        call_command("unreferenced_files", stdout=stdout)
+        self.assertIn("Found 0 unreferenced file(s).", stdout.getvalue())
+
+    def test_delete(self):
+        call_command("unreferenced_files", min_age=0, delete=True, stdout=StringIO())
+        self.assertFalse(self.orphan.exists())
+        self.assertTrue(self.solution_file.absolute_path.exists())
+
+    def test_quarantine(self):
+        with TemporaryDirectory() as quarantine:
+            call_command("unreferenced_files", min_age=0, quarantine=quarantine, stdout=StringIO())
+            self.assertTrue(Path(quarantine, "solutions/2000/task/x/Orphan.java").exists())
+        self.assertFalse(self.orphan.exists())
+        self.assertTrue(self.solution_file.absolute_path.exists())
+
+    def test_quarantine_inside_media_root(self):
+        with self.assertRaisesRegex(CommandError, "must not be inside MEDIA_ROOT"):
+            call_command("unreferenced_files", quarantine=os.path.join(self.media_root, "q"))
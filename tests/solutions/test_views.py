@@ -7,6 +7,7 @@ from unittest.mock import patch
 
 from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import HttpRequest
@@ -25,7 +26,7 @@ from inloop.solutions.models import (
     create_archive,
 )
 from inloop.solutions.views import _get_layout_preference, parse_json_payload
-from inloop.tasks.models import FileTemplate
+from inloop.tasks.models import FileTemplate, Task
 from inloop.testrunner.models import TestResult
 
 from tests.accounts.mixins import AccountsData, SimpleAccountsData
@@ -267,6 +268,8 @@ class GetCheckpointTests(AccountsData, TaskData, TestCase):
     urlname = "solutions:get-last-checkpoint"
 
     def setUp(self):
+        # the cached file templates outlive the rollback of each test
+        cache.clear()
         self.assertTrue(self.client.login(username="alice", password="secret"))
 
     def test_returns_dont_cache_headers(self):
@@ -329,8 +332,10 @@ class GetCheckpointTests(AccountsData, TaskData, TestCase):
         )
 
     def test_returns_file_templates(self):
-        FileTemplate.objects.create(task=self.published_task1, name="Foo.java", contents="Foo")
-        FileTemplate.objects.create(task=self.published_task1, name="Bar.java", contents="Bar")
+        # the cached templates are invalidated when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            FileTemplate.objects.create(task=self.published_task1, name="Foo.java", contents="Foo")
+            FileTemplate.objects.create(task=self.published_task1, name="Bar.java", contents="Bar")
         response = self.client.get(
             reverse(
                 self.urlname,
@@ -351,8 +356,41 @@ class GetCheckpointTests(AccountsData, TaskData, TestCase):
             },
         )
 
+    def test_file_templates_are_revalidated(self):
+        url = reverse(self.urlname, kwargs={"slug": self.published_task1.slug})
+        response = self.client.get(url)
+        self.assertIn("ETag", response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.captureOnCommitCallbacks(execute=True):
+            FileTemplate.objects.create(task=self.published_task1, name="Foo.java", contents="Foo")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["files"]), 1)
+
+    def test_file_templates_are_cached(self):
+        url = reverse(self.urlname, kwargs={"slug": self.published_task1.slug})
+        self.client.get(url)
+        # user, task and checkpoint lookup, but no file templates
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_checkpoints_are_not_revalidated(self):
+        checkpoint = Checkpoint.objects.create(author=self.alice, task=self.published_task1)
+        CheckpointFile.objects.create(checkpoint=checkpoint, name="A.java", contents="A")
+        response = self.client.get(
+            reverse(self.urlname, kwargs={"slug": self.published_task1.slug})
+        )
+        self.assertNotIn("ETag", response)
+        self.assertIn("no-store", response["Cache-Control"])
+
 
 class EditorTest(SimpleAccountsData, TaskData, TestCase):
+    def setUp(self):
+        # the cached task descriptions outlive the rollback of each test
+        cache.clear()
+
     def test_group_access(self):
         group = Group.objects.create(name="Group1")
         self.published_task1.group = group
@@ -365,6 +403,23 @@ class EditorTest(SimpleAccountsData, TaskData, TestCase):
         response = self.client.get(reverse("solutions:editor", args=["task-1"]))
         self.assertEqual(response.status_code, 404)
 
+    def test_prerendered_description(self):
+        Task.objects.filter(id=self.published_task1.id).update(description_html="<p>Task 1</p>")
+        self.assertTrue(self.client.login(username="alice", password="secret"))
+        with patch("inloop.common.templatetags.markdown.convert") as convert:
+            response = self.client.get(reverse("solutions:editor", args=["task-1"]))
+        self.assertContains(response, "<p>Task 1</p>", html=True)
+        convert.assert_not_called()
+
+    def test_description_not_yet_rendered(self):
+        Task.objects.filter(id=self.published_task1.id).update(description="Task *1*")
+        self.assertTrue(self.client.login(username="alice", password="secret"))
+        response = self.client.get(reverse("solutions:editor", args=["task-1"]))
+        self.assertContains(response, "<p>Task <em>1</em></p>", html=True)
+        with patch("inloop.common.templatetags.markdown.convert") as convert:
+            self.client.get(reverse("solutions:editor", args=["task-1"]))
+        convert.assert_not_called()
+
     def test_redirect_to_slug(self):
         self.assertTrue(self.client.login(username="alice", password="secret"))
         response = self.client.get(reverse("solutions:editor", args=["Task1"]))
@@ -632,6 +687,28 @@ class EditorSaveTest(SimpleAccountsData, TaskData, TestCase):
         self.assertEqual(files[0].name, "foo.txt")
         self.assertEqual(files[0].contents, "bar")
 
+    @override_config(ALLOWED_FILENAME_EXTENSIONS=".txt")
+    def test_only_changed_files_are_rewritten(self):
+        url = reverse(self.urlname, args=["task-1"])
+        files = [
+            {"name": "a.txt", "contents": "a"},
+            {"name": "b.txt", "contents": "b"},
+            {"name": "c.txt", "contents": "c"},
+        ]
+        self.client.post(url, content_type="application/json", data={"files": files})
+        checkpoint = Checkpoint.objects.get(task=self.published_task1, author=self.alice)
+        file_a = checkpoint.checkpointfile_set.get(name="a.txt")
+        files = [{"name": "a.txt", "contents": "a"}, {"name": "b.txt", "contents": "B"}]
+        response = self.client.post(url, content_type="application/json", data={"files": files})
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(self.count_checkpoints(), 1)
+        self.assertEqual(checkpoint.checkpointfile_set.get(name="a.txt"), file_a)
+        self.assertQuerysetEqual(
+            checkpoint.checkpointfile_set.values_list("name", "contents"),
+            [("a.txt", "a"), ("b.txt", "B")],
+            transform=tuple,
+        )
+
     def test_save_empty_fileset(self):
         response = self.client.post(
             reverse(self.urlname, args=["task-1"]),
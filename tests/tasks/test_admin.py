@@ -0,0 +1,21 @@
+from unittest.mock import Mock, patch
+
+from django.contrib.admin import site
+from django.test import RequestFactory, TestCase
+
+from inloop.tasks.admin import TaskAdmin
+from inloop.tasks.models import Task
+
+from tests.tasks.mixins import TaskData
+
+
+class TaskAdminTest(TaskData, TestCase):
+    @patch("inloop.tasks.admin.repository_version")
+    def test_description_is_rendered_with_version(self, mocked_version):
+        mocked_version.get_version.return_value = "cafebabe"
+        task = self.published_task1
+        task.description = "![alt text](images/a.png)"
+        form = Mock(changed_data=["description"])
+        TaskAdmin(Task, site).save_model(RequestFactory().post("/"), task, form, change=True)
+        task.refresh_from_db()
+        self.assertIn('src="images/a.png?v=cafebabe"', task.description_html)
@@ -1,10 +1,12 @@
 from unittest.mock import patch
 
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.http import HttpResponse
 from django.test import TestCase
 from django.urls import reverse
 
+from inloop.common.templatetags.markdown import CachedVersionProvider
 from inloop.tasks.models import Category
 
 from tests.accounts.mixins import SimpleAccountsData
@@ -53,6 +55,8 @@ class CategoryViewTest(SimpleAccountsData, TaskData, TestCase):
 @patch("inloop.tasks.views.sendfile")
 class AttachmentViewTest(SimpleAccountsData, TaskData, TestCase):
     def setUp(self):
+        # cached permission checks would outlive the rollback of each test
+        cache.clear()
         self.assertTrue(self.client.login(username="bob", password="secret"))
 
     def get_url(self, slug, path):
@@ -98,3 +102,50 @@ class AttachmentViewTest(SimpleAccountsData, TaskData, TestCase):
         response = self.client.get(self.get_url(self.published_task1.slug, "images/../foo.png"))
         self.assertEqual(response.status_code, 404)
         mocked_sendfile.assert_not_called()
+
+    def test_permission_check_is_cached(self, mocked_sendfile):
+        mocked_sendfile.return_value = HttpResponse()
+        url = self.get_url(self.published_task1.slug, "images/foo.png")
+        self.client.get(url)
+        # only the user lookup of the authentication
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_change_invalidates_cached_permission(self, mocked_sendfile):
+        mocked_sendfile.return_value = HttpResponse()
+        group = Group.objects.create(name="Group")
+        self.published_task1.group = group
+        self.published_task1.save()
+        url = self.get_url(self.published_task1.slug, "images/foo.png")
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.groups.add(group)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            group.user_set.clear()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_conditional_request(self, mocked_sendfile):
+        CachedVersionProvider.set_version("cafebabe")
+        mocked_sendfile.return_value = HttpResponse()
+        url = self.get_url(self.published_task1.slug, "images/foo.png")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"cafebabe-'))
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        mocked_sendfile.assert_called_once()
+        CachedVersionProvider.set_version("deadbeef")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_versioned_request_is_cached_forever(self, mocked_sendfile):
+        mocked_sendfile.return_value = HttpResponse()
+        response = self.client.get(
+            self.get_url(self.published_task1.slug, "images/foo.png"), {"v": "cafebabe"}
+        )
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
@@ -1,20 +1,42 @@
+import csv
 import json
 from datetime import datetime
 from http import HTTPStatus
+from io import StringIO
 from json import JSONDecodeError
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import FieldError, ValidationError
+from django.core.management import call_command
 from django.db.models import functions
 from django.test import TestCase
 from django.urls import reverse
 from django.urls.exceptions import NoReverseMatch
+from django.utils import timezone
 from django.utils.timezone import make_aware
 
 from inloop.solutions.models import Solution
+from inloop.statistics.analytics import get_task_metrics
 from inloop.statistics.forms import ALLOWED_TRUNCATOR_IDENTIFIERS, validate_granularity
-from inloop.statistics.views import bad_request, queryset_limit_reached
+from inloop.statistics.models import (
+    GRANULARITIES,
+    FirstPass,
+    SubmissionCount,
+    truncate,
+    update_rollups,
+    update_rollups_on_commit,
+)
+from inloop.statistics.rollups import rebuild_rollups
+from inloop.statistics.views import (
+    CLOSED_RANGE_TIMEOUT,
+    SubmissionsHistogramJsonView,
+    bad_request,
+    queryset_limit_reached,
+)
 from inloop.tasks.models import Category, Task
+from inloop.testrunner.models import TestResult
 
 User = get_user_model()
 
@@ -194,10 +216,12 @@ class SubmissionsHistogramJsonViewTest(TestCase):
         )
         cls.second_solution.submission_date = submission_date
         cls.second_solution.save()
+        rebuild_rollups()
 
     def setUp(self):
         """Prepare the submissions histogram api url."""
         super().setUp()
+        cache.clear()
         try:
             self.url = reverse("statistics:submissions_histogram_api")
         except NoReverseMatch as error:
@@ -243,6 +267,133 @@ class SubmissionsHistogramJsonViewTest(TestCase):
         self.assertEqual(len(histogram), 1)
         self.assertEqual(histogram[0]["count"], 2)
 
+    def test_partial_first_bucket(self):
+        """Verify that the bucket containing from_timestamp is included as a whole."""
+        for granularity in ["month", "year"]:
+            response = self.get_histogram(from_timestamp="1970-01-15", granularity=granularity)
+            histogram = json.loads(response.content)["histogram"]
+            self.assertEqual(len(histogram), 1)
+            self.assertEqual(histogram[0]["count"], 2)
+        response = self.get_histogram(from_timestamp="1970-01-15", granularity="day")
+        self.assertEqual(json.loads(response.content)["histogram"], [])
+
+    def get_histogram(self, **params):
+        self.client.force_login(self.super_user)
+        response = self.client.get(self.url, {"granularity": "day", **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response
+
+    def test_closed_range_is_cached_until_rebuild(self):
+        with patch("inloop.statistics.views.cache.set", wraps=cache.set) as mocked_set:
+            self.get_histogram(to_timestamp="1970-01-01")
+        self.assertEqual(mocked_set.call_args.kwargs["timeout"], CLOSED_RANGE_TIMEOUT)
+        SubmissionCount.objects.update(num_submissions=5)
+        response = self.get_histogram(to_timestamp="1970-01-01")
+        self.assertEqual(json.loads(response.content)["histogram"][0]["count"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_rollups()
+        SubmissionCount.objects.update(num_submissions=5)
+        response = self.get_histogram(to_timestamp="1970-01-01")
+        self.assertEqual(json.loads(response.content)["histogram"][0]["count"], 5)
+
+    def test_open_range_is_cached_briefly(self):
+        with patch("inloop.statistics.views.cache.set", wraps=cache.set) as mocked_set:
+            self.get_histogram(from_timestamp="1970-01-01")
+        self.assertEqual(mocked_set.call_args.kwargs["timeout"], 60)
+
+    def test_filters_are_normalized(self):
+        self.get_histogram(passed=True, queryset_limit=10)
+        with patch.object(SubmissionsHistogramJsonView, "get_histogram") as mocked_get_histogram:
+            self.get_histogram(passed="true", queryset_limit=20)
+        mocked_get_histogram.assert_not_called()
+        self.client.force_login(self.super_user)
+        response = self.client.get(self.url, {"granularity": "day", "queryset_limit": 1})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_conditional_get(self):
+        etag = self.get_histogram()["ETag"]
+        response = self.client.get(self.url, {"granularity": "day"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(
+            self.url, {"granularity": "day", "passed": False}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SubmissionsExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff_user = User.objects.create_user(
+            username="staff_user", password="secret", email="staff_user@example.com", is_staff=True
+        )
+        cls.category = Category.objects.create(id=1337, name="Test Category")
+        cls.task = Task.objects.create(
+            pubdate="2000-01-01 00:00Z",
+            category_id=1337,
+            title="Fibonacci",
+            slug="task",
+            system_name="fibonacci",
+        )
+        cls.passed_solution = Solution.objects.create(
+            author=cls.staff_user, task=cls.task, passed=True
+        )
+        TestResult.objects.create(solution=cls.passed_solution, return_code=1)
+        TestResult.objects.create(solution=cls.passed_solution, return_code=0, time_taken=1.5)
+        cls.pending_solution = Solution.objects.create(author=cls.staff_user, task=cls.task)
+
+    def setUp(self):
+        self.url = reverse("statistics:submissions_export")
+
+    def get_content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attachment", response["Content-Disposition"])
+        rows = list(csv.DictReader(StringIO(self.get_content(response))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["solution_id"], str(self.passed_solution.id))
+        self.assertEqual(rows[0]["author"], "staff_user")
+        self.assertEqual(rows[0]["task"], "fibonacci")
+        self.assertEqual(rows[0]["category"], "Test Category")
+        self.assertEqual(rows[0]["status"], "success")
+        self.assertEqual(rows[0]["time_taken"], "1.5")
+        self.assertEqual(rows[1]["status"], "pending")
+
+    def test_ndjson_with_filters(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get(
+            self.url, {"format": "ndjson", "passed": False, "category_id": self.category.id}
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.get_content(response).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row["solution_id"], self.pending_solution.id)
+        self.assertIs(row["passed"], False)
+        self.assertIsNone(row["time_taken"])
+
+    def test_bad_request(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.url, {"format": "xml"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_staff_only(self):
+        User.objects.create_user(username="regular_user", password="secret")
+        self.client.login(username="regular_user", password="secret")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command("export_submissions", "--format=ndjson", "--passed=true", stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["status"], "success")
+
 
 class AttemptsHistogramJsonViewTest(TestCase):
     @classmethod
@@ -273,10 +424,12 @@ class AttemptsHistogramJsonViewTest(TestCase):
         # the user fiddled around and submitted some more solutions
         for passed in [True, False, False, True]:
             Solution.objects.create(author=cls.regular_user, task=cls.task, passed=passed)
+        rebuild_rollups()
 
     def setUp(self):
         """Prepare the attempts histogram api url."""
         super().setUp()
+        cache.clear()
         try:
             self.url = reverse("statistics:attempts_histogram_api")
         except NoReverseMatch as error:
@@ -321,3 +474,178 @@ class AttemptsHistogramJsonViewTest(TestCase):
         histogram = data.get("histogram")
         self.assertIsNotNone(histogram)
         self.assertEqual(histogram, {"4": 1, "1": 1})
+
+
+class RollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author", email="author@example.org", password="secret"
+        )
+        cls.category = Category.objects.create(id=1337, name="Test Category")
+        cls.task = Task.objects.create(
+            pubdate="2000-01-01 00:00Z", category_id=1337, title="Fibonacci", slug="task"
+        )
+
+    def get_rollups(self):
+        counts = SubmissionCount.objects.filter(num_submissions__gt=0)
+        return (
+            sorted(
+                counts.values_list("granularity", "date", "task_id", "passed", "num_submissions")
+            ),
+            sorted(FirstPass.objects.values_list("task_id", "author_id", "scoped_id")),
+        )
+
+    def submit(self, passed):
+        solution = Solution.objects.create(author=self.author, task=self.task)
+        update_rollups(solution.id)
+        solution.passed = passed
+        solution.save(update_fields=["passed"])
+        update_rollups(solution.id)
+        return solution
+
+    def test_truncate(self):
+        date = make_aware(datetime(2020, 3, 15, 12, 34, 56))
+        self.assertEqual(
+            [truncate(date, granularity) for granularity in GRANULARITIES],
+            [
+                make_aware(datetime(2020, 3, 15, 12, 34)),
+                make_aware(datetime(2020, 3, 15, 12)),
+                make_aware(datetime(2020, 3, 15)),
+                make_aware(datetime(2020, 3, 1)),
+                make_aware(datetime(2020, 1, 1)),
+            ],
+        )
+
+    def test_truncate_matches_database(self):
+        solution = self.submit(passed=False)
+        for granularity in GRANULARITIES:
+            self.assertEqual(
+                Solution.objects.annotate(date=functions.Trunc("submission_date", granularity))
+                .values_list("date", flat=True)
+                .get(),
+                truncate(solution.submission_date, granularity),
+            )
+
+    def test_incremental_updates_match_rebuild(self):
+        for passed in [False, True, False, True]:
+            self.submit(passed)
+        Solution.objects.filter(scoped_id=2).update(passed=False)
+        update_rollups(Solution.objects.get(scoped_id=2).id)
+        # the first pass is only corrected by a rebuild
+        self.assertEqual(self.get_rollups()[1], [(self.task.id, self.author.id, 2)])
+        submission_counts = self.get_rollups()[0]
+        rebuild_rollups()
+        self.assertEqual(self.get_rollups()[0], submission_counts)
+        self.assertEqual(self.get_rollups()[1], [(self.task.id, self.author.id, 4)])
+        self.assertEqual(
+            SubmissionCount.objects.get(granularity="year", passed=False).num_submissions, 3
+        )
+
+    def test_repeated_update(self):
+        solution = self.submit(passed=True)
+        update_rollups(solution.id)
+        count = SubmissionCount.objects.get(granularity="day", passed=True)
+        self.assertEqual(count.num_submissions, 1)
+        self.assertFalse(SubmissionCount.objects.filter(passed=False, num_submissions__gt=0))
+
+    def test_check_before_submission(self):
+        # the task of the check may run before the one of the submission
+        solution = Solution.objects.create(author=self.author, task=self.task, passed=True)
+        update_rollups(solution.id)
+        update_rollups(solution.id)
+        counts = SubmissionCount.objects.filter(granularity="year")
+        self.assertEqual(counts.get().passed, True)
+        self.assertEqual(counts.get().num_submissions, 1)
+
+    def test_rebuild_marks_solutions_as_counted(self):
+        solution = Solution.objects.create(author=self.author, task=self.task)
+        rebuild_rollups()
+        self.assertEqual(Solution.objects.get().counted_passed, False)
+        update_rollups(solution.id)
+        self.assertEqual(self.get_rollups()[0][0][-1], 1)
+
+    def test_counts_never_become_negative(self):
+        solution = Solution.objects.create(author=self.author, task=self.task, passed=True)
+        rebuild_rollups()
+        # e.g. the result has been changed after the rollups were rebuilt from a snapshot
+        Solution.objects.update(counted_passed=False)
+        SubmissionCount.objects.update(num_submissions=0)
+        update_rollups(solution.id)
+        self.assertFalse(SubmissionCount.objects.filter(num_submissions__lt=0).exists())
+
+    def test_update_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            solution = Solution.objects.create(author=self.author, task=self.task)
+            update_rollups_on_commit(solution)
+            self.assertFalse(SubmissionCount.objects.exists())
+        self.assertEqual(self.get_rollups()[0][0][-1], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            solution.passed = True
+            solution.save(update_fields=["passed"])
+            update_rollups_on_commit(solution)
+        counts = SubmissionCount.objects.filter(granularity="year")
+        self.assertEqual(counts.get(passed=True).num_submissions, 1)
+        self.assertEqual(counts.get(passed=False).num_submissions, 0)
+        self.assertEqual(self.get_rollups()[1], [(self.task.id, self.author.id, 1)])
+
+
+class TaskAnalyticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff_user = User.objects.create_user(
+            username="staff_user", password="secret", email="staff_user@example.com", is_staff=True
+        )
+        cls.regular_user = User.objects.create_user(username="regular_user", password="secret")
+        cls.category = Category.objects.create(id=1337, name="Test Category")
+        cls.task = Task.objects.create(
+            pubdate="2000-01-01 00:00Z", category_id=1337, title="Fibonacci", slug="task"
+        )
+        start = make_aware(datetime(2020, 1, 1))
+        # the staff user passes after 60 seconds, the regular user after 180 seconds
+        attempts = {cls.staff_user: [False, True, True], cls.regular_user: [False, False, True]}
+        for author, results in attempts.items():
+            for attempt, passed in enumerate(results):
+                solution = Solution.objects.create(author=author, task=cls.task, passed=passed)
+                solution.submission_date = start + attempt * (
+                    timezone.timedelta(minutes=1 if author == cls.staff_user else 1.5)
+                )
+                solution.save()
+                TestResult.objects.create(solution=solution, time_taken=len(attempts) + attempt)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("statistics:task_analytics_api")
+
+    def test_metrics(self):
+        with self.assertNumQueries(5):
+            metrics = get_task_metrics(self.task.id)
+        self.assertEqual(metrics["median_time_to_pass"], 120)
+        self.assertEqual(metrics["pass_rates"], {1: 0, 2: 0.5, 3: 1})
+        self.assertEqual(metrics["duration_percentiles"], {50: 3, 90: 4, 99: 4})
+
+    def test_no_solutions(self):
+        task = Task.objects.create(
+            pubdate="2000-01-01 00:00Z", category_id=1337, title="Empty", system_name="empty"
+        )
+        self.assertEqual(
+            get_task_metrics(task.id),
+            {"median_time_to_pass": None, "pass_rates": {}, "duration_percentiles": {}},
+        )
+
+    def test_view(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.url, {"task_id": self.task.id})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(json.loads(response.content)["pass_rates"], {"1": 0, "2": 0.5, "3": 1})
+        with patch("inloop.statistics.views.get_task_metrics") as mocked_get_task_metrics:
+            response = self.client.get(
+                self.url, {"task_id": self.task.id}, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        mocked_get_task_metrics.assert_not_called()
+
+    def test_bad_request(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
@@ -0,0 +1,154 @@
+import os
+import subprocess
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from inloop.gitload.repo import Repository
+from inloop.testrunner.images import (
+    build_image,
+    get_image_tags,
+    get_versioned_name,
+    hash_build_context,
+    remove_outdated_images,
+)
+
+
+class HashBuildContextTest(TestCase):
+    def setUp(self):
+        tmpdir = TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = tmpdir.name
+        self.write("Dockerfile", "FROM alpine")
+        self.write("task1/Test.java", "class Test {}")
+
+    def write(self, name, contents):
+        path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as stream:
+            stream.write(contents)
+
+    def test_hash_is_stable(self):
+        self.assertEqual(hash_build_context(self.path), hash_build_context(self.path))
+
+    def test_git_directory_is_ignored(self):
+        context_hash = hash_build_context(self.path)
+        self.write(".git/HEAD", "ref: refs/heads/main")
+        self.assertEqual(context_hash, hash_build_context(self.path))
+
+    def test_changes_are_detected(self):
+        context_hash = hash_build_context(self.path)
+        self.write("task1/Test.java", "class Test { }")
+        self.assertNotEqual(context_hash, hash_build_context(self.path))
+        context_hash = hash_build_context(self.path)
+        os.chmod(os.path.join(self.path, "Dockerfile"), 0o755)
+        self.assertNotEqual(context_hash, hash_build_context(self.path))
+        context_hash = hash_build_context(self.path)
+        os.rename(os.path.join(self.path, "task1"), os.path.join(self.path, "task2"))
+        self.assertNotEqual(context_hash, hash_build_context(self.path))
+
+
+class VersionedNameTest(TestCase):
+    def test_versioned_name(self):
+        self.assertEqual("image:abc", get_versioned_name("image", "abc"))
+        self.assertEqual("image:abc", get_versioned_name("image:latest", "abc"))
+        self.assertEqual(
+            "localhost:5000/image:abc", get_versioned_name("localhost:5000/image", "abc")
+        )
+
+
+@patch("inloop.testrunner.images.subprocess.check_call")
+@patch("inloop.testrunner.images.get_context_hash")
+class BuildImageTest(TestCase):
+    def setUp(self):
+        tmpdir = TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.repository = Repository(tmpdir.name)
+        self.context_hash = hash_build_context(tmpdir.name)
+        get_image_tags = patch("inloop.testrunner.images.get_image_tags", return_value=[])
+        self.get_image_tags = get_image_tags.start()
+        self.addCleanup(get_image_tags.stop)
+        remove_outdated_images = patch("inloop.testrunner.images.remove_outdated_images")
+        self.remove_outdated_images = remove_outdated_images.start()
+        self.addCleanup(remove_outdated_images.stop)
+
+    def test_unchanged_context_is_not_rebuilt(self, get_context_hash, check_call):
+        get_context_hash.return_value = self.context_hash
+        self.assertFalse(build_image(self.repository, "inloop-testrunner"))
+        check_call.assert_not_called()
+
+    def test_changed_context_is_rebuilt_and_retagged(self, get_context_hash, check_call):
+        get_context_hash.return_value = None
+        with patch.object(self.repository, "get_commit", return_value="0123456789abcdef"):
+            self.assertTrue(build_image(self.repository, "inloop-testrunner"))
+        build_args, tag_args = (call.args[0] for call in check_call.call_args_list)
+        self.assertEqual(
+            ["docker", "build", "--tag", "inloop-testrunner:0123456789ab"], build_args[:4]
+        )
+        self.assertIn(f"inloop.context-hash={self.context_hash}", build_args)
+        self.assertEqual("1", check_call.call_args_list[0].kwargs["env"]["DOCKER_BUILDKIT"])
+        self.assertEqual(
+            ["docker", "tag", "inloop-testrunner:0123456789ab", "inloop-testrunner"], tag_args
+        )
+
+    def test_failed_build_is_not_tagged(self, get_context_hash, check_call):
+        get_context_hash.return_value = None
+        check_call.side_effect = subprocess.CalledProcessError(1, "docker")
+        with self.assertRaises(subprocess.CalledProcessError):
+            build_image(self.repository, "inloop-testrunner")
+        check_call.assert_called_once()
+
+    def test_current_and_previous_versions_are_kept(self, get_context_hash, check_call):
+        get_context_hash.return_value = None
+        self.get_image_tags.return_value = ["latest", "fedcba987654"]
+        with patch.object(self.repository, "get_commit", return_value="0123456789abcdef"):
+            build_image(self.repository, "inloop-testrunner")
+        self.remove_outdated_images.assert_called_once_with(
+            "inloop-testrunner", keep=["latest", "0123456789ab", "latest", "fedcba987654"]
+        )
+
+    def test_outdated_images_are_kept_if_build_fails(self, get_context_hash, check_call):
+        get_context_hash.return_value = None
+        check_call.side_effect = subprocess.CalledProcessError(1, "docker")
+        with self.assertRaises(subprocess.CalledProcessError):
+            build_image(self.repository, "inloop-testrunner")
+        self.remove_outdated_images.assert_not_called()
+
+
+@patch("inloop.testrunner.images.subprocess.run")
+class ImageTagsTest(TestCase):
+    def test_tags_of_other_repositories_are_ignored(self, run):
+        run.return_value = subprocess.CompletedProcess(
+            [],
+            0,
+            stdout='["inloop-testrunner:latest", "inloop-testrunner:fedcba987654", '
+            '"mirror/inloop-testrunner:latest"]\n',
+        )
+        self.assertEqual(["latest", "fedcba987654"], get_image_tags("inloop-testrunner"))
+
+    def test_missing_image_has_no_tags(self, run):
+        run.return_value = subprocess.CompletedProcess([], 1, stdout="")
+        self.assertEqual([], get_image_tags("inloop-testrunner"))
+
+    def test_outdated_images_are_removed(self, run):
+        run.side_effect = [
+            subprocess.CompletedProcess(
+                [],
+                0,
+                stdout="latest\n0123456789ab\nfedcba987654\n"
+                "<none>\n00112233aabb\n99887766ffee\n",
+            ),
+            subprocess.CompletedProcess([], 0),
+            subprocess.CompletedProcess([], 1),
+        ]
+        remove_outdated_images(
+            "inloop-testrunner", keep=["latest", "0123456789ab", "fedcba987654"]
+        )
+        removed = [call.args[0] for call in run.call_args_list[1:]]
+        self.assertEqual(
+            [
+                ["docker", "rmi", "inloop-testrunner:00112233aabb"],
+                ["docker", "rmi", "inloop-testrunner:99887766ffee"],
+            ],
+            removed,
+        )